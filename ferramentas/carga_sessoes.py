@@ -0,0 +1,191 @@
+# ferramentas/carga_sessoes.py
+# -*- coding: utf-8 -*-
+"""
+Teste de carga do app: simula N sessões simultâneas com o AppTest do
+Streamlit (sem rede) e mede a latência de cada interação e o pico de
+memória do processo, para N crescente.
+
+Cada sessão: aceita os termos, envia um MIRA sintético próprio, clica em
+"Buscar OCI" (e espera o resultado), clica nos botões "Filtrar" de cada
+status e no download do CSV filtrado.
+
+O AppTest não é seguro entre threads (troca o Runtime global a cada
+execução), então as execuções do script das sessões passam por uma trava,
+uma de cada vez, como sob o GIL de uma réplica; o processamento de "Buscar
+OCI" roda de fato em paralelo, no executor do app. A latência de cada
+interação inclui a espera pela vez.
+
+Uso (na raiz do projeto):
+    python ferramentas/carga_sessoes.py
+    python ferramentas/carga_sessoes.py --sessoes 1 4 16 --pacientes 5000
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "ferramentas"))
+
+from gerar_mira import gerar_mira  # noqa: E402
+from medir_memoria import medir_pico  # noqa: E402
+
+# Espera máxima pelo resultado de "Buscar OCI" (fila + processamento)
+TEMPO_MAXIMO_BUSCA = 600
+INTERVALO_ACOMPANHAMENTO = 0.2
+
+INTERACOES = ["aceitar termos", "enviar arquivo", "buscar OCI", "filtrar status", "baixar CSV"]
+
+_trava_execucao = threading.Lock()
+
+
+def _executar(alvo):
+    """alvo.run() (AppTest ou widget alterado), uma execução por vez."""
+    with _trava_execucao:
+        return alvo.run()
+
+
+def _exigir_sem_erro(at, etapa: str) -> None:
+    if at.exception:
+        raise RuntimeError(f"{etapa}: {at.exception[0].value}")
+
+
+def _botao(elementos, rotulo: str):
+    for b in elementos:
+        if rotulo in b.label:
+            return b
+    raise RuntimeError(f"Botão não encontrado: {rotulo}")
+
+
+def simular_sessao(arquivo: tuple, registrar) -> None:
+    """
+    Uma sessão completa; registrar(interacao, ms) recebe cada latência.
+    arquivo: (nome, conteúdo) enviado no upload.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def cronometrar(interacao, acao):
+        inicio = time.perf_counter()
+        acao()
+        registrar(interacao, (time.perf_counter() - inicio) * 1000)
+        _exigir_sem_erro(at, interacao)
+
+    at = AppTest.from_file(os.path.join(RAIZ, "streamlit_app.py"), default_timeout=TEMPO_MAXIMO_BUSCA)
+    _executar(at)
+    _exigir_sem_erro(at, "abertura")
+
+    def aceitar():
+        _executar(at.checkbox[0].check())
+        _executar(_botao(at.button, "Aceitar termos").click())
+
+    cronometrar("aceitar termos", aceitar)
+
+    nome, conteudo = arquivo
+    uploader = at.sidebar.file_uploader[0]
+    cronometrar("enviar arquivo", lambda: _executar(uploader.set_value((nome, conteudo, "text/csv"))))
+
+    def buscar():
+        _executar(_botao(at.sidebar.button, "Buscar OCI").click())
+        limite = time.monotonic() + TEMPO_MAXIMO_BUSCA
+        while not any("Processamento concluído" in s.value for s in at.success):
+            if at.exception or time.monotonic() > limite:
+                raise RuntimeError("Buscar OCI: resultado não apareceu")
+            time.sleep(INTERVALO_ACOMPANHAMENTO)
+            _executar(at)
+
+    cronometrar("buscar OCI", buscar)
+
+    for chave in [b.key for b in at.button if b.key and b.key.startswith("btn_filtrar")]:
+        cronometrar("filtrar status", lambda: _executar(at.button(key=chave).click()))
+
+    download = _botao(at.get("download_button"), "Baixar tabela filtrada")
+    cronometrar("baixar CSV", lambda: _executar(download.click()))
+
+
+def rodar_carga(n_sessoes: int, arquivos: list) -> tuple:
+    """
+    Roda n_sessoes ao mesmo tempo (uma thread por sessão, como as sessões
+    de uma réplica). Retorna ({interacao: [ms, ...]}, erros, duração (s)).
+    """
+    latencias = defaultdict(list)
+    erros = []
+    trava = threading.Lock()
+    largada = threading.Barrier(n_sessoes)
+
+    def registrar(interacao, ms):
+        with trava:
+            latencias[interacao].append(ms)
+
+    def sessao(i):
+        largada.wait()
+        try:
+            simular_sessao(arquivos[i % len(arquivos)], registrar)
+        except Exception as erro:  # a carga segue com as demais sessões
+            with trava:
+                erros.append(f"sessão {i + 1}: {erro}")
+
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(n_sessoes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def _percentil(valores: list, p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="números de sessões simultâneas (um cenário por valor)")
+    parser.add_argument("--pacientes", type=int, default=2000, help="pacientes por arquivo MIRA")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    logging.disable(logging.WARNING)
+
+    # Um arquivo diferente por sessão (semente), gerado antes das medições
+    n_arquivos = max(args.sessoes)
+    arquivos = [
+        (f"mira_{i + 1}.csv",
+         gerar_mira(args.pacientes, semente=i).to_csv(sep=";", index=False).encode("utf-8"))
+        for i in range(n_arquivos)
+    ]
+
+    # Aquecimento: imports, bases auxiliares e caches do processo
+    _, erros, _ = rodar_carga(1, arquivos[-1:])
+    if erros:
+        print("FALHA no aquecimento: " + "; ".join(erros))
+        return 1
+
+    falhou = False
+    for n in args.sessoes:
+        (latencias, erros, duracao), antes, pico = medir_pico(lambda: rodar_carga(n, arquivos), intervalo=0.01)
+        print(f"{n} sessão(ões) simultânea(s): {duracao:.1f} s, "
+              f"pico de memória +{(pico - antes) / 2**20:.0f} MB (RSS {pico / 2**20:.0f} MB)")
+        print(f"  {'interação':<16}{'n':>6}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+        for interacao in INTERACOES:
+            valores = latencias.get(interacao)
+            if valores:
+                print(f"  {interacao:<16}{len(valores):>6}{statistics.median(valores):>12.0f}"
+                      f"{_percentil(valores, 0.95):>12.0f}")
+        for erro in erros:
+            print(f"  ERRO {erro}")
+        falhou |= bool(erros)
+
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
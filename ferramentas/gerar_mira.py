@@ -0,0 +1,97 @@
+# ferramentas/gerar_mira.py
+# -*- coding: utf-8 -*-
+"""
+Gera um arquivo MIRA sintético (CSV ';') a partir de bases_auxiliares/pacotes.csv,
+para medições de desempenho e testes manuais.
+
+Uso (na raiz do projeto):
+    python ferramentas/gerar_mira.py saida.csv --pacientes 100000
+    python ferramentas/gerar_mira.py saida.csv --pacientes 2000 --colunas-extras 5
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def gerar_mira(n_pacientes: int = 2000, colunas_extras: int = 0, semente: int = 0) -> pd.DataFrame:
+    """
+    DataFrame (texto) com as colunas do modelo MIRA + dt_nascimento e sexo.
+
+    Cada paciente tem de 1 a 11 linhas; cerca de 60% dos procedimentos vêm de
+    uma mesma OCI sorteada, o resto de outras OCI ou de códigos fora do
+    catálogo. Cerca de 30% das linhas ficam sem dt_execucao. 'colunas_extras'
+    acrescenta colunas de texto que o processamento não usa (como nas
+    exportações reais).
+    """
+    rng = np.random.default_rng(semente)
+    pacotes = pd.read_csv(os.path.join(RAIZ, "bases_auxiliares", "pacotes.csv"), dtype=str)
+    ocis = pacotes["CO_OCI"].unique()
+    por_oci = pacotes.groupby("CO_OCI")["CO_PROCEDIMENTO"].agg(list).reindex(ocis).tolist()
+    todos = pacotes["CO_PROCEDIMENTO"].to_numpy(dtype=object)
+    fora_catalogo = np.array(
+        [f"0{rng.integers(2, 4)}{rng.integers(10**7, 10**8)}" for _ in range(300)], dtype=object
+    )
+
+    linhas_por_paciente = rng.integers(1, 12, n_pacientes)
+    n = int(linhas_por_paciente.sum())
+    paciente = np.repeat(np.arange(n_pacientes), linhas_por_paciente)
+
+    oci_paciente = rng.integers(0, len(ocis), n_pacientes)[paciente]
+    da_oci = np.array([por_oci[k][rng.integers(len(por_oci[k]))] for k in oci_paciente], dtype=object)
+    sorteio = rng.random(n)
+    procedimento = np.where(
+        sorteio < 0.6,
+        da_oci,
+        np.where(sorteio < 0.88, fora_catalogo[rng.integers(0, len(fora_catalogo), n)],
+                 todos[rng.integers(0, len(todos), n)]),
+    )
+
+    partes = pd.Series(procedimento, dtype=object).str.partition("|")
+    codigo = partes[0].to_numpy(dtype=object)
+    cbo = partes[2].to_numpy(dtype=object)
+    sem_cbo = (cbo == "") & partes[0].str.startswith(("03", "04")).to_numpy()
+    cbo = np.where(sem_cbo, "225125", cbo)
+
+    solicitacao = np.datetime64("2024-01-01") + rng.integers(0, 700, n).astype("timedelta64[D]")
+    execucao = solicitacao + rng.integers(0, 60, n).astype("timedelta64[D]")
+    executado = rng.random(n) < 0.7
+    nascimento = np.datetime64("1950-01-01") + rng.integers(0, 25000, n_pacientes).astype("timedelta64[D]")
+
+    df = pd.DataFrame({
+        "id_registro": np.arange(1, n + 1).astype(str),
+        "id_paciente": np.char.add("P", paciente.astype(str)),
+        "co_procedimento": codigo,
+        "dt_solicitacao": solicitacao.astype(str),
+        "dt_execucao": np.where(executado, execucao.astype(str), ""),
+        "cbo_executante": cbo,
+        "cid_motivo": rng.choice(["C50", "D05", "N63", "Z000", "C61", ""], n),
+        "dt_nascimento": nascimento[paciente].astype(str),
+        "sexo": rng.choice(["M", "F"], n_pacientes)[paciente],
+    })
+    for k in range(colunas_extras):
+        df[f"extra_{k + 1}"] = np.char.add("valor sem uso ", rng.integers(0, 1000, n).astype(str))
+    return df
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("saida")
+    parser.add_argument("--pacientes", type=int, default=2000)
+    parser.add_argument("--colunas-extras", type=int, default=0)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    df = gerar_mira(args.pacientes, args.colunas_extras, args.semente)
+    df.to_csv(args.saida, sep=";", index=False)
+    print(f"{len(df):,} linhas gravadas em {args.saida}".replace(",", "."))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
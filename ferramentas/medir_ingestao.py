@@ -0,0 +1,78 @@
+# ferramentas/medir_ingestao.py
+# -*- coding: utf-8 -*-
+"""
+Compara a vazão da leitura do MIRA (processamento.ingestao) com a leitura
+anterior do app (read_csv/read_excel com todas as colunas como texto).
+
+Uso (na raiz do projeto):
+    python ferramentas/medir_ingestao.py
+    python ferramentas/medir_ingestao.py --pacientes 200000 --colunas-extras 8 --xlsx
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "ferramentas"))
+
+from gerar_mira import gerar_mira  # noqa: E402
+from processamento.ingestao import ler_arquivo_mira  # noqa: E402
+
+
+def leitura_anterior(conteudo: bytes, nome_arquivo: str) -> pd.DataFrame:
+    """Caminho de leitura usado pelo app antes do módulo de ingestão."""
+    if nome_arquivo.endswith(".csv"):
+        try:
+            return pd.read_csv(io.BytesIO(conteudo), dtype=str, encoding="utf-8", sep=";")
+        except UnicodeDecodeError:
+            return pd.read_csv(io.BytesIO(conteudo), dtype=str, encoding="latin1", sep=";")
+    return pd.read_excel(io.BytesIO(conteudo), dtype=str)
+
+
+def _melhor_tempo(funcao, rodadas: int) -> float:
+    tempos = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pacientes", type=int, default=100000)
+    parser.add_argument("--colunas-extras", type=int, default=5)
+    parser.add_argument("--rodadas", type=int, default=3)
+    parser.add_argument("--xlsx", action="store_true", help="mede também o .xlsx (lento de gerar)")
+    args = parser.parse_args()
+
+    df = gerar_mira(args.pacientes, args.colunas_extras)
+    arquivos = {"mira.csv": df.to_csv(sep=";", index=False).encode("utf-8")}
+    arquivos["mira_latin1.csv"] = (
+        df.assign(id_paciente=df["id_paciente"].str.replace("P", "Pç", n=1))
+        .to_csv(sep=";", index=False).encode("latin1")
+    )
+    if args.xlsx:
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False)
+        arquivos["mira.xlsx"] = buffer.getvalue()
+
+    print(f"{len(df):,} linhas, {df.shape[1]} colunas\n".replace(",", "."))
+    print(f"{'arquivo':<18}{'MB':>8}{'anterior (s)':>15}{'ingestao (s)':>15}{'MB/s':>10}{'ganho':>8}")
+    for nome, conteudo in arquivos.items():
+        mb = len(conteudo) / 1e6
+        t_antes = _melhor_tempo(lambda: leitura_anterior(conteudo, nome), args.rodadas)
+        t_depois = _melhor_tempo(lambda: ler_arquivo_mira(conteudo, nome), args.rodadas)
+        print(f"{nome:<18}{mb:>8.1f}{t_antes:>15.3f}{t_depois:>15.3f}"
+              f"{mb / t_depois:>10.1f}{t_antes / t_depois:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
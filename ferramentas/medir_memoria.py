@@ -0,0 +1,124 @@
+# ferramentas/medir_memoria.py
+# -*- coding: utf-8 -*-
+"""
+Mede o pico de memória (RSS) do processamento do app sobre um MIRA sintético
+e falha (código de saída 1) se o acréscimo passar de um múltiplo fixo do
+tamanho do DataFrame de entrada.
+
+Uso (na raiz do projeto):
+    python ferramentas/medir_memoria.py
+    python ferramentas/medir_memoria.py --pacientes 200000 --limite 3
+"""
+
+import argparse
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+
+# Pico de RSS durante o processamento, em múltiplos do tamanho da entrada
+# (memory_usage(deep=True) do df_mira normalizado).
+LIMITE_MULTIPLO_ENTRADA = 3.0
+
+# Tamanho do MIRA sintético em que o limite vale: em entradas pequenas, o
+# custo fixo (bases, regras, cópias pequenas) pesa mais que a entrada.
+PACIENTES_PADRAO = 100000
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "ferramentas"))
+
+
+def _rss_atual() -> int:
+    """RSS do processo em bytes (Linux: /proc/self/statm)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def medir_pico(funcao, intervalo: float = 0.002) -> tuple:
+    """
+    Executa funcao() amostrando o RSS numa thread; retorna
+    (resultado, RSS antes, pico de RSS durante a execução).
+    """
+    gc.collect()
+    antes = _rss_atual()
+    pico = [antes]
+    parar = threading.Event()
+
+    def amostrar():
+        while not parar.is_set():
+            pico[0] = max(pico[0], _rss_atual())
+            time.sleep(intervalo)
+
+    amostrador = threading.Thread(target=amostrar, daemon=True)
+    amostrador.start()
+    try:
+        resultado = funcao()
+    finally:
+        parar.set()
+        amostrador.join()
+    pico[0] = max(pico[0], _rss_atual())
+    return resultado, antes, pico[0]
+
+
+def medir(pacientes: int, competencia: str = None) -> dict:
+    """
+    Processa um MIRA sintético de 'pacientes' pacientes como o app e retorna
+    {linhas, entrada, acrescimo, multiplo, saida, duracao} (bytes e segundos;
+    multiplo = acrescimo / entrada).
+    """
+    os.chdir(RAIZ)
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    logging.disable(logging.WARNING)
+    import streamlit_app as app  # funções de processamento do app (modo bare)
+    from gerar_mira import gerar_mira
+    from processamento.normalizacao import normalizar_mira
+
+    df_pate, pacotes, cid, oci_nome, idade_sexo, regras, versao = app.carregar_bases_auxiliares()
+    df_mira, _ = normalizar_mira(gerar_mira(pacientes))
+    entrada = df_mira.memory_usage(deep=True).sum()
+
+    def executar():
+        return app.executar_busca_oci(
+            df_mira, df_pate, cid, oci_nome, pacotes, idade_sexo,
+            competencia, regras_compiladas=regras, versao_regras=versao,
+        )
+
+    inicio = time.perf_counter()
+    (oci, _, _), antes, pico = medir_pico(executar)
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "linhas": len(df_mira),
+        "entrada": entrada,
+        "acrescimo": pico - antes,
+        "multiplo": (pico - antes) / entrada,
+        "saida": len(oci),
+        "duracao": duracao,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pacientes", type=int, default=PACIENTES_PADRAO)
+    parser.add_argument("--competencia", default=None, help="ex.: 09/2025 (padrão: sem filtro)")
+    parser.add_argument("--limite", type=float, default=LIMITE_MULTIPLO_ENTRADA)
+    args = parser.parse_args()
+
+    r = medir(args.pacientes, args.competencia)
+    print(f"linhas de entrada     {r['linhas']:>12,}".replace(",", "."))
+    print(f"entrada (MB)          {r['entrada'] / 1e6:>12.1f}")
+    print(f"pico acima da base    {r['acrescimo'] / 1e6:>12.1f} MB  ({r['multiplo']:.2f}x a entrada)")
+    print(f"linhas de saída       {r['saida']:>12,}".replace(",", "."))
+    print(f"tempo (s)             {r['duracao']:>12.2f}")
+
+    if r["multiplo"] > args.limite:
+        print(f"FALHA: pico de {r['multiplo']:.2f}x a entrada, acima do limite de {args.limite:.1f}x")
+        return 1
+    print(f"OK: dentro do limite de {args.limite:.1f}x a entrada")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# ferramentas/medir_rerun.py
+# -*- coding: utf-8 -*-
+"""
+Mede o custo de rerun do app (sem arquivo carregado) com o AppTest do
+Streamlit e falha (código de saída 1) se a mediana passar do orçamento.
+
+Uso (na raiz do projeto):
+    python ferramentas/medir_rerun.py
+    python ferramentas/medir_rerun.py --rodadas 30 --orcamento-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Orçamento da mediana de um rerun ocioso (ms). Ajuste junto com a mudança
+# que justificar um custo maior.
+ORCAMENTO_RERUN_OCIOSO_MS = 150
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cronometrar(at, rodadas: int) -> dict:
+    tempos = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        at.run()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        "p50": statistics.median(tempos),
+        "p95": tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))],
+    }
+
+
+def medir(rodadas: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(RAIZ)
+    at = AppTest.from_file(os.path.join(RAIZ, "streamlit_app.py"), default_timeout=60)
+    at.run()  # primeira execução: imports e caches
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    resultados = {"rerun ocioso": _cronometrar(at, rodadas)}
+
+    at.session_state["termos_aceitos"] = True
+    at.run()
+    resultados["rerun com termos aceitos"] = _cronometrar(at, rodadas)
+
+    return resultados
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rodadas", type=int, default=20)
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_RERUN_OCIOSO_MS)
+    args = parser.parse_args()
+
+    resultados = medir(args.rodadas)
+    for nome, r in resultados.items():
+        print(f"{nome:<28} p50 = {r['p50']:7.1f} ms   p95 = {r['p95']:7.1f} ms")
+
+    p50 = resultados["rerun ocioso"]["p50"]
+    if p50 > args.orcamento_ms:
+        print(f"FALHA: rerun ocioso ({p50:.1f} ms) acima do orçamento de {args.orcamento_ms:.0f} ms")
+        return 1
+
+    print(f"OK: dentro do orçamento de {args.orcamento_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# ferramentas/processar_lote.py
+# -*- coding: utf-8 -*-
+"""
+Processa arquivos MIRA em lote (sem o app) e grava o resultado de uma
+competência no dataset Parquet particionado lido pelo BI.
+
+Grava <destino>/oci_identificada e <destino>/episodios, particionados por
+competência e id_pacote; rodar de novo a mesma competência substitui só
+a partição dela.
+
+Uso (na raiz do projeto):
+    python ferramentas/processar_lote.py mira.csv --competencia 06/2025 --destino dados/oci
+    python ferramentas/processar_lote.py unidade1.csv unidade2.xlsx --competencia 06/2025 --destino dados/oci
+"""
+
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from processamento import processar_mira  # noqa: E402
+from processamento.exportacao import gravar_dataset, resumo_episodios  # noqa: E402
+from processamento.ingestao import ler_arquivos_mira  # noqa: E402
+from processamento.recarga import carregar_versao  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("entradas", nargs="+", help="arquivos MIRA (.csv, .xlsx, .xls, .zip, .gz, .zst)")
+    parser.add_argument("--competencia", required=True, help="competência avaliada (MM/AAAA)")
+    parser.add_argument("--destino", required=True, help="raiz do dataset Parquet")
+    parser.add_argument("--bases", default=os.path.join(RAIZ, "bases_auxiliares"))
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    arquivos = []
+    for caminho in args.entradas:
+        with open(caminho, "rb") as f:
+            arquivos.append((os.path.basename(caminho), f.read()))
+    df_mira = ler_arquivos_mira(arquivos)
+
+    # Todas as versões das regras; processar_mira usa a da competência
+    estatisticas = {}
+    oci_identificada = processar_mira(
+        df_mira, carregar_versao(args.bases), estatisticas,
+        competencia_str=args.competencia,
+    )
+    episodios = resumo_episodios(oci_identificada)
+    gravados = gravar_dataset(args.destino, args.competencia, oci_identificada, episodios,
+                              versao_regras=estatisticas["versao_regras"])
+
+    print(f"{estatisticas['linhas_entrada']:,} linhas lidas, {len(oci_identificada):,} linhas em "
+          f"{len(episodios):,} OCI de {estatisticas['pacientes_com_oci']:,} pacientes".replace(",", "."))
+    print(f"Versão das regras: {estatisticas['versao_regras']}")
+    for nome, diretorio in gravados.items():
+        print(f"{nome}: {diretorio}")
+    print(f"Concluído em {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
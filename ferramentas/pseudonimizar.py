@@ -0,0 +1,79 @@
+# ferramentas/pseudonimizar.py
+# -*- coding: utf-8 -*-
+"""
+Pseudonimiza CPF/CNS de um arquivo MIRA localmente, antes do upload, trocando
+os identificadores por hash com chave secreta (substitui o criptografar_cpf.exe).
+
+A chave fica num arquivo (hexadecimal) guardado só pelo responsável: se ele
+não existir, é criado. Use sempre a mesma chave para que o mesmo paciente
+receba o mesmo pseudônimo em arquivos diferentes.
+
+Uso (na raiz do projeto):
+    python ferramentas/pseudonimizar.py mira.csv mira_pseudonimizado.csv --chave chave.txt
+    python ferramentas/pseudonimizar.py mira.xlsx saida.csv --chave chave.txt --colunas id_paciente cns
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from processamento.ingestao import ler_arquivo_mira  # noqa: E402
+from processamento.pseudonimizacao import (  # noqa: E402
+    COLUNAS_IDENTIFICADOR,
+    gerar_chave,
+    pseudonimizar_identificadores,
+)
+
+
+def carregar_chave(caminho: str) -> bytes:
+    """Lê a chave do arquivo; se ele não existir, gera uma nova e grava."""
+    if os.path.exists(caminho):
+        with open(caminho, encoding="ascii") as f:
+            return bytes.fromhex(f.read().strip())
+    chave = gerar_chave()
+    with open(os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w", encoding="ascii") as f:
+        f.write(chave.hex() + "\n")
+    print(f"Nova chave gravada em {caminho}: guarde-a em local seguro.")
+    return chave
+
+
+def gravar_csv(df, caminho: str) -> None:
+    """CSV ';' em UTF-8 (escritor do Arrow)."""
+    pa_csv.write_csv(
+        pa.Table.from_pandas(df, preserve_index=False),
+        caminho,
+        write_options=pa_csv.WriteOptions(delimiter=";", quoting_style="needed"),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("entrada", help="arquivo MIRA (.csv, .xlsx ou .xls)")
+    parser.add_argument("saida", help="CSV de saída (separador ';')")
+    parser.add_argument("--chave", required=True, help="arquivo da chave secreta (criado se não existir)")
+    parser.add_argument("--colunas", nargs="+", default=COLUNAS_IDENTIFICADOR)
+    parser.add_argument("--processos", type=int, default=0, help="0 = todos os núcleos")
+    args = parser.parse_args()
+
+    chave = carregar_chave(args.chave)
+    inicio = time.perf_counter()
+    with open(args.entrada, "rb") as f:
+        df = ler_arquivo_mira(f.read(), args.entrada, todas_colunas=True)
+    df, estatisticas = pseudonimizar_identificadores(df, chave, args.colunas, args.processos)
+    gravar_csv(df, args.saida)
+
+    for col, info in estatisticas.items():
+        print(f"{col}: {info['linhas']:,} linhas / {info['distintos']:,} valores distintos".replace(",", "."))
+    print(f"{len(df):,} linhas gravadas em {args.saida} ({time.perf_counter() - inicio:.1f} s)".replace(",", "."))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,11 @@
 # processamento/__init__.py
 
-from .processar_mira import processar_mira
+import pandas as pd
+
+# Copy-on-write (padrão a partir do pandas 3): filtros e assign não copiam
+# as colunas que não são alteradas. Fica aqui, antes de qualquer módulo do
+# pacote, para valer no app, no lote e nos testes.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+from .processar_mira import processar_mira  # noqa: E402
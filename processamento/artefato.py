@@ -0,0 +1,270 @@
+# processamento/artefato.py
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .cbo import preparar_cbo
+from .elegibilidade import preparar_idade_sexo
+from .mascaras import compilar_mascaras
+from .metricas import contar
+from .processar_mira import preparar_regras
+
+
+# ============================================================
+# Bases auxiliares + regras compiladas em artefato binário mapeável
+# ============================================================
+#
+# Layout (um diretório imutável por versão das bases; destino padrão:
+# <base_path>/compilado, ou OCI_ARTEFATO_DIR, que deve ser exclusivo de uma
+# pasta de bases):
+#
+#   <destino>/<versao>-<FORMATO_ARTEFATO>/
+#       manifesto.json                 versão, arquivos de origem e regras_pacotes
+#       bases__<base>__<coluna>.npy    tabelas de strings (dtype 'U')
+#       mascaras__<campo>.npy          índices compilados (uint64/int64/'U')
+#       idade_sexo__<campo>.npy
+#       cbo__<campo>.npy
+#
+# Os .npy são abertos com mmap_mode="r": processos e workers no mesmo host
+# compartilham as mesmas páginas do cache do sistema operacional. Ao
+# publicar uma versão, as anteriores do destino são apagadas (processos que
+# ainda as mapeiam continuam lendo: os arquivos só somem ao desmapear).
+
+BASES = ["df_pate", "pacotes", "cid", "oci_nome", "idade_sexo", "cbo"]
+
+# Muda quando o conteúdo do artefato muda (artefatos antigos não são reusados)
+FORMATO_ARTEFATO = 2
+
+# Pasta do artefato dentro de base_path (sem OCI_ARTEFATO_DIR)
+PASTA_ARTEFATO = "compilado"
+DESTINO_PADRAO = os.environ.get("OCI_ARTEFATO_DIR")
+
+# <versão> (layout antigo) ou <versão>-<formato>
+_NOME_VERSAO = re.compile(r"^[0-9a-f]{16}(-\d+)?$")
+
+
+def versao_bases(base_path: str) -> str:
+    """Hash (sha256, 16 caracteres) do conteúdo dos CSV de 'base_path'."""
+    h = hashlib.sha256()
+    for nome in BASES:
+        caminho = os.path.join(base_path, f"{nome}.csv")
+        if not os.path.exists(caminho):
+            continue
+        h.update(nome.encode())
+        with open(caminho, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def ler_bases_csv(base_path: str) -> dict:
+    """Lê os CSV de 'base_path' como texto ({nome: DataFrame})."""
+    return {
+        nome: pd.read_csv(os.path.join(base_path, f"{nome}.csv"), dtype=str)
+        for nome in BASES
+        if os.path.exists(os.path.join(base_path, f"{nome}.csv"))
+    }
+
+
+def compilar_regras(bases: dict) -> dict:
+    """
+    Compila as estruturas usadas no match a partir das bases:
+        {
+          'regras_pacotes': dicionário de preparar_regras,
+          'mascaras':       compilar_mascaras(...),
+          'idade_sexo':     preparar_idade_sexo(...) ou None,
+          'cbo':            preparar_cbo(...) ou None
+        }
+    """
+    regras_pacotes = preparar_regras(bases["pacotes"])
+
+    nomes_procedimento = None
+    if bases.get("df_pate") is not None:
+        nomes_procedimento = (
+            bases["df_pate"]
+            .drop_duplicates(subset="codigo")
+            .set_index("codigo")["no_procedimento"]
+            .to_dict()
+        )
+
+    regras_idade_sexo = None
+    if bases.get("idade_sexo") is not None:
+        regras_idade_sexo = preparar_idade_sexo(bases["idade_sexo"], list(regras_pacotes))
+
+    regras_cbo = None
+    if bases.get("cbo") is not None:
+        regras_cbo = preparar_cbo(bases["cbo"], list(regras_pacotes))
+
+    return {
+        "regras_pacotes": regras_pacotes,
+        "mascaras": compilar_mascaras(regras_pacotes, nomes_procedimento),
+        "idade_sexo": regras_idade_sexo,
+        "cbo": regras_cbo,
+    }
+
+
+def _tabela_strings(valores) -> np.ndarray:
+    """Converte uma sequência de strings (None -> '') em array 'U' de largura fixa."""
+    valores = ["" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v) for v in valores]
+    return np.asarray(valores, dtype=str) if valores else np.zeros(0, dtype="U1")
+
+
+def exportar_artefato(base_path: str = "bases_auxiliares", destino: str = None) -> str:
+    """
+    Gera o artefato da versão atual das bases (se ainda não existir) e
+    retorna o diretório. A escrita é feita num diretório temporário e
+    renomeada ao final, então leitores nunca veem um artefato pela metade.
+    destino: padrão DESTINO_PADRAO ou <base_path>/compilado.
+    """
+    destino = destino or DESTINO_PADRAO or os.path.join(base_path, PASTA_ARTEFATO)
+    versao = versao_bases(base_path)
+    dir_versao = os.path.join(destino, f"{versao}-{FORMATO_ARTEFATO}")
+    if os.path.exists(os.path.join(dir_versao, "manifesto.json")):
+        contar("oci_cache_consultas_total", cache="artefato", resultado="acerto")
+        return dir_versao
+    contar("oci_cache_consultas_total", cache="artefato", resultado="falha")
+
+    bases = ler_bases_csv(base_path)
+    regras = compilar_regras(bases)
+
+    os.makedirs(destino, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{versao}-", dir=destino)
+    try:
+        for nome, df in bases.items():
+            for col in df.columns:
+                np.save(os.path.join(tmp, f"bases__{nome}__{col}.npy"), _tabela_strings(df[col].tolist()))
+
+        mascaras = regras["mascaras"]
+        rotulos = mascaras["rotulos"]
+        arrays = {
+            "mascaras__co_oci": _tabela_strings(mascaras["co_oci"]),
+            "mascaras__procedimentos": _tabela_strings(mascaras["procedimentos"]),
+            "mascaras__mascaras": mascaras["mascaras"],
+            "mascaras__completa": mascaras["completa"],
+            "mascaras__n_requisitos": mascaras["n_requisitos"],
+            "mascaras__rotulos": _tabela_strings([r for lista in rotulos for r in lista]),
+            "mascaras__rotulos_inicio": np.cumsum([0] + [len(lista) for lista in rotulos]),
+        }
+        if regras["idade_sexo"] is not None:
+            for campo, valores in regras["idade_sexo"].items():
+                arrays[f"idade_sexo__{campo}"] = (
+                    _tabela_strings(valores) if valores.dtype == object else valores
+                )
+        if regras["cbo"] is not None:
+            arrays["cbo__co_oci"] = _tabela_strings(regras["cbo"]["co_oci"])
+            arrays["cbo__cbos"] = _tabela_strings(regras["cbo"]["cbos"])
+            arrays["cbo__permitido"] = regras["cbo"]["permitido"]
+        for nome, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{nome}.npy"), arr)
+
+        manifesto = {
+            "versao": versao,
+            "bases": {nome: list(df.columns) for nome, df in bases.items()},
+            "regras_pacotes": regras["regras_pacotes"],
+            "com_idade_sexo": regras["idade_sexo"] is not None,
+            "com_cbo": regras["cbo"] is not None,
+        }
+        with open(os.path.join(tmp, "manifesto.json"), "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+
+        try:
+            os.rename(tmp, dir_versao)
+        except OSError:
+            # Outro processo publicou a mesma versão primeiro
+            shutil.rmtree(tmp, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    _podar_versoes(destino, manter=os.path.basename(dir_versao))
+    return dir_versao
+
+
+def _podar_versoes(destino: str, manter: str) -> None:
+    """Apaga os artefatos de outras versões (ou formatos) em 'destino'."""
+    for nome in os.listdir(destino):
+        if nome != manter and _NOME_VERSAO.match(nome):
+            shutil.rmtree(os.path.join(destino, nome), ignore_errors=True)
+
+
+def carregar_artefato(base_path: str = "bases_auxiliares", destino: str = None) -> dict:
+    """
+    Abre (gerando se preciso) o artefato da versão atual das bases.
+
+    Retorna:
+        {
+          'versao': hash das bases,
+          'bases':  {nome: DataFrame},
+          'regras': {'regras_pacotes', 'mascaras', 'idade_sexo', 'cbo'} (ver compilar_regras)
+        }
+    Os índices numéricos ('mascaras', 'completa', idades...) ficam mapeados
+    em memória (somente leitura); as tabelas de strings viram DataFrames.
+    """
+    dir_versao = exportar_artefato(base_path, destino)
+
+    with open(os.path.join(dir_versao, "manifesto.json"), encoding="utf-8") as f:
+        manifesto = json.load(f)
+
+    def _abrir(nome):
+        return np.load(os.path.join(dir_versao, f"{nome}.npy"), mmap_mode="r")
+
+    # '' volta a ser ausente, como no read_csv(dtype=str) original
+    bases = {
+        nome: pd.DataFrame({
+            col: pd.Series(_abrir(f"bases__{nome}__{col}").astype(object)).replace("", np.nan)
+            for col in colunas
+        })
+        for nome, colunas in manifesto["bases"].items()
+    }
+
+    inicio = _abrir("mascaras__rotulos_inicio")
+    rotulos_flat = _abrir("mascaras__rotulos").tolist()
+    mascaras = {
+        "co_oci": _abrir("mascaras__co_oci").astype(object),
+        "procedimentos": pd.Index(_abrir("mascaras__procedimentos").astype(object)),
+        "mascaras": _abrir("mascaras__mascaras"),
+        "completa": _abrir("mascaras__completa"),
+        "n_requisitos": _abrir("mascaras__n_requisitos"),
+        "rotulos": [rotulos_flat[inicio[k]:inicio[k + 1]] for k in range(len(inicio) - 1)],
+    }
+
+    regras_idade_sexo = None
+    if manifesto["com_idade_sexo"]:
+        regras_idade_sexo = {
+            campo: _abrir(f"idade_sexo__{campo}")
+            for campo in ["idade_minima", "idade_maxima", "com_regra"]
+        }
+        regras_idade_sexo["co_oci"] = _abrir("idade_sexo__co_oci").astype(object)
+        regras_idade_sexo["sexo"] = _abrir("idade_sexo__sexo").astype(object)
+
+    regras_cbo = None
+    if manifesto["com_cbo"]:
+        regras_cbo = {
+            "co_oci": _abrir("cbo__co_oci").astype(object),
+            "cbos": _abrir("cbo__cbos").astype(object),
+            "permitido": _abrir("cbo__permitido"),
+        }
+
+    return {
+        "versao": manifesto["versao"],
+        "bases": bases,
+        "regras": {
+            "regras_pacotes": manifesto["regras_pacotes"],
+            "mascaras": mascaras,
+            "idade_sexo": regras_idade_sexo,
+            "cbo": regras_cbo,
+        },
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(exportar_artefato(*sys.argv[1:3]))
@@ -0,0 +1,206 @@
+# processamento/atribuicao.py
+# -*- coding: utf-8 -*-
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+
+import numpy as np
+import pandas as pd
+
+from .tarefas import contexto_processos
+
+
+# ============================================================
+# Atribuição de cada id_registro a no máximo uma OCI fechada
+# ============================================================
+
+# Até este número de OCI em disputa no mesmo paciente, testa todas as ordens
+# (busca exata); acima disso, guloso com reparo.
+MAX_OCI_BUSCA_EXATA = 5
+
+# Abaixo deste número de pacientes em conflito, não compensa abrir processos.
+MIN_PACIENTES_PARALELO = 2000
+
+
+def _tentar_ordem(ordem, completa, exclusivos, disputados):
+    """
+    Fecha as OCI na ordem dada. Cada OCI usa primeiro as suas linhas
+    exclusivas e depois as disputadas ainda livres (as com menos
+    candidatas primeiro). Retorna (OCI fechadas, {registro: oci}).
+    """
+    usados = {}
+    fechadas = []
+
+    for oci in ordem:
+        cobertos = exclusivos.get(oci, 0)
+        escolhidos = []
+        for registro, bits_por_oci in disputados:
+            if cobertos == completa[oci]:
+                break
+            if registro in usados or oci not in bits_por_oci:
+                continue
+            bits = bits_por_oci[oci]
+            if bits & ~cobertos:
+                cobertos |= bits
+                escolhidos.append(registro)
+
+        if cobertos == completa[oci]:
+            fechadas.append(oci)
+            for registro in escolhidos:
+                usados[registro] = oci
+
+    return fechadas, usados
+
+
+def _resolver_paciente(candidatas, completa, exclusivos, disputados):
+    """
+    Escolhe quais OCI do paciente fecham, maximizando a quantidade.
+    'disputados': [(id_registro, {oci: bits})] ordenado por nº de candidatas.
+    """
+    if len(candidatas) <= MAX_OCI_BUSCA_EXATA:
+        ordens = permutations(candidatas)
+    else:
+        # Guloso (OCI com menos requisitos a cobrir primeiro) + reparo:
+        # cada OCI que ficar de fora é testada novamente na frente da fila.
+        base = sorted(candidatas, key=lambda o: bin(completa[o] & ~exclusivos.get(o, 0)).count("1"))
+        fechadas, _ = _tentar_ordem(base, completa, exclusivos, disputados)
+        ordens = [base] + [
+            [o] + [x for x in base if x != o] for o in base if o not in fechadas
+        ]
+
+    melhor = ([], {})
+    for ordem in ordens:
+        fechadas, usados = _tentar_ordem(ordem, completa, exclusivos, disputados)
+        if len(fechadas) > len(melhor[0]):
+            melhor = (fechadas, usados)
+            if len(fechadas) == len(candidatas):
+                break
+    return melhor
+
+
+def _resolver_lote(problemas):
+    """Resolve uma lista de problemas por paciente (executado nos processos)."""
+    return [_resolver_paciente(*problema) for problema in problemas]
+
+
+def atribuir_registros(
+    oci_identificada: pd.DataFrame,
+    compilado: dict,
+    n_processos: int = None,
+):
+    """
+    Garante que cada id_registro conte para no máximo uma OCI.
+
+    Cada OCI candidata é identificada por (id_pacote, episodio). Só os
+    pacientes com algum id_registro em mais de uma candidata são
+    resolvidos; os demais passam direto. A OCI que não consegue mais
+    cobrir todos os requisitos obrigatórios só com linhas próprias deixa
+    de ser considerada fechada. Linhas disputadas que não foram usadas
+    como requisito (ex.: opcionais) ficam com a primeira OCI fechada que
+    as aceitava.
+
+    Com muitos pacientes em conflito, os problemas são distribuídos entre
+    processos ('n_processos'; None = número de CPUs).
+
+    Retorna (oci_identificada sem duplicidade, tabela de conflitos) com a
+    tabela de conflitos contendo: id_paciente, id_registro, co_procedimento,
+    oci_candidatas e id_pacote_atribuido.
+    """
+    colunas_conflito = ["id_paciente", "id_registro", "co_procedimento",
+                        "oci_candidatas", "id_pacote_atribuido"]
+
+    chave_registro = ["id_paciente", "id_registro"]
+    disputado = oci_identificada.duplicated(subset=chave_registro, keep=False)
+
+    if not disputado.any():
+        return oci_identificada, pd.DataFrame(columns=colunas_conflito)
+
+    pacientes_conflito = oci_identificada.loc[disputado, "id_paciente"].unique()
+    em_conflito = oci_identificada["id_paciente"].isin(pacientes_conflito)
+    sub = oci_identificada.loc[em_conflito, ["id_paciente", "id_registro", "co_procedimento",
+                                             "id_pacote", "episodio"]]
+
+    idx_proc = compilado["procedimentos"].get_indexer(sub["co_procedimento"])
+    idx_oci = pd.Index(compilado["co_oci"]).get_indexer(sub["id_pacote"].astype(str))
+    bits = np.zeros(len(sub), dtype=np.uint64)
+    ok = (idx_proc >= 0) & (idx_oci >= 0)
+    bits[ok] = compilado["mascaras"][idx_proc[ok], idx_oci[ok]]
+    completa_oci = dict(zip(compilado["co_oci"], compilado["completa"].tolist()))
+
+    problemas = []
+    pacientes = []
+    for id_paciente, g in sub.assign(_bits=bits).groupby("id_paciente", sort=False):
+        ocis = list(zip(g["id_pacote"], g["episodio"]))
+        completa = {oci: completa_oci.get(oci[0], 0) for oci in dict.fromkeys(ocis)}
+
+        por_registro = {}
+        for registro, oci, b in zip(g["id_registro"], ocis, g["_bits"].tolist()):
+            bits_por_oci = por_registro.setdefault(registro, {})
+            bits_por_oci[oci] = bits_por_oci.get(oci, 0) | b
+
+        exclusivos = {}
+        disputados = []
+        for registro, bits_por_oci in por_registro.items():
+            if len(bits_por_oci) == 1:
+                (oci, b), = bits_por_oci.items()
+                exclusivos[oci] = exclusivos.get(oci, 0) | b
+            else:
+                disputados.append((registro, bits_por_oci))
+        disputados.sort(key=lambda item: len(item[1]))
+
+        # Só entram na busca as OCI que disputam alguma linha; as demais
+        # já estavam fechadas só com linhas próprias.
+        candidatas = list(dict.fromkeys(o for _, bits_por_oci in disputados for o in bits_por_oci))
+
+        problemas.append((candidatas, completa, exclusivos, disputados))
+        pacientes.append((id_paciente, set(completa) - set(candidatas)))
+
+    if len(problemas) >= MIN_PACIENTES_PARALELO and n_processos != 1:
+        n_processos = n_processos or os.cpu_count() or 1
+        tamanho = max(1, len(problemas) // (n_processos * 4))
+        lotes = [problemas[i:i + tamanho] for i in range(0, len(problemas), tamanho)]
+        with ProcessPoolExecutor(max_workers=n_processos, mp_context=contexto_processos()) as executor:
+            solucoes = [s for lote in executor.map(_resolver_lote, lotes) for s in lote]
+    else:
+        solucoes = _resolver_lote(problemas)
+
+    # Monta a decisão linha a linha: (paciente, registro, oci) mantida?
+    fechadas_paciente = {}
+    destino = {}
+    for (id_paciente, sem_disputa), (fechadas, usados), problema in zip(pacientes, solucoes, problemas):
+        fechadas_paciente[id_paciente] = set(fechadas) | sem_disputa
+        for registro, bits_por_oci in problema[3]:
+            oci = usados.get(registro)
+            if oci is None:
+                oci = next((o for o in fechadas if o in bits_por_oci), None)
+            destino[(id_paciente, registro)] = oci
+
+    chaves = list(zip(sub["id_paciente"], sub["id_registro"]))
+    ocis = list(zip(sub["id_pacote"], sub["episodio"]))
+    manter = np.fromiter(
+        (
+            oci in fechadas_paciente[p]
+            and destino.get((p, r), oci) == oci
+            for (p, r), oci in zip(chaves, ocis)
+        ),
+        dtype=bool,
+        count=len(sub),
+    )
+
+    remover = pd.Series(False, index=oci_identificada.index)
+    remover[sub.index[~manter]] = True
+
+    disputadas = sub[disputado[em_conflito].to_numpy()]
+    conflitos = (
+        disputadas.groupby(["id_paciente", "id_registro"], sort=False)
+        .agg(co_procedimento=("co_procedimento", "first"),
+             oci_candidatas=("id_pacote", lambda x: ",".join(sorted(set(map(str, x))))))
+        .reset_index()
+    )
+    conflitos["id_pacote_atribuido"] = [
+        (destino.get((p, r)) or (None,))[0]
+        for p, r in zip(conflitos["id_paciente"], conflitos["id_registro"])
+    ]
+
+    return oci_identificada[~remover], conflitos[colunas_conflito]
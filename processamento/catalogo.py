@@ -0,0 +1,53 @@
+# processamento/catalogo.py
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+
+# ============================================================
+# Poda inicial: linhas que não podem pertencer a nenhuma OCI
+# ============================================================
+
+def codigos_do_catalogo(df_pacotes: pd.DataFrame) -> frozenset:
+    """
+    União de todos os códigos SIGTAP que aparecem em algum pacote,
+    sem o sufixo '|CBO' (ex.: '0301010072|225250' -> '0301010072').
+    """
+    codigos = (
+        df_pacotes["CO_PROCEDIMENTO"]
+        .dropna()
+        .astype(str)
+        .str.split("|", n=1)
+        .str[0]
+        .str.strip()
+    )
+    return frozenset(codigos)
+
+
+def filtrar_candidatos(
+    df_mira: pd.DataFrame,
+    codigos_catalogo: frozenset,
+    estatisticas: dict = None,
+) -> pd.DataFrame:
+    """
+    Mantém apenas as linhas cujo 'co_procedimento' está no catálogo de OCI.
+    Pacientes sem nenhuma linha candidata saem junto.
+
+    Se 'estatisticas' for informado, registra nele:
+      - linhas_entrada, linhas_candidatas, razao_poda
+      - pacientes_entrada, pacientes_candidatos
+    """
+    candidata = df_mira["co_procedimento"].isin(codigos_catalogo)
+    df_out = df_mira[candidata]
+
+    if estatisticas is not None:
+        linhas_entrada = len(df_mira)
+        estatisticas["linhas_entrada"] = linhas_entrada
+        estatisticas["linhas_candidatas"] = len(df_out)
+        estatisticas["razao_poda"] = (
+            1 - len(df_out) / linhas_entrada if linhas_entrada else 0.0
+        )
+        estatisticas["pacientes_entrada"] = df_mira["id_paciente"].nunique()
+        estatisticas["pacientes_candidatos"] = df_out["id_paciente"].nunique()
+
+    return df_out
@@ -0,0 +1,92 @@
+# processamento/cbo.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# Compatibilidade do CBO executante por OCI (bases_auxiliares/cbo.csv)
+# ============================================================
+#
+# Só as linhas que cumprem um requisito obrigatório com CBO na regra
+# (código 'procedimento|CBO' em pacotes.csv, as consultas 03/04) são
+# conferidas contra a lista da OCI em cbo.csv. Exames (02), opcionais e
+# procedimentos sem CBO na regra são feitos por outros profissionais
+# (radiologia, laboratório...), que cbo.csv não lista: ficam compatíveis.
+
+def preparar_cbo(df_cbo: pd.DataFrame, ids_pacotes) -> dict:
+    """
+    Compila a base 'cbo' numa tabela de consulta por códigos inteiros, com
+    as linhas na ordem de 'ids_pacotes':
+        {
+          'co_oci':    array de CO_OCI (linhas),
+          'cbos':      array dos CBO da base (colunas; o primeiro é '', sem CBO),
+          'permitido': matriz bool (OCI + 1) x (CBO + 1)
+        }
+    A última linha (OCI sem lista na base) e a coluna '' (linha sem CBO
+    executante) são todas True: não há o que conferir. A última coluna (CBO
+    fora da base) só é True para as OCI sem lista. Índice -1 do get_indexer
+    cai na última linha/coluna, então a consulta não precisa de máscara.
+    """
+    co_oci = np.asarray([str(c) for c in ids_pacotes], dtype=object)
+
+    df = pd.DataFrame({
+        "CO_OCI": df_cbo["CO_OCI"].astype(str).str.strip(),
+        "CO_CBO": df_cbo["CO_CBO"].astype(str).str.strip(),
+    }).drop_duplicates()
+    df = df[df["CO_CBO"] != ""]
+
+    cbos = pd.Index([""] + sorted(set(df["CO_CBO"])))
+    linhas = pd.Index(co_oci).get_indexer(df["CO_OCI"])
+    colunas = cbos.get_indexer(df["CO_CBO"])
+    na_base = linhas >= 0
+
+    permitido = np.zeros((len(co_oci) + 1, len(cbos) + 1), dtype=bool)
+    permitido[linhas[na_base], colunas[na_base]] = True
+    com_regra = np.zeros(len(co_oci) + 1, dtype=bool)
+    com_regra[linhas[na_base]] = True
+    permitido[~com_regra, :] = True
+    permitido[:, 0] = True
+
+    return {
+        "co_oci": co_oci,
+        "cbos": cbos.to_numpy(dtype=object),
+        "permitido": permitido,
+    }
+
+
+def _codigos(serie: pd.Series, indice: pd.Index) -> np.ndarray:
+    """Posição de cada valor em 'indice' (-1 se ausente), consultando só os distintos."""
+    codigos, unicos = pd.factorize(serie)
+    posicao = indice.get_indexer(unicos)
+    return np.where(codigos >= 0, posicao[codigos], -1)
+
+
+def marcar_cbo(oci_identificada: pd.DataFrame, regras_cbo: dict, compilado: dict) -> pd.Series:
+    """
+    Retorna a coluna 'cbo_compativel' para cada linha (id_pacote, cbo_executante):
+    False quando a linha cumpre um requisito obrigatório com CBO da OCI
+    (máscara não nula em 'compilado', ver compilar_mascaras, e código
+    'procedimento|CBO'), a OCI tem lista de CBO na base e o CBO executante
+    da linha não está nela (profissional incompatível); True nos demais casos.
+    """
+    linhas = _codigos(oci_identificada["id_pacote"], pd.Index(regras_cbo["co_oci"]))
+    # valor ausente cai na coluna '' (sem CBO executante)
+    colunas = _codigos(oci_identificada["cbo_executante"], pd.Index(regras_cbo["cbos"]))
+    colunas[oci_identificada["cbo_executante"].isna().to_numpy()] = 0
+
+    # Linhas conferidas: requisito obrigatório da OCI cujo código traz o CBO
+    procedimento = _codigos(oci_identificada["co_procedimento"], compilado["procedimentos"])
+    oci = _codigos(oci_identificada["id_pacote"], pd.Index(compilado["co_oci"]))
+    requisito = (procedimento >= 0) & (oci >= 0)
+    requisito[requisito] = compilado["mascaras"][procedimento[requisito], oci[requisito]] != 0
+    conferir = requisito & oci_identificada["co_procedimento"].str.contains("|", regex=False).to_numpy(
+        dtype=bool, na_value=False
+    )
+
+    return pd.Series(
+        ~conferir | regras_cbo["permitido"][linhas, colunas],
+        index=oci_identificada.index,
+        name="cbo_compativel",
+    )
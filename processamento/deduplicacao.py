@@ -0,0 +1,78 @@
+# processamento/deduplicacao.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from .normalizacao import COLUNAS_RELATORIO
+
+
+# ============================================================
+# Registros repetidos (mesmo id_registro) vindos de reenvios/joins
+# ============================================================
+
+POLITICAS_DUPLICADOS = {
+    "mais_recente": "Manter a linha com a execução mais recente",
+    "primeira": "Manter a primeira linha do arquivo",
+}
+
+
+def deduplicar_registros(
+    df_mira: pd.DataFrame,
+    politica: str = "mais_recente",
+    colunas_chave=("id_registro",),
+) -> tuple:
+    """
+    Mantém uma linha por chave (por padrão, id_registro).
+
+    A comparação é feita sobre o hash de 64 bits da chave, e não sobre as
+    linhas inteiras. Políticas:
+      - 'mais_recente': fica a linha com a maior dt_execucao (não executada
+        conta como a mais antiga; empate -> a primeira do arquivo);
+      - 'primeira': fica a primeira ocorrência no arquivo.
+    A ordem original das linhas mantidas é preservada.
+
+    Retorna (df sem duplicados, relatório) no mesmo formato do relatório de
+    normalizar_mira (vazio quando não há duplicados).
+    """
+    if politica not in POLITICAS_DUPLICADOS:
+        raise ValueError(f"Política de duplicados desconhecida: {politica}")
+
+    colunas_chave = list(colunas_chave)
+    relatorio = pd.DataFrame(columns=COLUNAS_RELATORIO)
+    if df_mira.empty:
+        return df_mira, relatorio
+
+    h = pd.util.hash_pandas_object(df_mira[colunas_chave], index=False).to_numpy()
+    repetidas = pd.Series(h).duplicated(keep=False).to_numpy()
+    if not repetidas.any():
+        return df_mira, relatorio
+
+    if politica == "mais_recente" and "dt_execucao" in df_mira.columns:
+        # NaT vira o menor int64: não executada perde para qualquer execução.
+        # Posição decrescente no desempate: a última da chave na ordenação
+        # é a mais recente e, entre iguais, a que aparece primeiro no arquivo.
+        # Só as linhas repetidas entram na ordenação.
+        posicao = np.flatnonzero(repetidas)
+        execucao = df_mira["dt_execucao"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        ordem = posicao[np.lexsort((-posicao, execucao[posicao], h[posicao]))]
+        h_ord = h[ordem]
+        ultima_da_chave = np.r_[h_ord[1:] != h_ord[:-1], True]
+        manter = ~repetidas
+        manter[ordem[ultima_da_chave]] = True
+    else:
+        manter = ~pd.Series(h).duplicated(keep="first").to_numpy()
+    n_removidas = int((~manter).sum())
+
+    exemplos = df_mira.loc[repetidas, colunas_chave[0]].astype(str).unique()[:3]
+    relatorio = pd.DataFrame([{
+        "coluna": ", ".join(colunas_chave),
+        "motivo": "registro duplicado",
+        "acao": f"linha descartada ({POLITICAS_DUPLICADOS[politica].lower()})",
+        "linhas": n_removidas,
+        "exemplos": ", ".join(exemplos),
+    }], columns=COLUNAS_RELATORIO)
+
+    df = df_mira[manter]
+    df.attrs = dict(df_mira.attrs)
+    return df, relatorio
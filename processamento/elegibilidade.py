@@ -0,0 +1,148 @@
+# processamento/elegibilidade.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# Elegibilidade por idade e sexo (bases_auxiliares/idade_sexo.csv)
+# ============================================================
+
+def preparar_idade_sexo(df_idade_sexo: pd.DataFrame, ids_pacotes) -> dict:
+    """
+    Compila a base 'idade_sexo' em arrays alinhados com a lista de pacotes
+    (mesma ordem de 'ids_pacotes'):
+        {
+          'co_oci':       array de CO_OCI,
+          'idade_minima': idade mínima em meses,
+          'idade_maxima': idade máxima em meses,
+          'sexo':         'M' / 'F' / 'I' (indiferente),
+          'com_regra':    True se a OCI consta na base
+        }
+    OCI sem linha na base não têm restrição (0 a infinito, sexo 'I').
+    """
+    co_oci = np.asarray([str(c) for c in ids_pacotes], dtype=object)
+
+    df = df_idade_sexo.copy()
+    df["CO_OCI"] = df["CO_OCI"].astype(str).str.strip()
+    df = df.drop_duplicates(subset=["CO_OCI"]).set_index("CO_OCI")
+
+    pos = df.index.get_indexer(co_oci)
+    com_regra = pos >= 0
+
+    idade_min = pd.to_numeric(df["IDADE_MINIMA"], errors="coerce").to_numpy(dtype=float)
+    idade_max = pd.to_numeric(df["IDADE_MAXIMA"], errors="coerce").to_numpy(dtype=float)
+    sexo = df["SEXO"].fillna("I").astype(str).str.strip().str.upper().str[:1].to_numpy(dtype=object)
+
+    regras = {
+        "co_oci": co_oci,
+        "idade_minima": np.zeros(len(co_oci)),
+        "idade_maxima": np.full(len(co_oci), np.inf),
+        "sexo": np.full(len(co_oci), "I", dtype=object),
+        "com_regra": com_regra,
+    }
+    regras["idade_minima"][com_regra] = np.nan_to_num(idade_min[pos[com_regra]], nan=0)
+    regras["idade_maxima"][com_regra] = np.nan_to_num(idade_max[pos[com_regra]], nan=np.inf)
+    regras["sexo"][com_regra] = sexo[pos[com_regra]]
+
+    return regras
+
+
+def _idade_em_meses(nascimento: pd.Series, referencia: pd.Series) -> np.ndarray:
+    """Idade em meses completos na data de referência (NaN se alguma data faltar)."""
+    meses = (
+        (referencia.dt.year - nascimento.dt.year) * 12
+        + (referencia.dt.month - nascimento.dt.month)
+        - (referencia.dt.day < nascimento.dt.day).astype(int)
+    )
+    return meses.to_numpy(dtype=float, na_value=np.nan)
+
+
+def calcular_elegibilidade(df_mira: pd.DataFrame, regras_idade_sexo: dict) -> dict:
+    """
+    Calcula, de forma vetorizada, a matriz paciente x OCI de elegibilidade.
+
+    Usa as colunas opcionais 'dt_nascimento' e 'sexo' do MIRA. A idade é
+    calculada na primeira data de solicitação do paciente (ou, na falta dela,
+    na primeira execução). Dado ausente não elimina o paciente: a OCI continua
+    candidata, mas fica marcada como não verificada.
+
+    Retorna:
+        {
+          'pacientes':  pd.Index de id_paciente (linhas da matriz),
+          'co_oci':     array de CO_OCI (colunas da matriz),
+          'elegivel':   matriz bool (False = fora da faixa de idade/sexo),
+          'verificado': matriz bool (True = idade e sexo conferidos)
+        }
+    """
+    colunas = ["id_paciente"] + [
+        c for c in ["dt_nascimento", "sexo", "dt_solicitacao", "dt_execucao"]
+        if c in df_mira.columns
+    ]
+    df = df_mira[colunas].copy()
+
+    for col in ["dt_nascimento", "dt_solicitacao", "dt_execucao"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        else:
+            df[col] = pd.NaT
+    if "sexo" not in df.columns:
+        df["sexo"] = ""
+
+    pacientes = df.groupby("id_paciente", sort=False).agg(
+        dt_nascimento=("dt_nascimento", "first"),
+        sexo=("sexo", "first"),
+        dt_solicitacao=("dt_solicitacao", "min"),
+        dt_execucao=("dt_execucao", "min"),
+    )
+
+    referencia = pacientes["dt_solicitacao"].fillna(pacientes["dt_execucao"])
+    idade = _idade_em_meses(pacientes["dt_nascimento"], referencia)
+    sexo_pac = (
+        pacientes["sexo"].fillna("").astype(str).str.strip().str.upper().str[:1]
+        .where(lambda s: s.isin(["M", "F"]), "")
+        .to_numpy(dtype=object)
+    )
+
+    idade_min = regras_idade_sexo["idade_minima"][None, :]
+    idade_max = regras_idade_sexo["idade_maxima"][None, :]
+    sexo_oci = regras_idade_sexo["sexo"][None, :]
+    sem_regra = ~regras_idade_sexo["com_regra"][None, :]
+
+    idade_conhecida = ~np.isnan(idade)[:, None]
+    idade_ok = (idade[:, None] >= idade_min) & (idade[:, None] <= idade_max)
+
+    sexo_indiferente = sexo_oci == "I"
+    sexo_conhecido = (sexo_pac != "")[:, None] | sexo_indiferente
+    sexo_ok = sexo_indiferente | (sexo_pac[:, None] == sexo_oci)
+
+    elegivel = (idade_ok | ~idade_conhecida) & (sexo_ok | ~sexo_conhecido)
+    verificado = (idade_conhecida & sexo_conhecido) | sem_regra
+
+    return {
+        "pacientes": pacientes.index,
+        "co_oci": regras_idade_sexo["co_oci"],
+        "elegivel": elegivel,
+        "verificado": verificado,
+    }
+
+
+def marcar_idade_sexo(oci_identificada: pd.DataFrame, elegibilidade: dict) -> pd.Series:
+    """
+    Retorna a coluna 'idade_sexo_compativel' para cada linha (id_paciente, id_pacote):
+    True quando idade e sexo foram conferidos e estão dentro da faixa da OCI.
+    """
+    linhas = elegibilidade["pacientes"].get_indexer(oci_identificada["id_paciente"])
+    colunas = pd.Index(elegibilidade["co_oci"]).get_indexer(
+        oci_identificada["id_pacote"].astype(str)
+    )
+
+    encontrado = (linhas >= 0) & (colunas >= 0)
+    compativel = np.zeros(len(oci_identificada), dtype=bool)
+    compativel[encontrado] = (
+        elegibilidade["verificado"][linhas[encontrado], colunas[encontrado]]
+        & elegibilidade["elegivel"][linhas[encontrado], colunas[encontrado]]
+    )
+
+    return pd.Series(compativel, index=oci_identificada.index, name="idade_sexo_compativel")
@@ -0,0 +1,253 @@
+# processamento/exportacao.py
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .metricas import cronometrar
+from .sessoes import compactar
+
+
+# ============================================================
+# Resultado em dataset Parquet particionado (para o BI)
+# ============================================================
+#
+# Layout (particionamento Hive):
+#
+#   <destino>/oci_identificada/competencia=2025-06/id_pacote=0901010014/parte-0.parquet
+#   <destino>/episodios/competencia=2025-06/id_pacote=0901010014/parte-0.parquet
+#
+# Cada competência é gravada inteira num diretório de versão
+# (<tabela>/.versoes/competencia=2025-06.<sufixo>, ignorado pela descoberta
+# por começar com '.') e publicada trocando o link simbólico
+# <tabela>/competencia=2025-06 com os.replace: quem lê vê a versão anterior
+# ou a nova, nunca uma competência pela metade ou ausente; reprocessar uma
+# competência só substitui a dela. Uma queda antes da troca deixa só uma
+# versão órfã, apagada na próxima gravação da competência.
+#
+# Sem links simbólicos (ex.: Windows sem permissão), a versão é trocada por
+# duas renomeações (_substituir_diretorio): entre elas a competência some
+# por um instante, e uma queda nesse intervalo deixa a anterior em
+# <tabela>/.substituida-*, devolvida ao lugar na próxima gravação.
+#
+# As duas tabelas são gravadas antes de qualquer troca, mas publicadas uma
+# depois da outra, não juntas: entre as duas trocas, quem lê pode ver a
+# oci_identificada nova com os episodios anteriores. Um gravador por destino
+# de cada vez.
+
+TABELAS = ["oci_identificada", "episodios"]
+
+PASTA_VERSOES = ".versoes"
+
+# Tipos das partições (sem eles, a descoberta lê '0901010014' como inteiro)
+ESQUEMA_PARTICOES = pa.schema([("competencia", pa.string()), ("id_pacote", pa.string())])
+
+COMPRESSAO_PARQUET = "zstd" if pa.Codec.is_available("zstd") else "snappy"
+
+
+def resumo_episodios(oci_identificada: pd.DataFrame) -> pd.DataFrame:
+    """
+    Uma linha por OCI de paciente (id_oci_paciente): episódio, cid_oci e
+    status_oci (ver adicionar_cid_e_status_oci), registros, executados,
+    primeira solicitação, primeira e última execução e se todas as linhas
+    têm CID compatível.
+    """
+    grupo = oci_identificada.groupby("id_oci_paciente", sort=False, observed=True)
+    resumo = grupo.agg(
+        id_paciente=("id_paciente", "first"),
+        id_pacote=("id_pacote", "first"),
+        no_oci=("no_oci", "first"),
+        episodio=("episodio", "first"),
+        cid_oci=("cid_oci", "first"),
+        status_oci=("status_oci", "first"),
+        registros=("id_registro", "size"),
+        executados=("dt_execucao", "count"),
+        dt_primeira_solicitacao=("dt_solicitacao", "min"),
+        dt_primeira_execucao=("dt_execucao", "min"),
+        dt_ultima_execucao=("dt_execucao", "max"),
+        cid_compativel=("cid_compativel", "all"),
+    )
+    return resumo.reset_index()
+
+
+def _valor_competencia(competencia_str: str) -> str:
+    """'06/2025' -> '2025-06' (ordenável, como nome de partição)."""
+    mes, ano = (int(p) for p in competencia_str.split("/"))
+    return f"{ano:04d}-{mes:02d}"
+
+
+def _tabela_arrow(df: pd.DataFrame) -> pa.Table:
+    """Colunas tipadas, textos repetidos em dicionário; id_pacote como texto."""
+    tabela = compactar(df)
+    i = tabela.schema.get_field_index("id_pacote")
+    return tabela.set_column(i, "id_pacote", tabela.column(i).cast(pa.string()))
+
+
+def _substituir_diretorio(tmp: str, final: str) -> None:
+    """
+    Troca 'final' por 'tmp' (duas renomeações; a antiga é apagada depois).
+    A antiga fica em .substituida-*/<nome de final> até o fim da troca (ver
+    _recuperar_substituidas).
+    """
+    antigo = None
+    if os.path.lexists(final):
+        antigo = tempfile.mkdtemp(prefix=".substituida-", dir=os.path.dirname(final))
+        os.rename(final, os.path.join(antigo, os.path.basename(final)))
+    os.rename(tmp, final)
+    if antigo is not None:
+        shutil.rmtree(antigo, ignore_errors=True)
+
+
+def _recuperar_substituidas(dir_tabela: str) -> None:
+    """
+    Devolve ao lugar as competências deixadas em .substituida-* por uma
+    troca interrompida (_substituir_diretorio) e apaga o resto.
+    """
+    for nome in os.listdir(dir_tabela):
+        if not nome.startswith(".substituida-"):
+            continue
+        antigo = os.path.join(dir_tabela, nome)
+        for particao in os.listdir(antigo):
+            if not os.path.lexists(os.path.join(dir_tabela, particao)):
+                os.rename(os.path.join(antigo, particao), os.path.join(dir_tabela, particao))
+        shutil.rmtree(antigo, ignore_errors=True)
+
+
+def _publicar(dir_tabela: str, particao: str, versao: str) -> None:
+    """
+    Publica o diretório 'versao' (em .versoes) como <dir_tabela>/<particao>:
+    um link simbólico novo substitui o atual com os.replace (atômico). A
+    versão substituída fica até a gravação seguinte (leituras já abertas
+    terminam nela, ver abrir_dataset); as mais antigas são apagadas.
+    """
+    final = os.path.join(dir_tabela, particao)
+    anterior = os.path.realpath(final) if os.path.islink(final) else None
+    link = os.path.join(dir_tabela, f".{particao}-{uuid.uuid4().hex[:8]}.link")
+    try:
+        os.symlink(os.path.relpath(versao, dir_tabela), link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        # Sem links simbólicos: a própria versão vai para o lugar
+        _substituir_diretorio(versao, final)
+    else:
+        try:
+            if os.path.isdir(final) and not os.path.islink(final):
+                # Diretório comum (gravado sem link): troca por renomeação
+                _substituir_diretorio(link, final)
+            else:
+                os.replace(link, final)
+        except Exception:
+            os.unlink(link)
+            raise
+
+    dir_versoes = os.path.dirname(versao)
+    for nome in os.listdir(dir_versoes):
+        caminho = os.path.join(dir_versoes, nome)
+        if nome.startswith(f"{particao}.") and caminho not in (versao, anterior):
+            shutil.rmtree(caminho, ignore_errors=True)
+
+
+def gravar_dataset(
+    destino: str,
+    competencia_str: str,
+    oci_identificada: pd.DataFrame,
+    episodios: pd.DataFrame = None,
+    versao_regras: str = None,
+) -> dict:
+    """
+    Grava (ou substitui) a competência 'MM/AAAA' em <destino>/<tabela>,
+    particionada por id_pacote. episodios: padrão resumo_episodios.
+    versao_regras: versão das bases/regras usada, gravada na coluna
+    'versao_regras' das duas tabelas.
+    Retorna {tabela: diretório da competência}.
+    """
+    if episodios is None:
+        episodios = resumo_episodios(oci_identificada)
+    if versao_regras is not None:
+        oci_identificada = oci_identificada.assign(versao_regras=versao_regras)
+        episodios = episodios.assign(versao_regras=versao_regras)
+    particao = f"competencia={_valor_competencia(competencia_str)}"
+    formato = ds.ParquetFileFormat()
+    opcoes = formato.make_write_options(compression=COMPRESSAO_PARQUET, use_dictionary=True)
+
+    gravados = {}
+    with cronometrar("exportacao", origem="lote"):
+        # Grava as duas tabelas antes de publicar qualquer uma
+        versoes = {}
+        try:
+            for nome, df in zip(TABELAS, [oci_identificada, episodios]):
+                dir_tabela = os.path.join(destino, nome)
+                dir_versoes = os.path.join(dir_tabela, PASTA_VERSOES)
+                os.makedirs(dir_versoes, exist_ok=True)
+                _recuperar_substituidas(dir_tabela)
+                versoes[nome] = tempfile.mkdtemp(prefix=f"{particao}.", dir=dir_versoes)
+                ds.write_dataset(
+                    _tabela_arrow(df),
+                    versoes[nome],
+                    format=formato,
+                    file_options=opcoes,
+                    partitioning=ds.partitioning(
+                        pa.schema([ESQUEMA_PARTICOES.field("id_pacote")]), flavor="hive"
+                    ),
+                    basename_template="parte-{i}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+        except Exception:
+            for versao in versoes.values():
+                shutil.rmtree(versao, ignore_errors=True)
+            raise
+
+        for nome, versao in versoes.items():
+            dir_tabela = os.path.join(destino, nome)
+            _publicar(dir_tabela, particao, versao)
+            gravados[nome] = os.path.join(dir_tabela, particao)
+    return gravados
+
+
+def abrir_dataset(destino: str, tabela: str = "oci_identificada") -> ds.Dataset:
+    """
+    Dataset de <destino>/<tabela> com as partições tipadas como texto
+    (as versões e os temporários, com '.' no início, são ignorados).
+    O link de cada competência é resolvido uma vez: a leitura fica na versão
+    publicada na abertura, mesmo que a competência seja regravada depois.
+    Filtros nas partições só leem os diretórios necessários, ex.:
+        abrir_dataset(d).to_table(filter=ds.field("competencia") == "2025-06")
+    """
+    raiz = os.path.join(destino, tabela)
+    por_pacote = ds.partitioning(pa.schema([ESQUEMA_PARTICOES.field("id_pacote")]), flavor="hive")
+    caminhos, particoes, esquema = [], [], None
+    for nome in sorted(os.listdir(raiz)) if os.path.isdir(raiz) else []:
+        if not nome.startswith("competencia="):
+            continue
+        versao = ds.dataset(
+            os.path.realpath(os.path.join(raiz, nome)), format="parquet", partitioning=por_pacote
+        )
+        competencia = ds.field("competencia") == nome.split("=", 1)[1]
+        for fragmento in versao.get_fragments():
+            caminhos.append(fragmento.path)
+            particoes.append(competencia & fragmento.partition_expression)
+        if esquema is None and caminhos:
+            esquema = versao.schema
+
+    if esquema is None:
+        return ds.dataset(
+            raiz,
+            format="parquet",
+            partitioning=ds.partitioning(ESQUEMA_PARTICOES, flavor="hive"),
+        )
+    # Colunas dos arquivos e, no fim, as partições (como na descoberta Hive)
+    esquema = esquema.remove(esquema.get_field_index("id_pacote"))
+    for campo in ESQUEMA_PARTICOES:
+        esquema = esquema.append(campo)
+    return ds.FileSystemDataset.from_paths(
+        caminhos,
+        schema=esquema,
+        format=ds.ParquetFileFormat(),
+        filesystem=versao.filesystem,
+        partitions=particoes,
+    )
@@ -0,0 +1,158 @@
+# processamento/historico.py
+# -*- coding: utf-8 -*-
+
+import bisect
+import hashlib
+import io
+import os
+import re
+
+import pandas as pd
+
+from .artefato import BASES, compilar_regras
+
+
+# ============================================================
+# Regras por competência (versões anteriores do SIGTAP lado a lado)
+# ============================================================
+#
+# Layout:
+#
+#   bases_auxiliares/                  versão atual (todas as bases)
+#   bases_auxiliares/historico/2025-03/   pacotes.csv, cid.csv, oci_nome.csv
+#   bases_auxiliares/historico/2025-08/   ... (só as bases que mudaram)
+#
+# Cada pasta do histórico traz as bases válidas ATÉ a competência do nome
+# (inclusive): ao atualizar o SIGTAP, as bases antigas vão para
+# historico/<última competência em que valeram>. A competência C usa a
+# primeira pasta com nome >= C; depois da última, a versão atual. Bases
+# ausentes na pasta vêm da atual.
+#
+# Todas as versões ficam carregadas: trocar de competência é uma consulta.
+# Arquivos de mesmo conteúdo são lidos uma vez e compartilhados entre as
+# versões, e as regras compiladas (máscaras, idade/sexo, CBO) também, quando as
+# bases de que dependem são iguais, ex.: mudou só o cid.csv.
+#
+# Limitação: o compartilhamento é por arquivo inteiro (mesmo conteúdo) e por
+# conjunto de regras inteiro. Uma versão que difere em uma linha do
+# pacotes.csv tem suas próprias máscaras e vocabulários (procedimentos, CID)
+# em memória, mesmo que quase todos os códigos coincidam com os da atual. As
+# versões do histórico também não usam o artefato mapeado em memória
+# (artefato.py): são lidas dos CSV e compiladas ao carregar. Com poucas
+# versões e bases de alguns MB isso é pequeno; se o histórico crescer, o
+# caminho é um vocabulário único entre versões (um Index compartilhado,
+# máscaras indexadas por código inteiro) e um artefato por versão.
+
+PASTA_HISTORICO = "historico"
+
+_NOME_PASTA = re.compile(r"^\d{4}-\d{2}$")
+
+# Bases de que compilar_regras depende
+BASES_COMPILADAS = ["pacotes", "df_pate", "idade_sexo", "cbo"]
+
+
+def listar_historico(base_path: str) -> list:
+    """[(competência 'AAAA-MM', pasta)] do histórico, em ordem."""
+    raiz = os.path.join(base_path, PASTA_HISTORICO)
+    if not os.path.isdir(raiz):
+        return []
+    return [
+        (nome, os.path.join(raiz, nome))
+        for nome in sorted(os.listdir(raiz))
+        if _NOME_PASTA.match(nome) and os.path.isdir(os.path.join(raiz, nome))
+    ]
+
+
+def arquivos_da_versao(base_path: str, pasta: str = None) -> dict:
+    """{base: caminho do CSV}: o da pasta do histórico, se houver; senão o atual."""
+    arquivos = {}
+    for nome in BASES:
+        for origem in ([pasta] if pasta else []) + [base_path]:
+            caminho = os.path.join(origem, f"{nome}.csv")
+            if os.path.exists(caminho):
+                arquivos[nome] = caminho
+                break
+    return arquivos
+
+
+def _ler_conteudos(arquivos: dict) -> dict:
+    conteudos = {}
+    for nome, caminho in arquivos.items():
+        with open(caminho, "rb") as f:
+            conteudos[nome] = f.read()
+    return conteudos
+
+
+def _versao(conteudos: dict, nomes=BASES) -> str:
+    """Mesmo hash de artefato.versao_bases, sobre os conteúdos de 'nomes'."""
+    h = hashlib.sha256()
+    for nome in nomes:
+        if nome in conteudos:
+            h.update(nome.encode())
+            h.update(conteudos[nome])
+    return h.hexdigest()[:16]
+
+
+def versoes_do_historico(base_path: str) -> list:
+    """[(competência, versão)] do histórico, sem carregar as bases."""
+    return [
+        (ate, _versao(_ler_conteudos(arquivos_da_versao(base_path, pasta))))
+        for ate, pasta in listar_historico(base_path)
+    ]
+
+
+def carregar_historico(base_path: str, atual: dict) -> list:
+    """
+    Versões do histórico, em ordem de competência:
+        [{'ate': 'AAAA-MM', 'versao', 'bases', 'regras'}]
+    atual: versão atual já carregada ({'versao', 'bases', 'regras'}); bases
+    e regras iguais às dela (ou às de outra versão) são reaproveitadas.
+    """
+    historico = listar_historico(base_path)
+    if not historico:
+        return []
+
+    conteudos_atual = _ler_conteudos(arquivos_da_versao(base_path))
+    # hash do conteúdo -> DataFrame / versão das bases compiladas -> regras
+    bases_lidas = {
+        hashlib.sha256(conteudos_atual[nome]).digest(): df
+        for nome, df in atual["bases"].items() if nome in conteudos_atual
+    }
+    regras_compiladas = {_versao(conteudos_atual, BASES_COMPILADAS): atual["regras"]}
+
+    versoes = []
+    for ate, pasta in historico:
+        conteudos = _ler_conteudos(arquivos_da_versao(base_path, pasta))
+        versao = _versao(conteudos)
+        if versao == atual["versao"]:
+            versoes.append({"ate": ate, "versao": versao,
+                            "bases": atual["bases"], "regras": atual["regras"]})
+            continue
+
+        bases = {}
+        for nome, conteudo in conteudos.items():
+            chave = hashlib.sha256(conteudo).digest()
+            if chave not in bases_lidas:
+                bases_lidas[chave] = pd.read_csv(io.BytesIO(conteudo), dtype=str)
+            bases[nome] = bases_lidas[chave]
+
+        chave_regras = _versao(conteudos, BASES_COMPILADAS)
+        if chave_regras not in regras_compiladas:
+            regras_compiladas[chave_regras] = compilar_regras(bases)
+        versoes.append({"ate": ate, "versao": versao,
+                        "bases": bases, "regras": regras_compiladas[chave_regras]})
+    return versoes
+
+
+def versao_da_competencia(conjunto: dict, competencia_str: str = None) -> dict:
+    """
+    Versão ({'versao', 'bases', 'regras'}) que vale na competência 'MM/AAAA'
+    de um conjunto carregado (recarga.carregar_versao / bases_vigentes):
+    a primeira do histórico com 'ate' >= competência; senão, a atual.
+    """
+    historico = conjunto.get("historico") or []
+    if competencia_str is None or not historico:
+        return conjunto
+    mes, ano = (int(p) for p in competencia_str.split("/"))
+    i = bisect.bisect_left([v["ate"] for v in historico], f"{ano:04d}-{mes:02d}")
+    return historico[i] if i < len(historico) else conjunto
@@ -0,0 +1,325 @@
+# processamento/ingestao.py
+# -*- coding: utf-8 -*-
+
+import codecs
+import hashlib
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from pandas.api.types import union_categoricals
+
+
+# ============================================================
+# Leitura do arquivo MIRA (CSV / XLSX / XLS, puros ou compactados)
+# ============================================================
+
+# Colunas do modelo (aba Instruções) e opcionais usadas no processamento.
+# As demais colunas do arquivo não são lidas.
+COLUNAS_MIRA = [
+    "id_registro",
+    "id_paciente",
+    "co_procedimento",
+    "dt_solicitacao",
+    "dt_execucao",
+    "cbo_executante",
+    "cid_motivo",
+]
+COLUNAS_OPCIONAIS = ["dt_nascimento", "sexo"]
+
+SEPARADORES = [";", ",", "\t", "|"]
+
+# Bytes do início do arquivo usados para detectar codificação e separador
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Bloco do leitor CSV do Arrow: o arquivo é lido e convertido bloco a bloco
+TAMANHO_BLOCO_CSV = 4 * 1024 * 1024
+
+# Extensão -> compressão de fluxo (um arquivo por fluxo; .zip é tratado à parte)
+COMPRESSOES = {".gz": "gzip", ".zst": "zstd"}
+
+# Vários arquivos: coluna com o nome do arquivo de cada linha e número
+# máximo de arquivos lidos ao mesmo tempo
+COLUNA_ORIGEM = "arquivo_origem"
+MAX_LEITURAS_SIMULTANEAS = 4
+
+
+def detectar_codificacao(amostra: bytes) -> str:
+    """
+    'utf-8-sig' (com BOM), 'utf-8' ou 'latin1', a partir dos primeiros bytes.
+    Um caractere multibyte cortado no fim da amostra não conta como erro.
+    """
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin1"
+
+
+def detectar_separador(cabecalho: str) -> str:
+    """Separador mais frequente na linha de cabeçalho (';' em caso de empate)."""
+    contagem = {sep: cabecalho.count(sep) for sep in SEPARADORES}
+    melhor = max(SEPARADORES, key=lambda sep: contagem[sep])
+    return melhor if contagem[melhor] > 0 else ";"
+
+
+def _projetar(colunas_arquivo, todas_colunas: bool = False) -> list:
+    """
+    Colunas a ler (modelo + opcionais presentes, ou todas se todas_colunas),
+    na ordem do arquivo. Levanta ValueError se faltar alguma coluna do modelo.
+    """
+    faltantes = [c for c in COLUNAS_MIRA if c not in colunas_arquivo]
+    if faltantes:
+        raise ValueError(
+            "Colunas obrigatórias ausentes no arquivo: " + ", ".join(faltantes)
+        )
+    if todas_colunas:
+        return list(colunas_arquivo)
+    desejadas = set(COLUNAS_MIRA + COLUNAS_OPCIONAIS)
+    return [c for c in colunas_arquivo if c in desejadas]
+
+
+def _abrir_fluxo(conteudo: bytes, compressao: str = None):
+    """
+    Fluxo binário (com read/close) sobre o conteúdo, descompactando sob
+    demanda: o arquivo descompactado nunca fica inteiro em memória.
+    """
+    if compressao is None:
+        return io.BytesIO(conteudo)
+    if pa.Codec.is_available(compressao):
+        return pa.input_stream(pa.py_buffer(conteudo), compression=compressao)
+    # pyarrow compilado sem zstd: extra opcional zstandard
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Arquivos .zst exigem pyarrow com zstd ou o pacote zstandard.") from None
+    return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(conteudo))
+
+
+def ler_csv_mira(conteudo: bytes, todas_colunas: bool = False, compressao: str = None) -> pd.DataFrame:
+    """
+    Lê o CSV do MIRA como texto, só com as colunas usadas (ou com todas,
+    se todas_colunas).
+
+    Codificação e separador vêm da amostra inicial. Usa o leitor CSV
+    multithread do Arrow (tipos fixados em string, para não perder zeros
+    à esquerda). Se aparecer
+    um byte inválido em UTF-8 depois da amostra, relê em latin1.
+
+    compressao: None, 'gzip' ou 'zstd'. O conteúdo compactado é
+    descompactado em fluxo direto no parser, bloco a bloco.
+    """
+    return _ler_csv_fluxo(lambda: _abrir_fluxo(conteudo, compressao), todas_colunas)
+
+
+def _ler_csv_fluxo(abrir, todas_colunas: bool = False) -> pd.DataFrame:
+    """ler_csv_mira sobre abrir(), que devolve um fluxo novo a cada chamada."""
+    with abrir() as fluxo:
+        amostra = fluxo.read(TAMANHO_AMOSTRA)
+    codificacao = detectar_codificacao(amostra)
+    primeira_linha = amostra.decode(codificacao, errors="replace").splitlines()[0] if amostra else ""
+    sep = detectar_separador(primeira_linha)
+    colunas = _projetar([c.strip().strip('"') for c in primeira_linha.split(sep)], todas_colunas)
+
+    try:
+        return _ler_csv(abrir, codificacao, sep, colunas)
+    except ValueError as erro:  # UnicodeDecodeError e ArrowInvalid são ValueError
+        if codificacao == "latin1" or "utf" not in str(erro).lower():
+            raise
+        return _ler_csv(abrir, "latin1", sep, colunas)
+
+
+def _ler_csv(abrir, codificacao: str, sep: str, colunas: list) -> pd.DataFrame:
+    with abrir() as fluxo:
+        tabela = pa_csv.read_csv(
+            fluxo,
+            read_options=pa_csv.ReadOptions(
+                encoding=codificacao.replace("-sig", ""), block_size=TAMANHO_BLOCO_CSV
+            ),
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=colunas,
+                column_types={c: pa.string() for c in colunas},
+                strings_can_be_null=True,
+            ),
+        )
+    # Mesmo dtype de read_csv(dtype=str): StringDtype com NaN como ausente
+    tipo_texto = pd.StringDtype(na_value=float("nan"))
+    return tabela.to_pandas(types_mapper={pa.string(): tipo_texto}.get)
+
+
+def ler_xlsx_mira(conteudo: bytes, todas_colunas: bool = False) -> pd.DataFrame:
+    """
+    Lê a primeira planilha do .xlsx em modo somente leitura (streaming do
+    openpyxl, sem montar o modelo de estilos/células), só com as colunas
+    usadas. Valores viram texto como em read_excel(dtype=str).
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [str(c).strip() if c is not None else "" for c in next(linhas, ())]
+        colunas = _projetar(cabecalho, todas_colunas)
+        posicoes = [cabecalho.index(c) for c in colunas]
+
+        valores = {c: [] for c in colunas}
+        for linha in linhas:
+            if linha is None or all(v is None for v in linha):
+                continue
+            for c, pos in zip(colunas, posicoes):
+                v = linha[pos] if pos < len(linha) else None
+                valores[c].append(None if v is None or v == "" else str(v))
+    finally:
+        wb.close()
+
+    return pd.DataFrame(valores, columns=colunas, dtype=str)
+
+
+def ler_zip_mira(conteudo: bytes, nome_arquivo: str, todas_colunas: bool = False) -> pd.DataFrame:
+    """
+    Lê os arquivos MIRA de dentro do .zip. Os CSV são descompactados em
+    fluxo direto no parser; com mais de um arquivo, as linhas são juntadas
+    como em ler_arquivos_mira (origem 'arquivo.zip/membro.csv').
+    """
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as zf:
+        membros = [
+            m for m in zf.infolist()
+            if not m.is_dir() and not m.filename.startswith("__MACOSX/")
+            and _formato_suportado(m.filename)
+        ]
+        if not membros:
+            raise ValueError(f"Nenhum arquivo CSV/XLSX dentro de {nome_arquivo}.")
+        partes = []
+        for m in membros:
+            try:
+                if m.filename.lower().endswith(".csv"):
+                    partes.append(_ler_csv_fluxo(lambda m=m: zf.open(m), todas_colunas))
+                else:
+                    partes.append(ler_arquivo_mira(zf.read(m), m.filename, todas_colunas))
+            except ValueError as erro:
+                raise ValueError(f"{m.filename}: {erro}") from erro
+
+    if len(partes) == 1:
+        return partes[0]
+    return _juntar(partes, [f"{nome_arquivo}/{m.filename}" for m in membros])
+
+
+def _formato_suportado(nome_arquivo: str) -> bool:
+    """Membro de .zip que é um arquivo MIRA (CSV/planilha, compactado ou não)."""
+    return nome_arquivo.lower().endswith((".csv", ".xlsx", ".xls", *COMPRESSOES))
+
+
+def ler_arquivo_mira(conteudo: bytes, nome_arquivo: str, todas_colunas: bool = False) -> pd.DataFrame:
+    """
+    Lê o arquivo MIRA pelo formato indicado na extensão do nome: .csv,
+    .xlsx, .xls, .zip (um ou mais arquivos dentro) ou compactados em
+    .gz/.zst ('mira.csv.gz'; sem outra extensão, o conteúdo é tratado
+    como CSV).
+    todas_colunas: mantém também as colunas que o processamento não usa
+    (ex.: ferramentas que regravam o arquivo).
+    Levanta ValueError para formato não suportado ou colunas ausentes.
+    """
+    nome = nome_arquivo.lower()
+    for ext, compressao in COMPRESSOES.items():
+        if nome.endswith(ext):
+            interno = nome_arquivo[: -len(ext)]
+            if interno.lower().endswith((".xlsx", ".xls")):
+                # planilha precisa do arquivo inteiro (já é um zip por dentro)
+                with _abrir_fluxo(conteudo, compressao) as fluxo:
+                    return ler_arquivo_mira(fluxo.read(), interno, todas_colunas)
+            return ler_csv_mira(conteudo, todas_colunas, compressao)
+    if nome.endswith(".zip"):
+        return ler_zip_mira(conteudo, nome_arquivo, todas_colunas)
+    if nome.endswith(".csv"):
+        return ler_csv_mira(conteudo, todas_colunas)
+    if nome.endswith(".xlsx"):
+        return ler_xlsx_mira(conteudo, todas_colunas)
+    if nome.endswith(".xls"):
+        df = pd.read_excel(io.BytesIO(conteudo), dtype=str)
+        return df[_projetar(list(df.columns), todas_colunas)]
+    raise ValueError(
+        "Formato de arquivo não reconhecido. Envie CSV (com ';') ou XLSX, "
+        "puros ou compactados (.zip, .gz, .zst)."
+    )
+
+
+# ============================================================
+# Vários arquivos (um por unidade ou por mês) como um só MIRA
+# ============================================================
+
+def hash_conteudo(arquivos: list) -> str:
+    """
+    Hash (hexadecimal) do conjunto de arquivos [(nome, conteudo), ...],
+    independente da ordem de envio: serve de chave de cache da leitura.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for nome, conteudo in sorted(arquivos, key=lambda a: a[0]):
+        h.update(nome.encode("utf-8"))
+        h.update(len(conteudo).to_bytes(8, "little"))
+        h.update(conteudo)
+    return h.hexdigest()
+
+
+def _ler_um(arquivo: tuple) -> pd.DataFrame:
+    nome, conteudo = arquivo
+    try:
+        return ler_arquivo_mira(conteudo, nome)
+    except ValueError as erro:
+        raise ValueError(f"{nome}: {erro}") from erro
+
+
+def ler_arquivos_mira(arquivos: list) -> pd.DataFrame:
+    """
+    Lê os arquivos [(nome, conteudo), ...] ao mesmo tempo (um thread por
+    arquivo, até MAX_LEITURAS_SIMULTANEAS) e junta as linhas em um único
+    DataFrame, na ordem dos nomes.
+
+    As colunas são a união das colunas lidas (uma coluna opcional ausente em
+    um arquivo fica vazia nas linhas dele). Com mais de um arquivo, a coluna
+    COLUNA_ORIGEM (categórica) indica o arquivo de cada linha.
+    Erros de leitura levantam ValueError com o nome do arquivo.
+    """
+    arquivos = sorted(arquivos, key=lambda a: a[0])
+    if len(arquivos) == 1:
+        return _ler_um(arquivos[0])
+
+    with ThreadPoolExecutor(max_workers=min(len(arquivos), MAX_LEITURAS_SIMULTANEAS)) as pool:
+        partes = list(pool.map(_ler_um, arquivos))
+
+    return _juntar(partes, [nome for nome, _ in arquivos])
+
+
+def _juntar(partes: list, nomes: list) -> pd.DataFrame:
+    """
+    Concatena as partes alinhando os esquemas (coluna ausente entra vazia,
+    com o dtype das demais) e preenche COLUNA_ORIGEM com o nome de cada
+    parte (ou mantém a origem que a parte já trouxer, ex.: membros de .zip).
+    """
+    tipos = {}
+    for parte in partes:
+        for col, tipo in parte.dtypes.items():
+            if col != COLUNA_ORIGEM:
+                tipos.setdefault(col, tipo)
+    origens = [
+        parte[COLUNA_ORIGEM] if COLUNA_ORIGEM in parte.columns
+        else pd.Categorical.from_codes(np.zeros(len(parte), dtype=np.int8), categories=[nome])
+        for parte, nome in zip(partes, nomes)
+    ]
+    partes = [
+        parte.assign(**{
+            col: pd.Series(index=parte.index, dtype=tipo)
+            for col, tipo in tipos.items() if col not in parte.columns
+        })[list(tipos)]
+        for parte in partes
+    ]
+
+    df = pd.concat(partes, ignore_index=True)
+    df[COLUNA_ORIGEM] = union_categoricals(origens)  # nomes podem repetir
+    return df
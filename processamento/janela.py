@@ -0,0 +1,146 @@
+# processamento/janela.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# Fechamento de pacote dentro de uma janela máxima de dias
+# ============================================================
+
+def ler_janela_dias(regras_pacote: pd.DataFrame):
+    """
+    Lê a janela máxima (em dias) de um pacote a partir da coluna opcional
+    'JANELA_DIAS' de pacotes.csv. Retorna None quando não configurada.
+    """
+    if "JANELA_DIAS" not in regras_pacote.columns:
+        return None
+
+    janela = pd.to_numeric(regras_pacote["JANELA_DIAS"], errors="coerce").dropna()
+    if janela.empty:
+        return None
+
+    return int(janela.max())
+
+
+def _requisitos_por_procedimento(grupos: dict) -> dict:
+    """
+    { co_procedimento: [índices dos requisitos que ele satisfaz] }
+    Cada item do grupo_e é um requisito; cada grupo_ou é um requisito.
+    """
+    requisitos = {}
+    idx = 0
+    for proc in grupos["grupo_e"]:
+        requisitos.setdefault(str(proc).strip(), []).append(idx)
+        idx += 1
+    for lista_ou in grupos["grupo_ou"]:
+        for proc in lista_ou:
+            requisitos.setdefault(str(proc).strip(), []).append(idx)
+        idx += 1
+    return requisitos
+
+
+def _varrer_linha_do_tempo(datas: np.ndarray, requisitos_linhas: list, n_requisitos: int,
+                           janela: np.timedelta64) -> np.ndarray:
+    """
+    Varredura com janela deslizante sobre a linha do tempo ordenada de um
+    paciente para uma OCI. Retorna, para cada linha, o número do episódio
+    (1, 2, ...) ou 0 se a linha não entrou em nenhum episódio fechado.
+
+    Ao fechar um episódio, as linhas seguintes que ainda caem na janela
+    (contada a partir da primeira linha do episódio) são anexadas a ele e a
+    busca recomeça depois delas.
+    """
+    n = len(datas)
+    episodio = np.zeros(n, dtype=np.int64)
+    contagem = np.zeros(n_requisitos, dtype=np.int64)
+    satisfeitos = 0
+    numero = 0
+    esquerda = 0
+    direita = 0
+
+    while direita < n:
+        for r in requisitos_linhas[direita]:
+            if contagem[r] == 0:
+                satisfeitos += 1
+            contagem[r] += 1
+
+        while datas[direita] - datas[esquerda] > janela:
+            for r in requisitos_linhas[esquerda]:
+                contagem[r] -= 1
+                if contagem[r] == 0:
+                    satisfeitos -= 1
+            esquerda += 1
+
+        if satisfeitos == n_requisitos:
+            numero += 1
+            limite = datas[esquerda] + janela
+            fim = direita + 1
+            while fim < n and datas[fim] <= limite:
+                fim += 1
+            episodio[esquerda:fim] = numero
+
+            contagem[:] = 0
+            satisfeitos = 0
+            esquerda = direita = fim
+            continue
+
+        direita += 1
+
+    return episodio
+
+
+def separar_episodios(oci_identificada: pd.DataFrame, regras_pacotes: dict) -> pd.DataFrame:
+    """
+    Para os pacotes com 'janela_dias' configurada, reavalia o fechamento sobre
+    a linha do tempo de cada paciente (data = dt_execucao, ou dt_solicitacao
+    quando ainda não executado). Só ficam as linhas que compõem algum episódio
+    cujo primeiro e último procedimento obrigatório distam no máximo a janela;
+    linhas sem data não podem ser situadas e saem desses pacotes.
+
+    Adiciona a coluna 'episodio' (1 para pacotes sem janela), permitindo mais
+    de um episódio da mesma OCI para o mesmo paciente.
+    """
+    df = oci_identificada
+    df["episodio"] = 1
+
+    com_janela = {
+        id_pacote: grupos for id_pacote, grupos in regras_pacotes.items()
+        if grupos.get("janela_dias") is not None
+    }
+    if not com_janela or df.empty:
+        return df
+
+    data = df["dt_execucao"].fillna(df["dt_solicitacao"])
+    avaliar = df["id_pacote"].isin(com_janela) & data.notna()
+    descartar = df["id_pacote"].isin(com_janela) & data.isna()
+
+    sub = df.loc[avaliar, ["id_paciente", "id_pacote", "co_procedimento"]].assign(_data=data[avaliar])
+    sub = sub.sort_values(["id_pacote", "id_paciente", "_data"], kind="stable")
+
+    requisitos = {
+        id_pacote: _requisitos_por_procedimento(grupos)
+        for id_pacote, grupos in com_janela.items()
+    }
+    datas = sub["_data"].to_numpy()
+    procedimentos = sub["co_procedimento"].to_numpy()
+
+    episodios = np.zeros(len(sub), dtype=np.int64)
+    inicio = 0
+    for (id_pacote, _), n_linhas in sub.groupby(["id_pacote", "id_paciente"], sort=False).size().items():
+        fim = inicio + n_linhas
+        grupos = com_janela[id_pacote]
+
+        episodios[inicio:fim] = _varrer_linha_do_tempo(
+            datas[inicio:fim],
+            [requisitos[id_pacote].get(p, []) for p in procedimentos[inicio:fim]],
+            len(grupos["grupo_e"]) + len(grupos["grupo_ou"]),
+            np.timedelta64(grupos["janela_dias"], "D"),
+        )
+        inicio = fim
+
+    df.loc[sub.index, "episodio"] = episodios
+    descartar = descartar | (df["episodio"] == 0)
+
+    return df[~descartar]
@@ -0,0 +1,279 @@
+# processamento/mascaras.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# Regras compiladas em máscaras de bits (um bit por grupo obrigatório)
+# ============================================================
+
+# Linhas (pares paciente x procedimento) reunidas por vez em avaliar_mascaras
+LINHAS_POR_BLOCO = 16384
+
+_BITS_POR_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _contar_bits(x: np.ndarray) -> np.ndarray:
+    """Popcount elemento a elemento de um array uint64 (uint8: no máximo 64)."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    por_byte = _BITS_POR_BYTE[x.view(np.uint8)].reshape(x.shape + (8,))
+    return por_byte.sum(axis=-1, dtype=np.uint8)
+
+
+def compilar_mascaras(regras_pacotes: dict, nomes_procedimento: dict = None) -> dict:
+    """
+    Compila o dicionário de regras (preparar_regras) em máscaras de bits.
+
+    Cada OCI tem um bit por requisito obrigatório: um por item do grupo_e e
+    um por grupo_ou. Para cada procedimento, 'mascaras[p, k]' traz os bits
+    da OCI k que ele satisfaz.
+
+    Retorna:
+        {
+          'co_oci':        array de CO_OCI (colunas),
+          'procedimentos': pd.Index dos códigos (linhas de 'mascaras'),
+          'mascaras':      matriz uint64 (procedimentos x OCI),
+          'completa':      máscara com todos os requisitos de cada OCI,
+          'n_requisitos':  número de requisitos de cada OCI,
+          'rotulos':       [[descrição do requisito j da OCI k]]
+        }
+    """
+    nomes_procedimento = nomes_procedimento or {}
+
+    def _rotulo_proc(proc):
+        codigo, _, cbo = proc.partition("|")
+        nome = nomes_procedimento.get(codigo)
+        rotulo = f"{codigo} - {nome}" if nome else codigo
+        return f"{rotulo} (CBO {cbo})" if cbo else rotulo
+
+    co_oci = np.asarray(list(regras_pacotes), dtype=object)
+    bits = {}
+    rotulos = []
+    n_requisitos = np.zeros(len(co_oci), dtype=np.int64)
+
+    for k, id_pacote in enumerate(co_oci):
+        grupos = regras_pacotes[id_pacote]
+        rotulos_oci = []
+
+        requisitos = [[p] for p in grupos["grupo_e"]] + list(grupos["grupo_ou"])
+        if len(requisitos) > 64:
+            raise ValueError(f"OCI {id_pacote} tem mais de 64 requisitos obrigatórios.")
+
+        nomes_ou = grupos.get("nomes_ou", [])
+        for j, procs in enumerate(requisitos):
+            for proc in procs:
+                chave = (str(proc).strip(), k)
+                bits[chave] = bits.get(chave, 0) | (1 << j)
+
+            j_ou = j - len(grupos["grupo_e"])
+            if j_ou < 0 or len(procs) == 1:
+                rotulos_oci.append(_rotulo_proc(str(procs[0]).strip()))
+            else:
+                nome = nomes_ou[j_ou] if j_ou < len(nomes_ou) else f"grupo {j_ou + 1}"
+                rotulos_oci.append(f"{nome} (uma das {len(procs)} opções)")
+
+        n_requisitos[k] = len(requisitos)
+        rotulos.append(rotulos_oci)
+
+    procedimentos = pd.Index(sorted({proc for proc, _ in bits}))
+    mascaras = np.zeros((len(procedimentos), len(co_oci)), dtype=np.uint64)
+    if bits:
+        linhas = procedimentos.get_indexer([proc for proc, _ in bits])
+        colunas = np.fromiter((k for _, k in bits), dtype=np.int64, count=len(bits))
+        mascaras[linhas, colunas] = np.fromiter(bits.values(), dtype=np.uint64, count=len(bits))
+
+    completa = np.array(
+        [(1 << int(n)) - 1 for n in n_requisitos], dtype=np.uint64
+    )
+
+    return {
+        "co_oci": co_oci,
+        "procedimentos": procedimentos,
+        "mascaras": mascaras,
+        "completa": completa,
+        "n_requisitos": n_requisitos,
+        "rotulos": rotulos,
+    }
+
+
+def avaliar_mascaras(df_procedimentos: pd.DataFrame, compilado: dict) -> dict:
+    """
+    Calcula, para cada paciente, a máscara de requisitos satisfeitos em cada
+    OCI (OR das máscaras dos seus procedimentos) e quantos foram satisfeitos.
+
+    Retorna:
+        {
+          'pacientes':   pd.Index de id_paciente (linhas),
+          'mascara':     matriz uint64 (pacientes x OCI),
+          'satisfeitos': matriz uint8 (pacientes x OCI)
+        }
+    """
+    codigos_pac, pacientes = pd.factorize(df_procedimentos["id_paciente"])
+    idx_proc = compilado["procedimentos"].get_indexer(df_procedimentos["co_procedimento"])
+
+    relevante = idx_proc >= 0
+    codigos_pac = codigos_pac[relevante]
+    idx_proc = idx_proc[relevante]
+
+    mascara = np.zeros((len(pacientes), len(compilado["co_oci"])), dtype=np.uint64)
+
+    # Pares (paciente, procedimento) distintos, já ordenados por paciente.
+    # As linhas das máscaras são reunidas em blocos, para o pico de memória
+    # não crescer com o tamanho do arquivo (bloco x OCI x 8 bytes).
+    n_proc = len(compilado["procedimentos"])
+    pares = np.unique(codigos_pac.astype(np.int64) * n_proc + idx_proc)
+    pac, proc = np.divmod(pares, n_proc)
+    for inicio in range(0, len(pares), LINHAS_POR_BLOCO):
+        p = pac[inicio:inicio + LINHAS_POR_BLOCO]
+        inicios = np.flatnonzero(np.r_[True, p[1:] != p[:-1]])
+        # Cada paciente aparece uma vez por bloco, então o |= indexado é seguro
+        mascara[p[inicios]] |= np.bitwise_or.reduceat(
+            compilado["mascaras"][proc[inicio:inicio + LINHAS_POR_BLOCO]], inicios, axis=0
+        )
+
+    return {
+        "pacientes": pd.Index(pacientes),
+        "mascara": mascara,
+        "satisfeitos": _contar_bits(mascara),
+    }
+
+
+def _alinhar_elegibilidade(avaliacao: dict, compilado: dict, elegibilidade: dict) -> np.ndarray:
+    """Matriz de elegibilidade reordenada para as linhas/colunas da avaliação."""
+    if elegibilidade is None:
+        return np.ones(avaliacao["mascara"].shape, dtype=bool)
+
+    linhas = elegibilidade["pacientes"].get_indexer(avaliacao["pacientes"])
+    colunas = pd.Index(elegibilidade["co_oci"]).get_indexer(compilado["co_oci"])
+
+    alinhada = np.ones(avaliacao["mascara"].shape, dtype=bool)
+    ok_l = linhas >= 0
+    ok_c = colunas >= 0
+    alinhada[np.ix_(ok_l, ok_c)] = elegibilidade["elegivel"][np.ix_(linhas[ok_l], colunas[ok_c])]
+    return alinhada
+
+
+def listar_pacotes_fechados(
+    avaliacao: dict,
+    compilado: dict,
+    elegibilidade: dict = None,
+    cobertura: dict = None,
+) -> dict:
+    """
+    { id_paciente: [CO_OCI com todos os requisitos satisfeitos] }
+    Inclui todos os pacientes (lista vazia quando nenhum pacote fecha), de
+    modo que verificar_pacotes só detalhe os pacotes que de fato fecharam.
+
+    Se 'cobertura' for informado, recebe, na mesma passada, as contagens
+    por OCI (na ordem de compilado['co_oci']) entre os pacientes elegíveis:
+      - fechados:  pacientes com a OCI fechada
+      - em_aberto: pacientes com algum requisito, mas sem fechar
+      - faltantes: matriz OCI x requisito (int64) com quantos dos pacientes
+                   em aberto não têm cada requisito (ver tabela_gargalos)
+    """
+    elegivel = _alinhar_elegibilidade(avaliacao, compilado, elegibilidade)
+    fechado = (avaliacao["mascara"] == compilado["completa"][None, :])
+    fechado &= elegivel
+
+    if cobertura is not None:
+        aberto = elegivel & ~fechado & (avaliacao["satisfeitos"] > 0)
+        cobertura.update(_contar_faltantes(avaliacao, compilado, aberto))
+        cobertura["fechados"] = fechado.sum(axis=0)
+
+    co_oci = compilado["co_oci"]
+    return {
+        id_paciente: co_oci[fechado[i]].tolist()
+        for i, id_paciente in enumerate(avaliacao["pacientes"])
+    }
+
+
+def _contar_faltantes(avaliacao: dict, compilado: dict, aberto: np.ndarray) -> dict:
+    """
+    Contagens por OCI sobre os pares paciente x OCI em aberto: um bincount
+    por bit de requisito (no máximo o maior número de requisitos de uma OCI),
+    só sobre os pares em aberto.
+    """
+    n_oci = len(compilado["co_oci"])
+    linhas, colunas = np.nonzero(aberto)
+    ausentes = compilado["completa"][colunas] & ~avaliacao["mascara"][linhas, colunas]
+
+    max_requisitos = int(compilado["n_requisitos"].max()) if n_oci else 0
+    faltantes = np.zeros((n_oci, max_requisitos), dtype=np.int64)
+    for j in range(max_requisitos):
+        sem_j = (ausentes >> np.uint64(j)) & np.uint64(1)
+        faltantes[:, j] = np.bincount(colunas[sem_j.astype(bool)], minlength=n_oci)
+
+    return {
+        "em_aberto": np.bincount(colunas, minlength=n_oci),
+        "faltantes": faltantes,
+    }
+
+
+def tabela_gargalos(cobertura: dict, compilado: dict) -> pd.DataFrame:
+    """
+    Requisitos que mais impedem o fechamento, a partir das contagens de
+    listar_pacotes_fechados(..., cobertura=...): uma linha por OCI x
+    requisito ausente em algum paciente em aberto.
+
+    Colunas: id_pacote, requisito, pacientes_sem_requisito,
+    pacientes_em_aberto, fracao_sem_requisito (sobre os em aberto),
+    pacientes_fechados. Ordem: OCI, requisito mais faltante primeiro.
+    """
+    faltantes = cobertura["faltantes"]
+    k, j = np.nonzero(faltantes)
+    rotulos = compilado["rotulos"]
+
+    tabela = pd.DataFrame({
+        "id_pacote": compilado["co_oci"][k],
+        "requisito": [rotulos[a][b] for a, b in zip(k.tolist(), j.tolist())],
+        "pacientes_sem_requisito": faltantes[k, j],
+        "pacientes_em_aberto": cobertura["em_aberto"][k],
+        "pacientes_fechados": cobertura["fechados"][k],
+    })
+    tabela.insert(
+        4, "fracao_sem_requisito",
+        tabela["pacientes_sem_requisito"] / tabela["pacientes_em_aberto"],
+    )
+    return tabela.sort_values(
+        ["id_pacote", "pacientes_sem_requisito"], ascending=[True, False], ignore_index=True
+    )
+
+
+def tabela_quase_fechadas(
+    avaliacao: dict,
+    compilado: dict,
+    elegibilidade: dict = None,
+    max_faltantes: int = 1,
+) -> pd.DataFrame:
+    """
+    Pares paciente x OCI (elegíveis) aos quais faltam de 1 a 'max_faltantes'
+    requisitos obrigatórios para fechar.
+
+    Colunas: id_paciente, id_pacote, grupos_satisfeitos, grupos_total,
+    grupos_faltantes (descrição dos requisitos ausentes, separados por '; ').
+    """
+    # int16 basta (no máximo 64 requisitos) e mantém a matriz pequena
+    faltantes = compilado["n_requisitos"].astype(np.int16)[None, :] - avaliacao["satisfeitos"]
+    quase = (faltantes >= 1) & (faltantes <= max_faltantes) & (avaliacao["satisfeitos"] > 0)
+    quase &= _alinhar_elegibilidade(avaliacao, compilado, elegibilidade)
+
+    linhas, colunas = np.nonzero(quase)
+    ausentes = compilado["completa"][colunas] & ~avaliacao["mascara"][linhas, colunas]
+
+    descricoes = []
+    for k, bits_ausentes in zip(colunas, ausentes.tolist()):
+        rotulos = compilado["rotulos"][k]
+        descricoes.append("; ".join(
+            rotulos[j] for j in range(len(rotulos)) if bits_ausentes >> j & 1
+        ))
+
+    return pd.DataFrame({
+        "id_paciente": avaliacao["pacientes"][linhas],
+        "id_pacote": compilado["co_oci"][colunas],
+        "grupos_satisfeitos": avaliacao["satisfeitos"][linhas, colunas].astype(np.int64),
+        "grupos_total": compilado["n_requisitos"][colunas],
+        "grupos_faltantes": descricoes,
+    })
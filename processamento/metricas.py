@@ -0,0 +1,274 @@
+# processamento/metricas.py
+# -*- coding: utf-8 -*-
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+
+# ============================================================
+# Métricas operacionais (formato texto do Prometheus)
+# ============================================================
+#
+# Contadores e histogramas em memória do processo, alimentados pelo app e
+# pelo processamento em lote pelos mesmos ganchos (contar, observar,
+# cronometrar, registrar_execucao). Cada chamada é uma soma num dicionário
+# sob uma trava, uma vez por etapa ou execução, nunca por linha.
+#
+# Publicação (variáveis de ambiente):
+#   OCI_METRICAS_ARQUIVO  arquivo .prom regravado ao fim de cada execução
+#                         (textfile collector do node_exporter)
+#   OCI_METRICAS_PORTA    endpoint HTTP local /metrics (iniciar_servidor)
+
+ARQUIVO_METRICAS = os.environ.get("OCI_METRICAS_ARQUIVO")
+PORTA_METRICAS = os.environ.get("OCI_METRICAS_PORTA")
+ENDERECO_METRICAS = os.environ.get("OCI_METRICAS_ENDERECO", "127.0.0.1")
+
+# Limites superiores (le) dos baldes dos histogramas, por unidade
+BALDES = {
+    "segundos": (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    "linhas": (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+    "bytes": tuple(2**20 * m for m in (1, 4, 16, 64, 256, 1024)),
+}
+
+# nome -> {'tipo': 'counter' ou 'histogram', 'ajuda', 'baldes' (histogramas)}
+METRICAS = {
+    "oci_execucoes_total": {
+        "tipo": "counter",
+        "ajuda": "Execuções do processamento de OCI concluídas, por origem (app ou lote).",
+    },
+    "oci_linhas_entrada_total": {
+        "tipo": "counter",
+        "ajuda": "Linhas do MIRA recebidas pelo processamento.",
+    },
+    "oci_linhas_podadas_total": {
+        "tipo": "counter",
+        "ajuda": "Linhas descartadas na poda (procedimento fora do catálogo de OCI).",
+    },
+    "oci_pacientes_total": {
+        "tipo": "counter",
+        "ajuda": "Pacientes recebidos pelo processamento.",
+    },
+    "oci_pacientes_com_oci_total": {
+        "tipo": "counter",
+        "ajuda": "Pacientes com ao menos uma OCI fechada.",
+    },
+    "oci_fechadas_total": {
+        "tipo": "counter",
+        "ajuda": "OCI fechadas (paciente x OCI x episódio), por código da OCI.",
+    },
+    "oci_cache_consultas_total": {
+        "tipo": "counter",
+        "ajuda": "Consultas aos caches (leitura, artefato, sessoes), por resultado (acerto ou falha).",
+    },
+    "oci_bases_recargas_total": {
+        "tipo": "counter",
+        "ajuda": "Trocas da versão das bases auxiliares sem reiniciar o processo.",
+    },
+    "oci_etapa_segundos": {
+        "tipo": "histogram",
+        "ajuda": "Duração das etapas (ingestao, match, status, tempos, exportacao).",
+        "baldes": BALDES["segundos"],
+    },
+    "oci_resultado_linhas": {
+        "tipo": "histogram",
+        "ajuda": "Linhas do resultado (oci_identificada) de cada execução.",
+        "baldes": BALDES["linhas"],
+    },
+    "oci_resultado_bytes": {
+        "tipo": "histogram",
+        "ajuda": "Tamanho do resultado compacto guardado para a sessão.",
+        "baldes": BALDES["bytes"],
+    },
+}
+
+_trava = threading.Lock()
+# nome -> {rótulos (tupla ordenada de pares): valor} (contadores) ou
+#         {rótulos: [contagem por balde..., +Inf, soma, n]} (histogramas)
+_valores = {nome: {} for nome in METRICAS}
+
+_local = threading.local()
+_servidor = None  # False: a porta não pôde ser aberta (não tenta de novo)
+
+
+def contar(nome: str, valor: float = 1, **rotulos) -> None:
+    """Soma 'valor' ao contador 'nome' com os rótulos indicados."""
+    chave = tuple(sorted(rotulos.items()))
+    with _trava:
+        serie = _valores[nome]
+        serie[chave] = serie.get(chave, 0) + valor
+
+
+def observar(nome: str, valor: float, **rotulos) -> None:
+    """Registra uma observação no histograma 'nome'."""
+    baldes = METRICAS[nome]["baldes"]
+    chave = tuple(sorted(rotulos.items()))
+    with _trava:
+        serie = _valores[nome]
+        contagens = serie.get(chave)
+        if contagens is None:
+            # um balde por limite, mais o +Inf, a soma e o número de observações
+            contagens = serie[chave] = [0] * (len(baldes) + 3)
+        contagens[bisect.bisect_left(baldes, valor)] += 1
+        contagens[-2] += valor
+        contagens[-1] += 1
+
+
+def registrar_etapa(etapa: str, inicio: float, **rotulos) -> None:
+    """Duração da etapa desde 'inicio' (time.perf_counter())."""
+    observar("oci_etapa_segundos", time.perf_counter() - inicio, etapa=etapa, **rotulos)
+
+
+@contextmanager
+def cronometrar(etapa: str, **rotulos):
+    """with cronometrar('status'): ... registra a duração do bloco."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(etapa, inicio, **rotulos)
+
+
+def marcar_falha_cache() -> None:
+    """
+    Chamada dentro de uma função com cache do Streamlit: a consulta em curso
+    (ver consultar_cache) teve de executar a função.
+    """
+    _local.falha_cache = True
+
+
+def consultar_cache(cache: str, funcao, *args, **kwargs):
+    """
+    funcao(*args, **kwargs), contando acerto ou falha do cache 'cache'
+    (a função chama marcar_falha_cache quando é executada de fato).
+    """
+    _local.falha_cache = False
+    resultado = funcao(*args, **kwargs)
+    contar("oci_cache_consultas_total", cache=cache,
+           resultado="falha" if _local.falha_cache else "acerto")
+    return resultado
+
+
+def registrar_execucao(origem: str, estatisticas: dict, oci_identificada) -> None:
+    """
+    Fim de uma execução do processamento: linhas, poda, pacientes e OCI
+    fechadas por código (a partir das estatisticas de processar_mira e do
+    resultado), e publica o arquivo de métricas, se configurado.
+    """
+    contar("oci_execucoes_total", origem=origem)
+    linhas_entrada = estatisticas.get("linhas_entrada", 0)
+    contar("oci_linhas_entrada_total", linhas_entrada, origem=origem)
+    contar("oci_linhas_podadas_total",
+           linhas_entrada - estatisticas.get("linhas_candidatas", linhas_entrada), origem=origem)
+    contar("oci_pacientes_total", estatisticas.get("pacientes_entrada", 0), origem=origem)
+    contar("oci_pacientes_com_oci_total", estatisticas.get("pacientes_com_oci", 0), origem=origem)
+
+    if len(oci_identificada):
+        fechadas = oci_identificada.groupby("id_pacote", observed=True)["id_oci_paciente"].nunique()
+        for co_oci, n in fechadas.items():
+            contar("oci_fechadas_total", int(n), co_oci=str(co_oci), origem=origem)
+    observar("oci_resultado_linhas", len(oci_identificada), origem=origem)
+
+    publicar()
+
+
+# ============================================================
+# Exposição
+# ============================================================
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(pares) -> str:
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _formatar_numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus() -> str:
+    """Todas as métricas no formato texto de exposição do Prometheus (0.0.4)."""
+    with _trava:
+        copia = {nome: {k: (list(v) if isinstance(v, list) else v) for k, v in serie.items()}
+                 for nome, serie in _valores.items()}
+
+    linhas = []
+    for nome, definicao in METRICAS.items():
+        linhas.append(f"# HELP {nome} {definicao['ajuda']}")
+        linhas.append(f"# TYPE {nome} {definicao['tipo']}")
+        for rotulos, valor in sorted(copia[nome].items()):
+            if definicao["tipo"] == "counter":
+                linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {_formatar_numero(valor)}")
+                continue
+            acumulado = 0
+            for limite, n in zip(definicao["baldes"] + ("+Inf",), valor[:-2]):
+                acumulado += n
+                le = limite if limite == "+Inf" else _formatar_numero(limite)
+                linhas.append(
+                    f"{nome}_bucket{_formatar_rotulos(rotulos + (('le', le),))} {acumulado}"
+                )
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_numero(valor[-2])}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {valor[-1]}")
+    return "\n".join(linhas) + "\n"
+
+
+def publicar(caminho: str = None) -> None:
+    """
+    Regrava o arquivo de métricas (padrão: OCI_METRICAS_ARQUIVO; sem ele,
+    nada a fazer). A escrita vai para um temporário renomeado ao final, então
+    o coletor nunca lê um arquivo pela metade.
+    """
+    caminho = caminho or ARQUIVO_METRICAS
+    if not caminho:
+        return
+    tmp = f"{caminho}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(texto_prometheus())
+    os.replace(tmp, caminho)
+
+
+def _app_metricas(environ, start_response):
+    if environ.get("PATH_INFO", "/") not in ("/", "/metrics"):
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b""]
+    corpo = texto_prometheus().encode("utf-8")
+    start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4; charset=utf-8")])
+    return [corpo]
+
+
+class _ManipuladorSilencioso(WSGIRequestHandler):
+    """Sem uma linha no stderr a cada coleta."""
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor(porta=None, endereco: str = None):
+    """
+    Sobe (uma vez por processo) o endpoint HTTP /metrics numa thread
+    daemon. Porta padrão: OCI_METRICAS_PORTA; sem ela, não faz nada.
+    Retorna o servidor ou None (sem porta, ou porta ocupada).
+    """
+    global _servidor
+    porta = porta or PORTA_METRICAS
+    if not porta:
+        return None
+    with _trava:
+        if _servidor is None:
+            try:
+                _servidor = make_server(endereco or ENDERECO_METRICAS, int(porta), _app_metricas,
+                                        handler_class=_ManipuladorSilencioso)
+            except OSError as erro:
+                logging.getLogger(__name__).warning("Métricas sem endpoint HTTP: %s", erro)
+                _servidor = False
+                return None
+            threading.Thread(target=_servidor.serve_forever, name="oci-metricas", daemon=True).start()
+    return _servidor or None
@@ -0,0 +1,165 @@
+# processamento/normalizacao.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+
+# ============================================================
+# Normalização e validação do MIRA (uma passada, na leitura)
+# ============================================================
+#
+# Depois desta etapa, as demais podem assumir:
+#   - id_registro / id_paciente: texto sem espaços, nunca ausentes;
+#   - co_procedimento: SIGTAP com 10 dígitos (zeros à esquerda restaurados);
+#   - cbo_executante: CBO com 6 caracteres ou '' (nunca ausente);
+#   - cid_motivo: CID em maiúsculas, sem ponto (ex.: 'C509'), ou ausente;
+#   - datas: datetime64 (NaT quando ausentes ou inválidas).
+
+RE_SIGTAP = r"0[1-9]\d{8}"
+RE_CBO = r"[0-9A-Z]{6}"
+RE_CID = r"[A-Z]\d{2}[0-9A-Z]?"
+
+COLUNAS_DATA = ["dt_solicitacao", "dt_execucao", "dt_nascimento"]
+
+COLUNAS_RELATORIO = ["coluna", "motivo", "acao", "linhas", "exemplos"]
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """Texto sem espaços nas pontas; vazio vira ausente."""
+    # no pandas < 3, astype(str) transforma NaN/None em 'nan'/'None':
+    # os ausentes da entrada são remarcados depois da conversão
+    s = serie.astype(str).str.strip()
+    return s.mask(serie.isna().to_numpy() | (s == ""))
+
+
+# Cada coluna é tratada nos seus valores distintos (poucos: códigos, datas)
+# e o resultado é expandido para as linhas pelos códigos do factorize.
+
+def _distintos(serie: pd.Series) -> tuple:
+    """(códigos por linha, -1 = ausente; valores distintos como Series)."""
+    codigos, unicos = pd.factorize(serie)
+    return codigos, pd.Series(unicos)
+
+
+def _por_linha(codigos: np.ndarray, marca: pd.Series, ausente: bool = False) -> np.ndarray:
+    """Marca booleana dos valores distintos levada para as linhas."""
+    return np.r_[marca.to_numpy(dtype=bool), ausente][codigos]
+
+
+def _expandir(codigos: np.ndarray, valores: pd.Series, index) -> pd.Series:
+    """Valores normalizados (um por valor distinto) levados para as linhas."""
+    return pd.Series(take(valores.array, codigos, allow_fill=True), index=index)
+
+
+def _registrar(relatorio: list, coluna: str, motivo: str, acao: str,
+               linhas: np.ndarray, unicos: pd.Series = None, marca: pd.Series = None) -> None:
+    """Acrescenta ao relatório (se houver linhas) com até 3 valores de exemplo."""
+    n = int(linhas.sum())
+    if n:
+        exemplos = []
+        if unicos is not None:
+            exemplos = unicos[marca.to_numpy(dtype=bool)].dropna().astype(str)[:3]
+        relatorio.append({
+            "coluna": coluna,
+            "motivo": motivo,
+            "acao": acao,
+            "linhas": n,
+            "exemplos": ", ".join(exemplos),
+        })
+
+
+def normalizar_mira(df_mira: pd.DataFrame) -> tuple:
+    """
+    Normaliza e valida as colunas do MIRA com operações vetorizadas.
+
+    - id_registro / id_paciente ausentes: linha descartada;
+    - co_procedimento: mantém só os dígitos ('02.04.03.003-0' ->
+      '0204030030') e devolve o zero à esquerda tirado pelo Excel
+      (9 dígitos); código fora do formato SIGTAP descarta a linha;
+    - cbo_executante: CBO numérico com 5 dígitos recebe o zero à
+      esquerda; fora do formato vira '' (como CBO não informado);
+    - cid_motivo: maiúsculas, sem ponto/hífen; fora do formato vira ausente;
+    - datas: convertidas uma única vez; valor não reconhecido vira NaT.
+
+    O DataFrame retornado leva attrs['normalizado'] = True, para que o
+    processamento não repita a etapa.
+
+    Retorna (df normalizado, relatório) com o relatório contendo uma linha
+    por coluna/motivo: coluna, motivo, acao, linhas, exemplos.
+    """
+    relatorio = []
+    novas = {}
+    descartar = np.zeros(len(df_mira), dtype=bool)
+
+    for col in ["id_registro", "id_paciente"]:
+        texto = _texto(df_mira[col])
+        ausente = texto.isna().to_numpy()
+        _registrar(relatorio, col, "ausente", "linha descartada", ausente)
+        novas[col] = texto
+        descartar |= ausente
+
+    # SIGTAP
+    codigos, unicos = _distintos(df_mira["co_procedimento"])
+    texto = _texto(unicos)
+    proc = texto.str.replace(r"\D", "", regex=True)
+    sem_zero = proc.str.len() == 9
+    proc = proc.where(~sem_zero, "0" + proc)
+    ausente = texto.isna()
+    invalido = ~ausente & ~proc.str.fullmatch(RE_SIGTAP, na=False)
+    corrigido = sem_zero & ~invalido
+    _registrar(relatorio, "co_procedimento", "zero à esquerda restaurado", "corrigido",
+               _por_linha(codigos, corrigido), unicos, corrigido)
+    linhas_ausentes = _por_linha(codigos, ausente, ausente=True)
+    _registrar(relatorio, "co_procedimento", "ausente", "linha descartada", linhas_ausentes)
+    linhas_invalidas = _por_linha(codigos, invalido)
+    _registrar(relatorio, "co_procedimento", "código SIGTAP inválido", "linha descartada",
+               linhas_invalidas, unicos, invalido)
+    novas["co_procedimento"] = _expandir(codigos, proc, df_mira.index)
+    descartar |= linhas_ausentes | linhas_invalidas
+
+    # CBO
+    if "cbo_executante" in df_mira.columns:
+        codigos, unicos = _distintos(df_mira["cbo_executante"])
+        cbo = _texto(unicos).str.upper().str.replace(r"[^0-9A-Z]", "", regex=True)
+        sem_zero = cbo.str.fullmatch(r"\d{5}", na=False)
+        cbo = cbo.where(~sem_zero, "0" + cbo)
+        valido = cbo.str.fullmatch(RE_CBO, na=False)
+        invalido = cbo.notna() & (cbo != "") & ~valido
+        _registrar(relatorio, "cbo_executante", "zero à esquerda restaurado", "corrigido",
+                   _por_linha(codigos, sem_zero), unicos, sem_zero)
+        _registrar(relatorio, "cbo_executante", "CBO inválido", "valor descartado",
+                   _por_linha(codigos, invalido), unicos, invalido)
+        novas["cbo_executante"] = _expandir(codigos, cbo.where(valido), df_mira.index).fillna("")
+    else:
+        novas["cbo_executante"] = pd.Series("", index=df_mira.index, dtype=str)
+
+    # CID
+    if "cid_motivo" in df_mira.columns:
+        codigos, unicos = _distintos(df_mira["cid_motivo"])
+        cid = _texto(unicos).str.upper().str.replace(r"[\s.\-]", "", regex=True)
+        cid = cid.mask(cid == "")
+        invalido = cid.notna() & ~cid.str.fullmatch(RE_CID, na=False)
+        _registrar(relatorio, "cid_motivo", "CID inválido", "valor descartado",
+                   _por_linha(codigos, invalido), unicos, invalido)
+        novas["cid_motivo"] = _expandir(codigos, cid.mask(invalido), df_mira.index)
+
+    # Datas
+    for col in COLUNAS_DATA:
+        if col not in df_mira.columns:
+            continue
+        codigos, unicos = _distintos(df_mira[col])
+        texto = _texto(unicos)
+        data = pd.to_datetime(texto, errors="coerce")
+        invalida = texto.notna() & data.isna()
+        _registrar(relatorio, col, "data inválida", "valor descartado",
+                   _por_linha(codigos, invalida), unicos, invalida)
+        novas[col] = _expandir(codigos, data, df_mira.index)
+
+    df = df_mira.assign(**novas)
+    if descartar.any():
+        df = df[~descartar]
+    df.attrs["normalizado"] = True
+
+    return df, pd.DataFrame(relatorio, columns=COLUNAS_RELATORIO)
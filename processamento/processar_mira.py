@@ -1,9 +1,30 @@
 # processamento/processar_mira.py
 # -*- coding: utf-8 -*-
 
+import time
+
 import pandas as pd
 import numpy as np
 
+from .atribuicao import atribuir_registros
+from .catalogo import codigos_do_catalogo, filtrar_candidatos
+from .janela import ler_janela_dias, separar_episodios
+from .metricas import registrar_etapa, registrar_execucao
+from .tempos import tempos_episodios
+from .deduplicacao import deduplicar_registros
+from .normalizacao import normalizar_mira
+from .mascaras import (
+    avaliar_mascaras,
+    listar_pacotes_fechados,
+    tabela_gargalos,
+    tabela_quase_fechadas,
+)
+from .cbo import marcar_cbo
+from .elegibilidade import (
+    calcular_elegibilidade,
+    marcar_idade_sexo,
+)
+
 
 # ============================================================
 # Funções auxiliares (iguais às do notebook, só organizadas)
@@ -14,16 +35,17 @@ def listar_procedimentos(df_procedimentos: pd.DataFrame) -> dict:
     Transforma o df de solicitações em um dicionário:
         { id_paciente: [lista de co_procedimento] }
     """
-    procedimentos_por_paciente = {}
-
-    for id_paciente in df_procedimentos["id_paciente"].unique():
-        procedimentos_paciente = (
-            df_procedimentos[df_procedimentos["id_paciente"] == id_paciente]["co_procedimento"]
-            .astype(str)
-            .tolist()
-        )
-        procedimentos_por_paciente[id_paciente] = procedimentos_paciente
+    # Uma passada nas colunas no lugar de um filtro (cópia) por paciente.
+    # Os valores distintos viram str uma vez só; as listas compartilham
+    # esses objetos em vez de criar uma string por linha.
+    codigos_pac, pacientes = pd.factorize(df_procedimentos["id_paciente"])
+    codigos_proc, procedimentos = pd.factorize(df_procedimentos["co_procedimento"])
+    pacientes = pacientes.tolist()
+    procedimentos = procedimentos.tolist()
 
+    procedimentos_por_paciente = {}
+    for i, j in zip(codigos_pac.tolist(), codigos_proc.tolist()):
+        procedimentos_por_paciente.setdefault(pacientes[i], []).append(procedimentos[j])
     return procedimentos_por_paciente
 
 
@@ -35,6 +57,8 @@ def preparar_regras(df_pacotes: pd.DataFrame) -> dict:
          * sem OBRIGATORIO_ALTERNATIVO -> grupo_e (todos precisam estar presentes)
          * com OBRIGATORIO_ALTERNATIVO -> grupo_ou (grupos alternativos)
       - TP_COMPATIBILIDADE == 1  -> opcional (não fecha pacote, só registramos se estiver presente)
+      - JANELA_DIAS (coluna opcional) -> janela máxima, em dias, entre o primeiro
+        e o último procedimento de um episódio (None = sem limite)
     """
     pacotes_agrupados = {}
 
@@ -79,14 +103,22 @@ def preparar_regras(df_pacotes: pd.DataFrame) -> dict:
             "grupo_e": grupo_e,
             "grupo_ou": grupo_ou,
             "opcionais": opcionais,
+            "nomes_ou": list(grupos_ou_dict),
+            "janela_dias": ler_janela_dias(regras_pacote),
         }
 
     return pacotes_agrupados
 
 
-def verificar_pacotes(procedimentos_por_paciente: dict, regras_pacotes: dict) -> dict:
+def verificar_pacotes(
+    procedimentos_por_paciente: dict,
+    regras_pacotes: dict,
+    pacotes_elegiveis: dict = None,
+) -> dict:
     """
     Verifica, para cada paciente, quais pacotes (OCI) fecharam.
+    Se 'pacotes_elegiveis' ({id_paciente: [CO_OCI]}) for informado, o paciente
+    só é avaliado nos pacotes listados (os ausentes do dicionário avaliam todos).
     Retorna:
         {
           id_paciente: {
@@ -99,13 +131,15 @@ def verificar_pacotes(procedimentos_por_paciente: dict, regras_pacotes: dict) ->
         }
     """
     resultados = {}
+    pacotes_elegiveis = pacotes_elegiveis or {}
 
     for id_paciente, procedimentos_paciente in procedimentos_por_paciente.items():
         resultados_paciente = {}
 
         procedimentos_set = set(map(str, procedimentos_paciente))
 
-        for id_pacote, grupos in regras_pacotes.items():
+        for id_pacote in pacotes_elegiveis.get(id_paciente, regras_pacotes):
+            grupos = regras_pacotes[id_pacote]
             procedimentos_relevantes = []
 
             # Grupo E (todos precisam estar presentes)
@@ -117,7 +151,10 @@ def verificar_pacotes(procedimentos_por_paciente: dict, regras_pacotes: dict) ->
                 else:
                     grupo_e_ok = False
 
-            # Grupos de OU (pelo menos um de cada grupo)
+            # Grupos de OU (pelo menos um de cada grupo). Todas as
+            # alternativas presentes entram: quando o mesmo registro serve a
+            # mais de uma OCI, atribuir_registros escolhe qual alternativa
+            # cada uma usa.
             grupo_ou = grupos.get("grupo_ou", [])
             grupo_ou_ok = True
             for grupo in grupo_ou:
@@ -156,9 +193,9 @@ def marcar_solicitacoes_em_pacote(df_mira: pd.DataFrame, resultados: dict) -> pd
       - 'em_pacote': True/False se aquela linha faz parte de algum pacote fechado
       - 'id_pacote': string com um ou mais CO_OCI (se quiser saber quais)
     """
-    registros = []
+    # 1) {(id_paciente, co_procedimento): {CO_OCI}} dos pacotes fechados
+    pacotes_por_chave = {}
 
-    # 1) Montar tabela (id_paciente, co_procedimento, id_pacote)
     for id_paciente, pacotes in resultados.items():
         for id_pacote, dados in pacotes.items():
             if not dados["status"]:
@@ -169,50 +206,107 @@ def marcar_solicitacoes_em_pacote(df_mira: pd.DataFrame, resultados: dict) -> pd
             codigos_pacote.extend(dados.get("procedimentos_opcionais", []))
 
             for proc in codigos_pacote:
-                registros.append(
-                    {
-                        "id_paciente": id_paciente,
-                        "co_procedimento": str(proc),
-                        "id_pacote": id_pacote,
-                    }
-                )
-
-    if not registros:
-        df_out = df_mira.copy()
-        df_out["em_pacote"] = False
-        df_out["id_pacote"] = None
-        return df_out
-
-    df_map = pd.DataFrame(registros)
-
-    # 2) Agregar por (id_paciente, co_procedimento)
-    df_map_agg = (
-        df_map.groupby(["id_paciente", "co_procedimento"])["id_pacote"]
-        .apply(lambda x: ",".join(sorted(map(str, set(x)))))
-        .reset_index()
+                pacotes_por_chave.setdefault((id_paciente, str(proc)), set()).add(str(id_pacote))
+
+    if not pacotes_por_chave:
+        return df_mira.assign(em_pacote=False, id_pacote=None)
+
+    # 2) CO_OCI de cada chave, ordenados e separados por vírgula
+    df_map_agg = pd.Series(
+        [",".join(sorted(ids)) for ids in pacotes_por_chave.values()],
+        index=pd.MultiIndex.from_tuples(list(pacotes_por_chave)),
     )
 
-    # 3) Merge com df_mira
-    df_out = df_mira.copy()
-    df_out["co_procedimento"] = df_out["co_procedimento"].astype(str)
+    # 3) Lookup pela chave no lugar do merge: só as colunas novas são
+    #    alocadas, as demais continuam compartilhadas (copy-on-write)
+    chave = pd.MultiIndex.from_arrays([df_mira["id_paciente"], df_mira["co_procedimento"]])
+    posicao = df_map_agg.index.get_indexer(chave)
+    id_pacote = df_map_agg.to_numpy(dtype=object)[posicao]
+    id_pacote[posicao < 0] = None
+
+    return df_mira.assign(id_pacote=id_pacote, em_pacote=posicao >= 0)
+
+
+def adicionar_cid_e_status_oci(oci_identificada: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cria as colunas:
+      - 'cid_oci'     -> OCI identificada / OCI potencial / OCI desqualificada
+      - 'status_oci'  -> em fila / iniciada / retorno / finalizada
+    Baseado no agrupamento por 'id_oci_paciente'.
+
+    Regras por OCI:
+      - cid_oci: todas as linhas com CID compatível -> identificada;
+        alguma -> potencial; nenhuma -> desqualificada;
+      - status_oci: nenhuma execução -> em fila; parte executada ->
+        iniciada; tudo executado -> finalizada se o último procedimento
+        executado for 0301010* (consulta), senão retorno.
+    """
+    # Agregações vetorizadas por grupo (transform), sem apply/merge: só as
+    # duas colunas novas são alocadas (copy-on-write)
+    df = oci_identificada.reset_index(drop=True)
+    grupo = df.groupby("id_oci_paciente", sort=False)
+
+    cid_ok = df["cid_compativel"].fillna(False).astype(bool)
+    cid_por_grupo = cid_ok.groupby(df["id_oci_paciente"], sort=False)
+    cid_oci = np.select(
+        [cid_por_grupo.transform("all"), cid_por_grupo.transform("any")],
+        ["OCI identificada", "OCI potencial"],
+        default="OCI desqualificada",
+    )
 
-    df_out = df_out.merge(
-        df_map_agg,
-        on=["id_paciente", "co_procedimento"],
-        how="left",
+    dt = df["dt_execucao"]
+    executadas = dt.notna().groupby(df["id_oci_paciente"], sort=False).transform("sum")
+    total = grupo["dt_execucao"].transform("size")
+
+    # Último procedimento executado do grupo (primeira linha com a maior data)
+    ultima = df[dt.notna() & (dt == grupo["dt_execucao"].transform("max"))]
+    ultima = ultima.drop_duplicates(subset="id_oci_paciente")
+    finaliza = df["id_oci_paciente"].map(
+        ultima.set_index("id_oci_paciente")["co_procedimento"].str.startswith("0301010")
+    ).fillna(False).astype(bool)
+
+    status_oci = np.select(
+        [executadas == 0, executadas < total, finaliza],
+        ["em fila", "iniciada", "finalizada"],
+        default="retorno",
     )
 
-    df_out["em_pacote"] = df_out["id_pacote"].notna()
+    return df.assign(cid_oci=cid_oci, status_oci=status_oci)
 
-    return df_out
+
+def mascara_competencia(dt_execucao: pd.Series, competencia_str: str) -> pd.Series:
+    """
+    Linhas que entram na avaliação da competência 'MM/AAAA': não executadas
+    (sempre) e executadas no mês da competência ou no anterior.
+    """
+    mes_sel, ano_sel = (int(p) for p in competencia_str.split("/"))
+    mes_ant, ano_ant = (12, ano_sel - 1) if mes_sel == 1 else (mes_sel - 1, ano_sel)
+    return (
+        dt_execucao.isna()
+        | ((dt_execucao.dt.month == mes_sel) & (dt_execucao.dt.year == ano_sel))
+        | ((dt_execucao.dt.month == mes_ant) & (dt_execucao.dt.year == ano_ant))
+    )
 
 
 # ============================================================
-# Função principal chamada pelo Streamlit
+# Função principal (app e lote)
 # ============================================================
 
-def processar_mira(df_mira: pd.DataFrame, bases_auxiliares: dict) -> pd.DataFrame:
+def processar_mira(
+    df_mira: pd.DataFrame,
+    bases_auxiliares: dict,
+    estatisticas: dict = None,
+    tabelas: dict = None,
+    politica_duplicados: str = "mais_recente",
+    competencia_str: str = None,
+    regras_compiladas: dict = None,
+    progresso=None,
+    origem: str = "lote",
+) -> pd.DataFrame:
     """
+    Pipeline único de identificação de OCI, usado pelo app (executar_busca_oci)
+    e pelo processamento em lote (ferramentas/processar_lote.py).
+
     df_mira: DataFrame enviado pelo usuário (tabela MIRA).
     bases_auxiliares: dicionário com as bases já tratadas, lidas dos .csv:
         - df_pate
@@ -221,20 +315,70 @@ def processar_mira(df_mira: pd.DataFrame, bases_auxiliares: dict) -> pd.DataFram
         - idade_sexo
         - cid
         - oci_nome
+        ou o conjunto de versões de recarga.carregar_versao/bases_vigentes:
+        nesse caso, usa as bases e as regras compiladas da versão que vale em
+        competencia_str (historico.versao_da_competencia) e registra a versão
+        nas estatísticas.
+    estatisticas: dicionário opcional preenchido com os números da execução
+        (linhas lidas, razão de poda, pacientes, OCI identificadas); os mesmos
+        números e a duração das etapas vão para as métricas (origem 'origem').
+    tabelas: dicionário opcional que recebe tabelas complementares:
+        - quase_fechadas: pacientes x OCI a um requisito obrigatório de fechar
+        - gargalos: requisitos que mais faltam aos pacientes sem OCI fechada,
+          por OCI (ver tabela_gargalos)
+        - conflitos: registros que serviam a mais de uma OCI e a OCI a que
+          foram atribuídos (ver atribuir_registros)
+        - tempos: uma linha por OCI de paciente com os tempos de espera (ver
+          tempos.tempos_episodios)
+        - validacao: relatório de normalizar_mira e deduplicar_registros
+          (linhas/valores descartados), se df_mira ainda não foi normalizado
+    politica_duplicados: 'mais_recente' ou 'primeira' (ver deduplicar_registros).
+    competencia_str: 'MM/AAAA' opcional; executados só entram se forem da
+        competência ou do mês anterior (ver mascara_competencia).
+    regras_compiladas: saída de artefato.compilar_regras para estas bases
+        (ex.: do artefato); se None, usa as da versão ou compila aqui.
+    progresso: callable opcional progresso(etapa, mensagem, fracao) chamado
+        entre as etapas.
+    origem: 'lote' ou 'app', rótulo das métricas.
 
     Retorna:
         oci_identificada: DataFrame final com colunas como:
           - id_paciente, id_registro, co_procedimento, dt_solicitacao, dt_execucao
-          - id_pacote (CO_OCI), no_oci
+          - colunas de df_pate (ex.: no_procedimento)
+          - em_pacote, id_pacote (CO_OCI), no_oci
           - cid_compativel (True/False)
+          - idade_sexo_compativel (True/False)
+          - cbo_compativel (False = consulta com CBO executante fora da lista
+            da OCI em cbo.csv; ver cbo.marcar_cbo)
+          - episodio (1, 2, ... por paciente e OCI; ver separar_episodios)
+          - id_oci_paciente ('<paciente>|<OCI>', com '|<episodio>' a partir
+            do 2º episódio)
           - conduta
-          - id_oci_paciente
+          - cid_oci, status_oci (ver adicionar_cid_e_status_oci)
     """
 
     # -------------------------
     # 1) Preparar df_mira
     # -------------------------
-    df = df_mira.copy()
+    # Sem .copy(): com copy-on-write, as colunas alteradas abaixo são
+    # copiadas sob demanda e o df_mira de quem chamou não é tocado
+    df = df_mira
+    if estatisticas is None:
+        estatisticas = {}
+    if tabelas is None:
+        tabelas = {}
+    if progresso is None:
+        progresso = lambda *args, **kwargs: None
+
+    if "historico" in bases_auxiliares:
+        # import local: artefato (usado por historico) importa este módulo
+        from .historico import versao_da_competencia
+
+        versao = versao_da_competencia(bases_auxiliares, competencia_str)
+        bases_auxiliares = versao["bases"]
+        if regras_compiladas is None:
+            regras_compiladas = versao["regras"]
+        estatisticas["versao_regras"] = versao["versao"]
 
     # Garante colunas mínimas
     cols_obrig = ["id_registro", "id_paciente", "co_procedimento"]
@@ -242,111 +386,195 @@ def processar_mira(df_mira: pd.DataFrame, bases_auxiliares: dict) -> pd.DataFram
         if c not in df.columns:
             raise ValueError(f"Coluna obrigatória ausente em df_mira: {c}")
 
-    df = df.dropna(subset=["id_registro", "id_paciente"])
+    # Normalização/validação (ids, SIGTAP, CBO, CID e datas) numa passada,
+    # seguida da remoção de id_registro repetidos (no app, já feitas na
+    # leitura do arquivo)
+    if not df.attrs.get("normalizado"):
+        inicio = time.perf_counter()
+        df, relatorio_validacao = normalizar_mira(df)
+        df, duplicados = deduplicar_registros(df, politica_duplicados)
+        if not duplicados.empty:
+            relatorio_validacao = pd.concat([relatorio_validacao, duplicados], ignore_index=True)
+        tabelas["validacao"] = relatorio_validacao
+        registrar_etapa("ingestao", inicio, origem=origem)
+
+    # Poda inicial: só seguem linhas com procedimento presente em algum pacote
+    inicio = time.perf_counter()
+    df = filtrar_candidatos(
+        df, codigos_do_catalogo(bases_auxiliares["pacotes"]), estatisticas
+    )
+    progresso(
+        "leitura",
+        f"{estatisticas['linhas_candidatas']:,} de {estatisticas['linhas_entrada']:,} linhas "
+        f"com procedimento de OCI".replace(",", "."),
+        0.1,
+    )
 
-    # Datas
-    for col in ["dt_solicitacao", "dt_execucao"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
+    # Nome do procedimento (lookup por hash no lugar do merge com df_pate)
+    nomes_procedimento = bases_auxiliares["df_pate"].drop_duplicates(subset="codigo").set_index("codigo")
+    for col in nomes_procedimento.columns:
+        df[col] = df["co_procedimento"].map(nomes_procedimento[col])
 
     # Concatena CBO para procedimentos 03/04
-    if "cbo_executante" in df.columns:
-        df["co_procedimento"] = df["co_procedimento"].astype(str)
-        df["cbo_executante"] = df["cbo_executante"].fillna("")
-
-        mask = df["co_procedimento"].str.startswith(("03", "04")) & (df["cbo_executante"] != "")
-        df.loc[mask, "co_procedimento"] = (
-            df.loc[mask, "co_procedimento"] + "|" + df.loc[mask, "cbo_executante"]
-        )
+    mask = df["co_procedimento"].str.startswith(("03", "04")) & (df["cbo_executante"] != "")
+    df.loc[mask, "co_procedimento"] = (
+        df.loc[mask, "co_procedimento"] + "|" + df.loc[mask, "cbo_executante"]
+    )
 
     # -------------------------
-    # 2) Separar produzidos x não produzidos
+    # 2) Produzidos e não produzidos seguem juntos
     # -------------------------
     if "dt_execucao" not in df.columns:
         raise ValueError("df_mira precisa da coluna 'dt_execucao'.")
 
-    procedimentos_produzidos = df.query("dt_execucao.notna()").copy()
-    nao_realizados = df.query("dt_execucao.isna()").copy()
-
-    # (Se quiser, no futuro, aplicar filtro por competência aqui)
+    # Não executados entram sempre; executados, só na competência (uma
+    # máscara sobre os executados)
+    solicitacoes_oci = df
+    if competencia_str is not None:
+        solicitacoes_oci = df[mascara_competencia(df["dt_execucao"], competencia_str)]
+    del df
 
-    solicitacoes_oci = pd.concat(
-        [procedimentos_produzidos, nao_realizados],
-        ignore_index=True,
+    procedimentos_por_paciente = listar_procedimentos(solicitacoes_oci)
+    progresso(
+        "listagem",
+        f"{len(procedimentos_por_paciente):,} pacientes listados".replace(",", "."),
+        0.4,
     )
 
     # -------------------------
     # 3) Preparar regras a partir dos pacotes
     # -------------------------
-    pacotes = bases_auxiliares["pacotes"]
     cid = bases_auxiliares["cid"]
     oci_nome = bases_auxiliares["oci_nome"]
 
-    regras_pacotes = preparar_regras(pacotes)
-
-    procedimentos_por_paciente = listar_procedimentos(solicitacoes_oci)
-    resultados = verificar_pacotes(procedimentos_por_paciente, regras_pacotes)
+    # Regras compiladas uma vez (pacotes, máscaras, idade/sexo e CBO)
+    if regras_compiladas is None:
+        # import local: artefato importa preparar_regras deste módulo
+        from .artefato import compilar_regras
+
+        regras_compiladas = compilar_regras(bases_auxiliares)
+    regras_pacotes = regras_compiladas["regras_pacotes"]
+    compilado = regras_compiladas["mascaras"]
+
+    # Elegibilidade por idade/sexo: poda pacientes x OCI antes do match
+    elegibilidade = None
+    if regras_compiladas["idade_sexo"] is not None:
+        elegibilidade = calcular_elegibilidade(solicitacoes_oci, regras_compiladas["idade_sexo"])
+
+    # Máscaras de requisitos: fechamento e quase fechamento num só passo
+    avaliacao = avaliar_mascaras(solicitacoes_oci, compilado)
+    cobertura = {}
+    pacotes_fechados = listar_pacotes_fechados(avaliacao, compilado, elegibilidade, cobertura)
+
+    tabelas["quase_fechadas"] = tabela_quase_fechadas(
+        avaliacao, compilado, elegibilidade
+    ).merge(
+        oci_nome, left_on="id_pacote", right_on="co_oci", how="left"
+    ).drop(columns=["co_oci"])
+    tabelas["gargalos"] = tabela_gargalos(cobertura, compilado).merge(
+        oci_nome, left_on="id_pacote", right_on="co_oci", how="left"
+    ).drop(columns=["co_oci"])
+    del avaliacao  # matrizes paciente x OCI não são mais usadas
+
+    # Só detalha os pacotes que fecharam
+    resultados = verificar_pacotes(
+        procedimentos_por_paciente, regras_pacotes, pacotes_fechados
+    )
+    del procedimentos_por_paciente, pacotes_fechados
+    progresso(
+        "pacotes",
+        f"{len(resultados):,} pacientes avaliados nos pacotes".replace(",", "."),
+        0.6,
+    )
 
     # Marca quais solicitações fazem parte de algum pacote (OCI)
     solicitacoes_oci_marcadas = marcar_solicitacoes_em_pacote(
         solicitacoes_oci, resultados
     )
+    del resultados
 
     # Filtra apenas solicitações que viraram OCI
-    oci_identificada = solicitacoes_oci_marcadas.query("em_pacote == True").copy()
-    oci_identificada.drop(columns=["em_pacote"], inplace=True)
+    oci_identificada = solicitacoes_oci_marcadas[
+        solicitacoes_oci_marcadas["em_pacote"]
+    ]
+    del solicitacoes_oci_marcadas, solicitacoes_oci
+
+    # Uma linha por OCI: o mesmo registro pode servir a mais de uma
+    oci_identificada["id_pacote"] = oci_identificada["id_pacote"].astype(str).str.split(",")
+    oci_identificada = oci_identificada.explode("id_pacote", ignore_index=True)
+    oci_identificada["id_pacote"] = oci_identificada["id_pacote"].str.strip()
 
     # Se vier string vazia em id_pacote, trata como NaN
     oci_identificada.loc[
         oci_identificada["id_pacote"] == "", "id_pacote"
     ] = pd.NA
+    oci_identificada["em_pacote"] = oci_identificada["id_pacote"].notna()
+
+    # Episódios: pacotes com janela máxima (JANELA_DIAS) só fecham dentro dela
+    oci_identificada = separar_episodios(oci_identificada, regras_pacotes)
+
+    # Cada registro conta para no máximo uma OCI (resolve pacotes sobrepostos)
+    oci_identificada, conflitos = atribuir_registros(oci_identificada, compilado)
+    estatisticas["registros_em_conflito"] = len(conflitos)
+    tabelas["conflitos"] = conflitos
+    registrar_etapa("match", inicio, origem=origem)
+    progresso("atribuicao", "Registros atribuídos às OCI", 0.75)
 
     # -------------------------
     # 4) Compatibilidade CID
     # -------------------------
+    inicio = time.perf_counter()
     if "cid_motivo" in oci_identificada.columns:
-        oci_identificada["cid_motivo"] = (
-            oci_identificada["cid_motivo"].astype(str).str.upper().str.strip()
-        )
+        # Pertinência do par (OCI, CID) na base, sem merge
+        pares_cid = pd.MultiIndex.from_arrays([
+            cid["CO_OCI"].astype(str),
+            cid["CO_CID"].astype(str).str.upper().str.strip(),
+        ])
+        oci_identificada["cid_compativel"] = pd.MultiIndex.from_arrays(
+            [oci_identificada["id_pacote"], oci_identificada["cid_motivo"]]
+        ).isin(pares_cid)
+    else:
+        oci_identificada["cid_compativel"] = False
 
-        cid_local = cid.copy()
-        cid_local["CO_CID"] = (
-            cid_local["CO_CID"].astype(str).str.upper().str.strip()
+    # Compatibilidade idade/sexo (False = não foi possível conferir)
+    if elegibilidade is not None:
+        oci_identificada["idade_sexo_compativel"] = marcar_idade_sexo(
+            oci_identificada, elegibilidade
         )
+    else:
+        oci_identificada["idade_sexo_compativel"] = False
 
-        oci_identificada = oci_identificada.merge(
-            cid_local.assign(cid_compativel=True),
-            how="left",
-            left_on=["id_pacote", "cid_motivo"],
-            right_on=["CO_OCI", "CO_CID"],
+    # Compatibilidade do CBO executante com a OCI (cbo.csv), só nas linhas
+    # de requisitos com CBO na regra (consultas); exames ficam True
+    if regras_compiladas.get("cbo") is not None:
+        oci_identificada["cbo_compativel"] = marcar_cbo(
+            oci_identificada, regras_compiladas["cbo"], compilado
         )
-
-        oci_identificada = oci_identificada.drop(columns=["CO_OCI", "CO_CID"])
-        oci_identificada["cid_compativel"] = oci_identificada[
-            "cid_compativel"
-        ].fillna(False)
     else:
-        oci_identificada["cid_compativel"] = False
+        oci_identificada["cbo_compativel"] = True
 
     # -------------------------
     # 5) Nome da OCI
     # -------------------------
-    oci_identificada = oci_identificada.merge(
-        oci_nome,
-        left_on="id_pacote",
-        right_on="co_oci",
-        how="left",
+    oci_identificada["no_oci"] = oci_identificada["id_pacote"].map(
+        oci_nome.drop_duplicates(subset="co_oci").set_index("co_oci")["no_oci"]
     )
-    oci_identificada.drop(columns=["co_oci"], inplace=True)
 
     # -------------------------
-    # 6) ID único por OCI por paciente
+    # 6) ID único por OCI por paciente (a partir do 2º episódio da mesma
+    #    OCI, acrescenta o número)
     # -------------------------
     oci_identificada["id_oci_paciente"] = (
         oci_identificada["id_paciente"].astype(str)
         + "|"
         + oci_identificada["id_pacote"].astype(str)
     )
+    outro_episodio = oci_identificada["episodio"] > 1
+    oci_identificada.loc[outro_episodio, "id_oci_paciente"] = (
+        oci_identificada.loc[outro_episodio, "id_oci_paciente"]
+        + "|"
+        + oci_identificada.loc[outro_episodio, "episodio"].astype(str)
+    )
 
     # -------------------------
     # 7) Conduta
@@ -372,9 +600,20 @@ def processar_mira(df_mira: pd.DataFrame, bases_auxiliares: dict) -> pd.DataFram
         condlist, choicelist, default="indefinido"
     )
 
-    # Ordena um pouco
-    oci_identificada = oci_identificada.sort_values(
-        by=["id_paciente", "id_pacote"]
-    ).reset_index(drop=True)
+    # -------------------------
+    # 8) Status da OCI e tempos de espera
+    # -------------------------
+    progresso("status", "Classificando status das OCI...", 0.85)
+    oci_identificada = oci_identificada.sort_values(by=["id_paciente", "id_pacote"])
+    oci_identificada = adicionar_cid_e_status_oci(oci_identificada)
+    registrar_etapa("status", inicio, origem=origem)
+
+    inicio = time.perf_counter()
+    tabelas["tempos"] = tempos_episodios(oci_identificada, competencia_str)
+    registrar_etapa("tempos", inicio, origem=origem)
+
+    estatisticas["pacientes_com_oci"] = oci_identificada["id_paciente"].nunique()
+    estatisticas["oci_identificadas"] = oci_identificada["id_oci_paciente"].nunique()
+    registrar_execucao(origem, estatisticas, oci_identificada)
 
     return oci_identificada
@@ -0,0 +1,117 @@
+# processamento/pseudonimizacao.py
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+from .tarefas import contexto_processos
+
+
+# ============================================================
+# Pseudonimização de CPF/CNS (hash com chave secreta)
+# ============================================================
+#
+# Cada identificador vira o BLAKE2b (16 bytes, em hexadecimal) do valor
+# normalizado, calculado com uma chave secreta: sem a chave, não dá para
+# refazer o hash a partir de uma lista de CPFs. Com a mesma chave, o mesmo
+# paciente recebe sempre o mesmo pseudônimo (arquivos de competências
+# diferentes continuam ligáveis).
+
+COLUNAS_IDENTIFICADOR = ["id_paciente"]
+
+TAMANHO_CHAVE = 32          # bytes (máximo aceito pelo BLAKE2b: 64)
+TAMANHO_PSEUDONIMO = 16     # bytes do hash -> 32 caracteres hexadecimais
+
+# Abaixo deste número de valores distintos, o hash roda no próprio processo
+# (abrir processos custa mais do que o ganho)
+MIN_DISTINTOS_PARALELO = 200_000
+
+
+def gerar_chave() -> bytes:
+    """Chave secreta aleatória para pseudonimizar_identificadores."""
+    return os.urandom(TAMANHO_CHAVE)
+
+
+def _normalizar_identificador(serie: pd.Series) -> pd.Series:
+    """
+    CPF/CNS com pontuação ('123.456.789-09') fica só com os dígitos, para que
+    o mesmo documento gere o mesmo pseudônimo com ou sem máscara; valores que
+    não são CPF (11 dígitos) nem CNS (15 dígitos) são usados como texto.
+    """
+    # ausentes continuam ausentes (no pandas < 3, astype(str) dá 'nan')
+    texto = serie.astype(str).str.strip()
+    digitos = texto.str.replace(r"[\s.\-/]", "", regex=True)
+    documento = digitos.str.fullmatch(r"\d{11}|\d{15}", na=False)
+    return texto.where(~documento, digitos).mask(serie.isna().to_numpy() | (texto == ""))
+
+
+def _hash_bloco(valores: list, chave: bytes) -> list:
+    """Hash de uma lista de textos (roda também nos processos do pool)."""
+    # o estado já com a chave é copiado a cada valor (mais barato que refazer)
+    base = hashlib.blake2b(key=chave, digest_size=TAMANHO_PSEUDONIMO)
+    resultado = []
+    for v in valores:
+        h = base.copy()
+        h.update(v.encode("utf-8"))
+        resultado.append(h.hexdigest())
+    return resultado
+
+
+def _hash_distintos(valores: list, chave: bytes, processos: int) -> list:
+    """Hash dos valores distintos, dividido entre 'processos' processos."""
+    if processos <= 1 or len(valores) < MIN_DISTINTOS_PARALELO:
+        return _hash_bloco(valores, chave)
+    blocos = [valores[i::processos] for i in range(processos)]
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto_processos()) as pool:
+        partes = list(pool.map(_hash_bloco, blocos, [chave] * processos))
+    # desfaz a intercalação dos blocos
+    resultado = [None] * len(valores)
+    for i, parte in enumerate(partes):
+        resultado[i::processos] = parte
+    return resultado
+
+
+def pseudonimizar_identificadores(
+    df: pd.DataFrame,
+    chave: bytes,
+    colunas=None,
+    processos: int = 1,
+) -> tuple:
+    """
+    Substitui CPF/CNS das colunas indicadas (padrão: id_paciente) pelo hash
+    com chave. Só os valores distintos são normalizados e calculados; o
+    resultado volta para as linhas pelos códigos do factorize (como em
+    normalizar_mira). Valores ausentes continuam ausentes.
+
+    processos: processos usados no hash dos valores distintos (0 ou None =
+    todos os núcleos); só há paralelismo com muitos valores distintos.
+
+    Retorna (df com os pseudônimos, estatísticas por coluna:
+    {coluna: {'linhas', 'distintos'}}).
+    """
+    if not chave:
+        raise ValueError("Informe a chave secreta da pseudonimização.")
+    if colunas is None:
+        colunas = [c for c in COLUNAS_IDENTIFICADOR if c in df.columns]
+    if not processos:
+        processos = os.cpu_count() or 1
+
+    novas = {}
+    estatisticas = {}
+    for col in colunas:
+        if col not in df.columns:
+            raise ValueError(f"Coluna de identificador ausente: {col}")
+        # valores do arquivo -> valores normalizados -> pseudônimos
+        codigos, unicos = pd.factorize(df[col])
+        codigos_norm, unicos_norm = pd.factorize(_normalizar_identificador(pd.Series(unicos)))
+        pseudonimos = np.array(_hash_distintos(list(unicos_norm), chave, processos), dtype=object)
+        por_valor = take(pseudonimos, codigos_norm, allow_fill=True)
+        novas[col] = pd.Series(take(por_valor, codigos, allow_fill=True), index=df.index)
+        estatisticas[col] = {"linhas": int(novas[col].notna().sum()), "distintos": len(unicos_norm)}
+
+    return df.assign(**novas), estatisticas
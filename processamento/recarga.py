@@ -0,0 +1,130 @@
+# processamento/recarga.py
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import time
+
+from .artefato import BASES, carregar_artefato, compilar_regras, ler_bases_csv, versao_bases
+from .historico import PASTA_HISTORICO, carregar_historico, versoes_do_historico
+from .metricas import contar
+
+
+# ============================================================
+# Bases auxiliares vigentes, recarregadas sem reiniciar o processo
+# ============================================================
+#
+# Uma thread observa os CSV de bases_auxiliares/ e do histórico por
+# competência (ver historico.py). Quando eles mudam (e ficam estáveis por
+# uma verificação, para não pegar uma cópia pela metade) e o hash do
+# conteúdo é outro, as regras e índices da nova versão são
+# compilados nessa thread e só então trocados, de uma vez, pela referência
+# vigente. Quem já pegou uma versão (uma tarefa em andamento) continua com
+# ela até o fim; as próximas pegam a nova.
+
+INTERVALO_VERIFICACAO = float(os.environ.get("OCI_INTERVALO_BASES", "30"))  # segundos
+
+_trava = threading.Lock()
+# base_path -> {'versao', 'bases', 'regras', 'historico', 'carregada_em'}
+_vigentes = {}
+# base_path -> thread do observador
+_observadores = {}
+
+_log = logging.getLogger(__name__)
+
+
+def carregar_versao(base_path: str = "bases_auxiliares") -> dict:
+    """
+    Bases + regras compiladas da versão atual dos CSV e das versões do
+    histórico por competência:
+        {'versao', 'bases': {nome: DataFrame}, 'regras' (ver compilar_regras),
+         'historico': [{'ate', 'versao', 'bases', 'regras'}] (carregar_historico),
+         'carregada_em': time.time()}
+    A versão de uma competência sai de historico.versao_da_competencia.
+    A atual vem do artefato mapeado em memória; se não for possível gravá-lo,
+    compila em memória a partir dos CSV.
+    """
+    try:
+        artefato = carregar_artefato(base_path)
+        versao, bases, regras = artefato["versao"], artefato["bases"], artefato["regras"]
+    except OSError:
+        versao = versao_bases(base_path)
+        bases = ler_bases_csv(base_path)
+        regras = compilar_regras(bases)
+    atual = {"versao": versao, "bases": bases, "regras": regras}
+    return dict(atual, historico=carregar_historico(base_path, atual), carregada_em=time.time())
+
+
+def _versoes(conjunto: dict) -> list:
+    """[(competência ou None para a atual, versão)] de um conjunto carregado."""
+    return [(None, conjunto["versao"])] + [(v["ate"], v["versao"]) for v in conjunto["historico"]]
+
+
+def _assinatura(base_path: str) -> tuple:
+    """(caminho, tamanho, mtime) dos CSV: barato de comparar a cada verificação."""
+    pastas = [base_path]
+    raiz_historico = os.path.join(base_path, PASTA_HISTORICO)
+    if os.path.isdir(raiz_historico):
+        pastas += [os.path.join(raiz_historico, nome) for nome in sorted(os.listdir(raiz_historico))]
+    assinatura = []
+    for pasta in pastas:
+        for nome in BASES:
+            caminho = os.path.join(pasta, f"{nome}.csv")
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            assinatura.append((caminho, info.st_size, info.st_mtime_ns))
+    return tuple(assinatura)
+
+
+def bases_vigentes(base_path: str = "bases_auxiliares") -> dict:
+    """
+    Versão vigente das bases (ver carregar_versao). Na primeira chamada do
+    processo carrega e sobe o observador; depois é só uma consulta.
+    O dicionário devolvido não muda: uma recarga troca a referência.
+    """
+    vigente = _vigentes.get(base_path)
+    if vigente is not None:
+        return vigente
+    with _trava:
+        if base_path not in _vigentes:
+            assinatura = _assinatura(base_path)
+            _vigentes[base_path] = carregar_versao(base_path)
+            observador = threading.Thread(
+                target=_observar, args=(base_path, assinatura),
+                name="oci-bases", daemon=True,
+            )
+            _observadores[base_path] = observador
+            observador.start()
+        return _vigentes[base_path]
+
+
+def _observar(base_path: str, assinatura: tuple) -> None:
+    """Laço do observador (thread daemon)."""
+    candidata = assinatura
+    while True:
+        time.sleep(INTERVALO_VERIFICACAO)
+        atual = _assinatura(base_path)
+        if atual == assinatura:
+            candidata = atual
+            continue
+        if atual != candidata:
+            # mudou desde a última verificação: espera estabilizar
+            candidata = atual
+            continue
+        assinatura = atual
+        versoes = [(None, versao_bases(base_path))] + versoes_do_historico(base_path)
+        if versoes == _versoes(_vigentes[base_path]):
+            continue  # só a data dos arquivos mudou
+        try:
+            nova = carregar_versao(base_path)
+        except Exception:
+            _log.exception("Falha ao recarregar %s; a versão anterior continua vigente", base_path)
+            continue
+        with _trava:
+            anterior = _vigentes[base_path]["versao"]
+            _vigentes[base_path] = nova
+        contar("oci_bases_recargas_total")
+        _log.warning("Bases auxiliares recarregadas: versão %s -> %s", anterior, nova["versao"])
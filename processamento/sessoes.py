@@ -0,0 +1,275 @@
+# processamento/sessoes.py
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as pa_ipc
+
+from .metricas import contar, observar
+
+
+# ============================================================
+# Resultados das sessões: Arrow compacto, com despejo em disco
+# ============================================================
+#
+# Cada sessão guarda aqui (e não no session_state) o oci_identificada e as
+# tabelas complementares (quase fechadas, gargalos, tempos, conflitos) como
+# tabelas Arrow, com textos repetidos codificados em dicionário. Acima do
+# orçamento global de memória, os resultados das sessões usadas há mais
+# tempo vão para arquivos Arrow IPC em disco e voltam na próxima interação.
+#
+# A trava só protege o dicionário: gravar e reler arquivos é feito fora
+# dela, então o despejo de uma sessão não bloqueia as demais.
+
+ORCAMENTO_MEMORIA = int(os.environ.get("OCI_MEMORIA_SESSOES_MB", "512")) * 1024 * 1024
+PASTA_DESPEJO = os.environ.get(
+    "OCI_PASTA_SESSOES", os.path.join(tempfile.gettempdir(), "oci_sessoes")
+)
+# Resultado sem acesso por mais que isto é descartado (sessão encerrada)
+TEMPO_MAXIMO_OCIOSO = 6 * 3600
+
+# Texto vai para dicionário quando os valores distintos são até esta fração
+# das linhas (ids únicos por linha ficam como texto simples)
+FRACAO_MAX_DISTINTOS = 0.5
+
+COMPRESSAO_DESPEJO = "zstd" if pa.Codec.is_available("zstd") else None
+
+# Nome do oci_identificada entre as tabelas da sessão
+TABELA_PRINCIPAL = "oci_identificada"
+
+_trava = threading.Lock()
+# id_sessao -> {'tabelas': {nome: pa.Table} ou None (em disco),
+#               'arquivos': {nome: caminho} ou None (em memória),
+#               'bytes': int, 'linhas': int (da principal),
+#               'acesso': time.monotonic(), 'despejando': bool}
+_resultados = OrderedDict()
+
+
+def compactar(df: pd.DataFrame) -> pa.Table:
+    """DataFrame -> tabela Arrow, com textos repetidos em dicionário."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    for i, campo in enumerate(tabela.schema):
+        if not (pa.types.is_string(campo.type) or pa.types.is_large_string(campo.type)):
+            continue
+        coluna = tabela.column(i)
+        if pc.count_distinct(coluna).as_py() <= FRACAO_MAX_DISTINTOS * len(coluna):
+            tabela = tabela.set_column(i, campo.name, pc.dictionary_encode(coluna))
+    return tabela
+
+
+def guardar_resultado(id_sessao: str, df: pd.DataFrame, tabelas: dict = None) -> None:
+    """
+    Guarda (ou substitui) o resultado da sessão e aplica o orçamento.
+    tabelas: {nome: DataFrame} complementares (ex.: as de processar_mira),
+    lidas com carregar_resultado(id_sessao, nome); contam no mesmo orçamento.
+    """
+    compactadas = {TABELA_PRINCIPAL: compactar(df)}
+    for nome, tabela in (tabelas or {}).items():
+        if tabela is not None:
+            compactadas[nome] = compactar(tabela)
+    entrada = {
+        "tabelas": compactadas,
+        "arquivos": None,
+        "bytes": sum(t.nbytes for t in compactadas.values()),
+        "linhas": compactadas[TABELA_PRINCIPAL].num_rows,
+        "acesso": time.monotonic(),
+        "despejando": False,
+    }
+    with _trava:
+        apagar = _remover(id_sessao)
+        _resultados[id_sessao] = entrada
+        apagar += _expirar(exceto=id_sessao)
+        despejar = _escolher_despejo(exceto=id_sessao)
+    _apagar(apagar)
+    _despejar(despejar)
+    observar("oci_resultado_bytes", entrada["bytes"])
+
+
+def carregar_resultado(id_sessao: str, nome: str = TABELA_PRINCIPAL) -> pd.DataFrame:
+    """
+    Tabela 'nome' do resultado da sessão (padrão: o oci_identificada) como
+    DataFrame (colunas em dicionário viram categóricas), relendo do disco
+    se tiver sido despejado; None se não houver resultado ou tabela.
+    """
+    with _trava:
+        entrada = _resultados.get(id_sessao)
+        if entrada is None:
+            return None
+        # acerto: ainda em memória; falha: relido do disco
+        contar("oci_cache_consultas_total", cache="sessoes",
+               resultado="acerto" if entrada["tabelas"] is not None else "falha")
+        entrada["acesso"] = time.monotonic()
+        _resultados.move_to_end(id_sessao)
+        tabelas = entrada["tabelas"]
+        arquivos = entrada["arquivos"]
+
+    if tabelas is None:
+        tabelas = _reler(id_sessao, entrada, arquivos)
+        if tabelas is None:
+            return None
+
+    tabela = tabelas.get(nome)
+    return None if tabela is None else tabela.to_pandas()
+
+
+def tem_resultado(id_sessao: str) -> bool:
+    """Se a sessão tem resultado guardado (em memória ou em disco)."""
+    with _trava:
+        return id_sessao in _resultados
+
+
+def descartar_resultado(id_sessao: str) -> None:
+    """Remove o resultado da sessão (memória e disco), se houver."""
+    with _trava:
+        apagar = _remover(id_sessao)
+    _apagar(apagar)
+
+
+def uso_memoria() -> dict:
+    """
+    Uso por sessão e total (oci_identificada + tabelas complementares):
+        {'sessoes': {id_sessao: {'bytes', 'linhas', 'em_disco'}},
+         'memoria': bytes em memória, 'disco': bytes em disco,
+         'orcamento': ORCAMENTO_MEMORIA}
+    """
+    with _trava:
+        sessoes = {
+            id_sessao: {
+                "bytes": e["bytes"],
+                "linhas": e["linhas"],
+                "em_disco": e["tabelas"] is None,
+            }
+            for id_sessao, e in _resultados.items()
+        }
+    return {
+        "sessoes": sessoes,
+        "memoria": sum(s["bytes"] for s in sessoes.values() if not s["em_disco"]),
+        "disco": sum(s["bytes"] for s in sessoes.values() if s["em_disco"]),
+        "orcamento": ORCAMENTO_MEMORIA,
+    }
+
+
+# ============================================================
+# Orçamento e despejo (decisão com a trava, arquivos fora dela)
+# ============================================================
+
+def _remover(id_sessao: str) -> list:
+    """(Com a trava.) Tira a sessão do dicionário; retorna os arquivos a apagar."""
+    entrada = _resultados.pop(id_sessao, None)
+    if entrada is None or entrada["arquivos"] is None:
+        return []
+    return list(entrada["arquivos"].values())
+
+
+def _expirar(exceto: str) -> list:
+    """
+    (Com a trava.) Descarta resultados ociosos há mais de
+    TEMPO_MAXIMO_OCIOSO, menos o da sessão 'exceto'; retorna os arquivos
+    a apagar.
+    """
+    agora = time.monotonic()
+    apagar = []
+    for id_sessao in [i for i, e in _resultados.items()
+                      if i != exceto and agora - e["acesso"] > TEMPO_MAXIMO_OCIOSO]:
+        apagar += _remover(id_sessao)
+    return apagar
+
+
+def _escolher_despejo(exceto: str) -> list:
+    """
+    (Com a trava.) Marca para despejo os resultados usados há mais tempo
+    até a memória caber no orçamento (o da sessão 'exceto' fica).
+    Retorna [(id_sessao, entrada, tabelas, acesso)] para _despejar.
+    """
+    em_memoria = sum(e["bytes"] for e in _resultados.values()
+                     if e["tabelas"] is not None and not e["despejando"])
+    escolhidos = []
+    for id_sessao, entrada in _resultados.items():  # do menos para o mais recente
+        if em_memoria <= ORCAMENTO_MEMORIA:
+            break
+        if id_sessao == exceto or entrada["tabelas"] is None or entrada["despejando"]:
+            continue
+        entrada["despejando"] = True
+        escolhidos.append((id_sessao, entrada, entrada["tabelas"], entrada["acesso"]))
+        em_memoria -= entrada["bytes"]
+    return escolhidos
+
+
+def _despejar(escolhidos: list) -> None:
+    """
+    Grava em disco os resultados escolhidos (sem a trava) e só então os
+    tira da memória. Se a sessão foi usada ou descartada enquanto gravava,
+    o resultado fica em memória (ou some) e os arquivos são apagados.
+    """
+    for id_sessao, entrada, tabelas, acesso in escolhidos:
+        arquivos = {}
+        despejado = False
+        try:
+            os.makedirs(PASTA_DESPEJO, exist_ok=True)
+            prefixo = os.path.join(PASTA_DESPEJO, f"{id_sessao}-{uuid.uuid4().hex[:8]}")
+            opcoes = pa_ipc.IpcWriteOptions(compression=COMPRESSAO_DESPEJO)
+            for nome, tabela in tabelas.items():
+                caminho = f"{prefixo}__{nome}.arrow"
+                with pa_ipc.new_file(caminho, tabela.schema, options=opcoes) as escritor:
+                    escritor.write_table(tabela)
+                arquivos[nome] = caminho
+        finally:
+            with _trava:
+                entrada["despejando"] = False
+                despejado = (
+                    len(arquivos) == len(tabelas)
+                    and _resultados.get(id_sessao) is entrada
+                    and entrada["acesso"] == acesso
+                )
+                if despejado:
+                    entrada["tabelas"] = None
+                    entrada["arquivos"] = arquivos
+            if not despejado:
+                _apagar(arquivos.values())
+
+
+def _reler(id_sessao: str, entrada: dict, arquivos: dict) -> dict:
+    """
+    Relê (sem a trava) as tabelas despejadas da sessão e as põe de volta
+    na memória; None se o resultado foi descartado enquanto lia.
+    """
+    try:
+        lidas = {}
+        for nome, caminho in arquivos.items():
+            with pa.OSFile(caminho, "rb") as fonte:
+                lidas[nome] = pa_ipc.open_file(fonte).read_all()
+    except OSError:
+        lidas = None  # descartado, ou relido e apagado por outra execução
+
+    apagar = []
+    despejar = []
+    with _trava:
+        if _resultados.get(id_sessao) is not entrada:
+            return None
+        if entrada["tabelas"] is None and lidas is not None:
+            entrada["tabelas"] = lidas
+            entrada["arquivos"] = None
+            apagar = list(arquivos.values())
+            despejar = _escolher_despejo(exceto=id_sessao)
+        tabelas = entrada["tabelas"]
+    _apagar(apagar)
+    _despejar(despejar)
+    if tabelas is None:
+        raise FileNotFoundError(f"Resultado despejado da sessão {id_sessao} não encontrado")
+    return tabelas
+
+
+def _apagar(arquivos) -> None:
+    for caminho in arquivos:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
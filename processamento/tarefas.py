@@ -0,0 +1,97 @@
+# processamento/tarefas.py
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ============================================================
+# Execução em segundo plano com progresso e cancelamento
+# ============================================================
+
+# Número de processamentos simultâneos no servidor (todas as sessões)
+MAX_TAREFAS_SIMULTANEAS = 2
+
+_executor = ThreadPoolExecutor(
+    max_workers=MAX_TAREFAS_SIMULTANEAS, thread_name_prefix="oci"
+)
+
+
+def contexto_processos():
+    """
+    Contexto de multiprocessing para os pools de processos do processamento
+    (atribuicao, pseudonimizacao): 'forkserver', ou 'spawn' onde não há;
+    nunca 'fork'. No app, o processamento roda numa thread deste executor,
+    ao lado das threads do servidor do Streamlit e das de recarga/métricas:
+    um fork copia travas seguradas por elas e o processo filho pode travar.
+    """
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(metodo)
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro do processamento quando o usuário cancela a tarefa."""
+
+
+def submeter_tarefa(chave, funcao, *args, **kwargs) -> dict:
+    """
+    Envia 'funcao(*args, progresso=..., **kwargs)' para o executor e retorna
+    o identificador da tarefa:
+        {
+          'chave':     identifica os parâmetros (arquivo, competência...),
+          'futuro':    concurrent.futures.Future,
+          'cancelar':  threading.Event,
+          'progresso': {'etapa', 'mensagem', 'fracao', 'inicio', 'atualizado'}
+        }
+    A função recebe em 'progresso' um callable progresso(etapa, mensagem, fracao)
+    que atualiza o estado da tarefa e interrompe a execução se ela tiver
+    sido cancelada.
+    """
+    tarefa = {
+        "chave": chave,
+        "cancelar": threading.Event(),
+        "progresso": {
+            "etapa": "na fila",
+            "mensagem": "Aguardando processamento...",
+            "fracao": 0.0,
+            "inicio": time.monotonic(),
+            "atualizado": time.monotonic(),
+        },
+    }
+
+    def progresso(etapa: str, mensagem: str = "", fracao: float = None):
+        if tarefa["cancelar"].is_set():
+            raise TarefaCancelada(etapa)
+        estado = tarefa["progresso"]
+        estado["etapa"] = etapa
+        estado["mensagem"] = mensagem
+        if fracao is not None:
+            estado["fracao"] = max(0.0, min(1.0, fracao))
+        estado["atualizado"] = time.monotonic()
+
+    tarefa["futuro"] = _executor.submit(funcao, *args, progresso=progresso, **kwargs)
+    return tarefa
+
+
+def cancelar_tarefa(tarefa: dict) -> None:
+    """
+    Pede o cancelamento. Se a tarefa ainda estiver na fila, ela nem começa;
+    se estiver rodando, para na próxima etapa.
+    """
+    tarefa["cancelar"].set()
+    tarefa["futuro"].cancel()
+
+
+def situacao_tarefa(tarefa: dict) -> str:
+    """'rodando', 'concluida', 'cancelada' ou 'erro'."""
+    futuro = tarefa["futuro"]
+    if futuro.cancelled():
+        return "cancelada"
+    if not futuro.done():
+        return "rodando"
+    erro = futuro.exception()
+    if erro is None:
+        return "concluida"
+    return "cancelada" if isinstance(erro, TarefaCancelada) else "erro"
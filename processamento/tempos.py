@@ -0,0 +1,95 @@
+# processamento/tempos.py
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# Tempos de espera por episódio (OCI de paciente)
+# ============================================================
+#
+# Uma passada agrupada sobre oci_identificada dá as datas de cada episódio
+# (id_oci_paciente); os tempos são diferenças entre elas, em dias. Os
+# percentis saem de um groupby().quantile() sobre a tabela de episódios,
+# bem menor que a de procedimentos: recalcular com outros filtros é barato.
+
+PERCENTIS = (0.5, 0.9)
+
+# coluna -> descrição
+TEMPOS = {
+    "dias_solicitacao_execucao": "Solicitação até a 1ª execução",
+    "dias_primeira_ultima": "1ª até a última execução",
+    "dias_em_fila": "Idade na fila (OCI em fila)",
+}
+
+_UM_DIA = pd.Timedelta(days=1)
+
+
+def data_referencia(competencia_str: str) -> pd.Timestamp:
+    """Último dia da competência 'MM/AAAA'."""
+    mes, ano = (int(p) for p in competencia_str.split("/"))
+    return pd.Timestamp(year=ano, month=mes, day=1) + pd.offsets.MonthEnd(0)
+
+
+def tempos_episodios(oci_identificada: pd.DataFrame, competencia_str: str = None) -> pd.DataFrame:
+    """
+    Uma linha por OCI de paciente, com as datas e os tempos (em dias):
+      - dias_solicitacao_execucao: primeira solicitação -> primeira execução
+      - dias_primeira_ultima:      primeira -> última execução
+      - dias_em_fila:              só episódios 'em fila': primeira
+                                   solicitação -> último dia da competência
+                                   (sem competência: a data mais recente
+                                   do arquivo)
+    Tempos negativos (datas inconsistentes) ficam vazios.
+    Requer as colunas de adicionar_cid_e_status_oci.
+    """
+    # Colunas constantes no episódio: linha da primeira ocorrência (take),
+    # sem groupby 'first' sobre texto; datas: min/max pelos códigos
+    codigos, _ = pd.factorize(oci_identificada["id_oci_paciente"])
+    primeira = np.unique(codigos, return_index=True)[1]
+    episodios = oci_identificada[
+        ["id_oci_paciente", "id_pacote", "no_oci", "cid_oci", "status_oci"]
+    ].take(primeira).reset_index(drop=True)
+
+    solicitacao = oci_identificada["dt_solicitacao"].groupby(codigos, sort=True)
+    execucao = oci_identificada["dt_execucao"].groupby(codigos, sort=True)
+    episodios = episodios.assign(
+        dt_primeira_solicitacao=solicitacao.min().to_numpy(),
+        dt_primeira_execucao=execucao.min().to_numpy(),
+        dt_ultima_execucao=execucao.max().to_numpy(),
+    )
+
+    if competencia_str is not None:
+        referencia = data_referencia(competencia_str)
+    else:
+        referencia = max(oci_identificada["dt_solicitacao"].max(), oci_identificada["dt_execucao"].max())
+
+    solicitacao = episodios["dt_primeira_solicitacao"]
+    tempos = {
+        "dias_solicitacao_execucao": (episodios["dt_primeira_execucao"] - solicitacao) / _UM_DIA,
+        "dias_primeira_ultima": (
+            episodios["dt_ultima_execucao"] - episodios["dt_primeira_execucao"]
+        ) / _UM_DIA,
+        "dias_em_fila": ((referencia - solicitacao) / _UM_DIA).where(
+            episodios["status_oci"] == "em fila"
+        ),
+    }
+    return episodios.assign(**{nome: dias.where(dias >= 0) for nome, dias in tempos.items()})
+
+
+def percentis_tempos(episodios: pd.DataFrame, por) -> pd.DataFrame:
+    """
+    Percentis (PERCENTIS) dos tempos de tempos_episodios por 'por' (coluna
+    ou lista de colunas), num groupby().quantile() só.
+    Colunas: por, e para cada tempo: <tempo>_n (episódios com o tempo),
+    <tempo>_p50, <tempo>_p90.
+    """
+    grupo = episodios.groupby(por, sort=True, observed=True, dropna=False)[list(TEMPOS)]
+    quantis = grupo.quantile(list(PERCENTIS)).unstack()
+    quantis.columns = [f"{tempo}_p{round(p * 100)}" for tempo, p in quantis.columns]
+    contagens = grupo.count().add_suffix("_n")
+
+    tabela = contagens.join(quantis)
+    ordem = [f"{tempo}_{s}" for tempo in TEMPOS for s in ["n"] + [f"p{round(p * 100)}" for p in PERCENTIS]]
+    return tabela[ordem].reset_index()
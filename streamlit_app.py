@@ -1,362 +1,73 @@
 # streamlit_app.py
 
 import os
+import hashlib
 import pandas as pd
-import numpy as np
 import streamlit as st
-import plotly.express as px
 import io
+import time
+import uuid
 from datetime import datetime, date
 from zoneinfo import ZoneInfo
 from typing import Optional, List
 
+from processamento.ingestao import hash_conteudo, ler_arquivos_mira
+from processamento.normalizacao import normalizar_mira
+from processamento.deduplicacao import POLITICAS_DUPLICADOS, deduplicar_registros
+from processamento.pseudonimizacao import gerar_chave, pseudonimizar_identificadores
+from processamento.historico import versao_da_competencia
+from processamento.recarga import bases_vigentes
+from processamento.processar_mira import processar_mira
+from processamento.metricas import (
+    consultar_cache,
+    cronometrar,
+    iniciar_servidor,
+    marcar_falha_cache,
+)
+from processamento.tarefas import submeter_tarefa, cancelar_tarefa, situacao_tarefa
+from processamento.sessoes import (
+    carregar_resultado,
+    descartar_resultado,
+    guardar_resultado,
+    tem_resultado,
+    uso_memoria,
+)
+from processamento.tempos import TEMPOS, percentis_tempos
+
 
 # =========================================================
 # 1. Funções de processamento (adaptadas do seu script)
 # =========================================================
 
-def listar_procedimentos(df_procedimentos):
-    procedimentos_por_paciente = {}
-    for id_paciente in df_procedimentos['id_paciente'].unique():
-        procedimentos_paciente = (
-            df_procedimentos[df_procedimentos['id_paciente'] == id_paciente]['co_procedimento']
-            .astype(str)
-            .tolist()
-        )
-        procedimentos_por_paciente[id_paciente] = procedimentos_paciente
-    return procedimentos_por_paciente
-
-
-def preparar_regras(df_pacotes):
-    pacotes_agrupados = {}
-
-    df = df_pacotes.copy()
-    df["CO_OCI"] = df["CO_OCI"].astype(str)
-    df["CO_PROCEDIMENTO"] = df["CO_PROCEDIMENTO"].astype(str)
-
-    for co_oci in df["CO_OCI"].unique():
-        regras_pacote = df[df["CO_OCI"] == co_oci]
-
-        grupo_e = []
-        grupos_ou_dict = {}
-        opcionais = []
-
-        for _, row in regras_pacote.iterrows():
-            proc = row["CO_PROCEDIMENTO"].strip()
-            compat = row["TP_COMPATIBILIDADE"]
-            grupo_alt = row.get("OBRIGATORIO_ALTERNATIVO", None)
-
-            try:
-                compat = int(compat)
-            except Exception:
-                pass
-
-            if compat == 5 or compat == "5":
-                if pd.isna(grupo_alt) or str(grupo_alt).strip() == "":
-                    grupo_e.append(proc)
-                else:
-                    chave_grupo = str(grupo_alt).strip()
-                    if chave_grupo not in grupos_ou_dict:
-                        grupos_ou_dict[chave_grupo] = []
-                    grupos_ou_dict[chave_grupo].append(proc)
-
-            elif compat == 1 or compat == "1":
-                opcionais.append(proc)
-
-        grupo_ou = list(grupos_ou_dict.values())
-
-        pacotes_agrupados[co_oci] = {
-            "grupo_e": grupo_e,
-            "grupo_ou": grupo_ou,
-            "opcionais": opcionais
-        }
-
-    return pacotes_agrupados
-
-
-def verificar_pacotes(procedimentos_por_paciente, regras_pacotes):
-    resultados = {}
-
-    for id_paciente, procedimentos_paciente in procedimentos_por_paciente.items():
-        resultados_paciente = {}
-        procedimentos_set = set(map(str, procedimentos_paciente))
-
-        for id_pacote, grupos in regras_pacotes.items():
-            procedimentos_relevantes = []
-
-            grupo_e_completo = True
-            for proc in grupos['grupo_e']:
-                proc = str(proc).strip()
-                if proc in procedimentos_set:
-                    procedimentos_relevantes.append(proc)
-                else:
-                    grupo_e_completo = False
-
-            grupo_ou_completo = True
-            for lista_ou in grupos['grupo_ou']:
-                encontrou = False
-                for proc in lista_ou:
-                    proc = str(proc).strip()
-                    if proc in procedimentos_set:
-                        if not encontrou:
-                            procedimentos_relevantes.append(proc)
-                            encontrou = True
-                if not encontrou:
-                    grupo_ou_completo = False
-
-            pacote_completo = grupo_e_completo and grupo_ou_completo
-
-            opcionais_relevantes = []
-            if 'opcionais' in grupos and pacote_completo:
-                for proc in grupos['opcionais']:
-                    proc = str(proc).strip()
-                    if proc in procedimentos_set:
-                        opcionais_relevantes.append(proc)
-
-            resultados_paciente[id_pacote] = {
-                'status': pacote_completo,
-                'procedimentos_relevantes': procedimentos_relevantes if pacote_completo else [],
-                'procedimentos_opcionais': opcionais_relevantes if pacote_completo else []
-            }
-
-        resultados[id_paciente] = resultados_paciente
-
-    return resultados
-
-
-def marcar_solicitacoes_em_pacote(df_mira, resultados):
-    registros = []
-
-    for id_paciente, pacotes_dict in resultados.items():
-        for id_pacote, dados in pacotes_dict.items():
-            if not dados['status']:
-                continue
-
-            codigos_pacote = []
-            codigos_pacote.extend(dados.get('procedimentos_relevantes', []))
-            codigos_pacote.extend(dados.get('procedimentos_opcionais', []))
-
-            for proc in codigos_pacote:
-                registros.append({
-                    'id_paciente': id_paciente,
-                    'co_procedimento': str(proc),
-                    'id_pacote': id_pacote
-                })
-
-    if not registros:
-        df_out = df_mira.copy()
-        df_out['em_pacote'] = False
-        df_out['id_pacote'] = None
-        return df_out
-
-    df_map = pd.DataFrame(registros)
-
-    df_map_agg = (
-        df_map
-        .groupby(['id_paciente', 'co_procedimento'])['id_pacote']
-        .apply(lambda x: ','.join(sorted(map(str, set(x)))))
-        .reset_index()
-    )
-
-    df_out = df_mira.copy()
-    df_out['co_procedimento'] = df_out['co_procedimento'].astype(str)
-
-    df_out = df_out.merge(
-        df_map_agg,
-        on=['id_paciente', 'co_procedimento'],
-        how='left'
-    )
-
-    df_out['em_pacote'] = df_out['id_pacote'].notna()
-
-    return df_out
-
-
-def adicionar_cid_e_status_oci(oci_identificada: pd.DataFrame) -> pd.DataFrame:
+def executar_busca_oci(df_mira, df_pate, cid, oci_nome, pacotes, idade_sexo, competencia_str,
+                      regras_compiladas=None, versao_regras=None, progresso=None):
     """
-    Cria as colunas:
-      - 'cid_oci'     -> OCI identificada / OCI potencial / OCI desqualificada
-      - 'status_oci'  -> em fila / iniciada / finalizada
-    Baseado no agrupamento por 'id_oci_paciente'.
+    Processamento completo disparado pelo botão "Buscar OCI" (roda em segundo plano),
+    pelo mesmo pipeline do processamento em lote (processamento.processar_mira).
+    versao_regras: versão das bases/regras recebidas, registrada nas estatísticas.
+    Retorna (oci_identificada, estatisticas, tabelas).
     """
-
-    df = oci_identificada.copy()
-
-    # Garantir datetime para dt_execucao
-    df["dt_execucao"] = pd.to_datetime(df["dt_execucao"], errors="coerce")
-
-    def resumo_grupo(g: pd.DataFrame) -> pd.Series:
-
-        # ==========================
-        # 1) CID_OCI
-        # ==========================
-        cid_vals = g["cid_compativel"].fillna(False)
-
-        if cid_vals.all():
-            cid_oci = "OCI identificada"
-        elif cid_vals.any():
-            cid_oci = "OCI potencial"
-        else:
-            cid_oci = "OCI desqualificada"
-
-        # ==========================
-        # 2) STATUS_OCI
-        # ==========================
-        dt = g["dt_execucao"]
-
-        # Caso 1 – todas dt_execucao nulas
-        if dt.isna().all():
-            status = "em fila"
-
-        else:
-            all_not_null = dt.notna().all()
-            if all_not_null:
-                # todas executadas -> pode ser finalizada se último proc é 0301010*
-                idx_last = dt.idxmax()
-                ultimo_proc = str(g.loc[idx_last, "co_procedimento"])
-                if ultimo_proc.startswith("0301010"):
-                    status = "finalizada"
-                else:
-                    # todas executadas, mas última não é 0301010 -> consideramos como "retorno"
-                    status = "retorno"
-            else:
-                # pelo menos uma execução nula e outra não nula
-                status = "iniciada"
-
-        return pd.Series({
-            "cid_oci": cid_oci,
-            "status_oci": status
-        })
-
-    # Aplica por id_oci_paciente
-    resumo = (
-        df
-        .groupby("id_oci_paciente")
-        .apply(resumo_grupo)
-        .reset_index()
-    )
-
-    # Junta nas linhas originais
-    df = df.merge(resumo, on="id_oci_paciente", how="left")
-
-    return df
-
-
-def processar_mira(df_mira, df_pate, cid, oci_nome, pacotes, competencia_str=None):
-    # Limpeza básica
-    df_mira = df_mira.copy()
-    df_mira.dropna(subset=['id_registro', 'id_paciente'], inplace=True)
-
-    # Merge com df_pate para filtrar procedimentos de OCI
-    df_mira = pd.merge(
+    estatisticas = {"versao_regras": versao_regras}
+    tabelas = {}
+    bases = {
+        "df_pate": df_pate,
+        "cid": cid,
+        "oci_nome": oci_nome,
+        "pacotes": pacotes,
+        "idade_sexo": idade_sexo,
+    }
+
+    oci_identificada = processar_mira(
         df_mira,
-        df_pate,
-        left_on='co_procedimento',
-        right_on='codigo',
-        how='left',
-        indicator='merge'
-    )
-    df_mira.drop(columns=['codigo', 'merge'], inplace=True)
-
-    # Datas
-    df_mira['dt_solicitacao'] = pd.to_datetime(df_mira['dt_solicitacao'], errors='coerce')
-    df_mira['dt_execucao'] = pd.to_datetime(df_mira['dt_execucao'], errors='coerce')
-
-    # Concatena procedimento|CBO para grupo 03/04
-    mask = (
-        df_mira['co_procedimento'].astype(str).str.startswith(('03', '04')) &
-        (df_mira['cbo_executante'].astype(str) != '')
-    )
-    df_mira.loc[mask, 'co_procedimento'] = (
-        df_mira.loc[mask, 'co_procedimento'].astype(str) + '|' + df_mira.loc[mask, 'cbo_executante'].astype(str)
+        bases,
+        estatisticas,
+        tabelas,
+        competencia_str=competencia_str,
+        regras_compiladas=regras_compiladas,
+        progresso=progresso,
+        origem="app",
     )
-
-    # Procedimentos executados
-    procedimentos_produzidos = df_mira.query('dt_execucao.notna()')
-
-    # Se quiser usar competência (mês atual + anterior)
-    if not procedimentos_produzidos.empty and competencia_str is not None:
-        mes_sel, ano_sel = competencia_str.split("/")
-        mes_sel = int(mes_sel)
-        ano_sel = int(ano_sel)
-
-        if mes_sel == 1:
-            mes_ant = 12
-            ano_ant = ano_sel - 1
-        else:
-            mes_ant = mes_sel - 1
-            ano_ant = ano_sel
-
-        mascara = (
-            ((procedimentos_produzidos['dt_execucao'].dt.month == mes_sel) &
-             (procedimentos_produzidos['dt_execucao'].dt.year == ano_sel)) |
-            ((procedimentos_produzidos['dt_execucao'].dt.month == mes_ant) &
-             (procedimentos_produzidos['dt_execucao'].dt.year == ano_ant))
-        )
-
-        procedimentos_produzidos = procedimentos_produzidos[mascara]
-
-    # Não realizados
-    nao_realizados = df_mira.query('dt_execucao.isna()')
-
-    # Junta de novo
-    solicitacoes_oci = pd.concat([procedimentos_produzidos, nao_realizados], ignore_index=True)
-
-    # 1) Listar procedimentos por paciente
-    procedimentos_por_paciente = listar_procedimentos(solicitacoes_oci)
-
-    # 2) Regras dos pacotes
-    regras_pacotes = preparar_regras(pacotes)
-
-    # 3) Verificar pacotes
-    resultados = verificar_pacotes(procedimentos_por_paciente, regras_pacotes)
-
-    # 4) DataFrame final com flag em_pacote
-    solicitacoes_oci_marcadas = marcar_solicitacoes_em_pacote(solicitacoes_oci, resultados)
-
-    # Filtra apenas solicitações que viraram OCI
-    oci_identificada = solicitacoes_oci_marcadas.query('em_pacote == True').copy()
-
-    # Explode id_pacote quando há múltiplas OCIs
-    oci_identificada["id_pacote"] = oci_identificada["id_pacote"].astype(str).str.split(",")
-    oci_identificada = oci_identificada.explode("id_pacote", ignore_index=True)
-    oci_identificada["id_pacote"] = oci_identificada["id_pacote"].str.strip()
-    oci_identificada.loc[oci_identificada["id_pacote"] == "", "id_pacote"] = pd.NA
-    oci_identificada["em_pacote"] = oci_identificada["id_pacote"].notna()
-
-    # Compatibilidade CID
-    oci_identificada['cid_motivo'] = (
-        oci_identificada['cid_motivo'].astype(str).str.upper().str.strip()
-    )
-
-    oci_identificada = oci_identificada.merge(
-        cid.assign(cid_compativel=True),
-        how='left',
-        left_on=['id_pacote', 'cid_motivo'],
-        right_on=['CO_OCI', 'CO_CID']
-    )
-    oci_identificada = oci_identificada.drop(columns=['CO_OCI', 'CO_CID'])
-    oci_identificada['cid_compativel'] = oci_identificada['cid_compativel'].fillna(False)
-
-    # Nome da OCI
-    oci_identificada = pd.merge(
-        oci_identificada,
-        oci_nome,
-        left_on='id_pacote',
-        right_on='co_oci',
-        how='left'
-    )
-    oci_identificada.drop(columns=['co_oci'], inplace=True)
-
-    # ID composto
-    oci_identificada['id_oci_paciente'] = (
-        oci_identificada['id_paciente'].astype(str) + '|' + oci_identificada['id_pacote'].astype(str)
-    )
-
-    # Ordena por paciente
-    oci_identificada.sort_values(by='id_paciente', inplace=True)
-
-    return oci_identificada
+    return oci_identificada, estatisticas, tabelas
 
 
 def gerar_competencias_ultimos_12_meses(ref: Optional[date] = None) -> List[str]:
@@ -380,6 +91,162 @@ def gerar_competencias_ultimos_12_meses(ref: Optional[date] = None) -> List[str]
         comps.append(f"{m:02d}/{y:04d}")
     return comps
 
+def anexar_resultado_tarefa():
+    """
+    Se a tarefa da sessão terminou, guarda o resultado (oci_identificada e
+    tabelas complementares no armazenamento compacto de sessões; as
+    estatísticas no session_state) ou exibe o motivo da falha, e libera a
+    tarefa.
+    """
+    tarefa = st.session_state["tarefa_oci"]
+    situacao = situacao_tarefa(tarefa)
+
+    if situacao == "rodando":
+        return
+
+    st.session_state["tarefa_oci"] = None
+
+    if situacao == "concluida":
+        oci_identificada_proc, estatisticas, tabelas = tarefa["futuro"].result()
+        guardar_resultado(st.session_state["id_sessao"], oci_identificada_proc, tabelas)
+        st.session_state["resultado_oci"] = True
+        st.session_state["chave_resultado"] = tarefa["chave"]
+        st.session_state["estatisticas_execucao"] = estatisticas
+    elif situacao == "cancelada":
+        st.sidebar.warning("Processamento cancelado.")
+    else:
+        st.sidebar.error(f"Erro no processamento: {tarefa['futuro'].exception()}")
+
+
+@st.fragment(run_every=1)
+def acompanhar_tarefa():
+    """
+    Mostra o andamento da tarefa em segundo plano. Só este trecho é
+    reexecutado a cada segundo; ao terminar, dispara um rerun completo para
+    exibir o resultado.
+    """
+    tarefa = st.session_state.get("tarefa_oci")
+    if tarefa is None:
+        return
+
+    if situacao_tarefa(tarefa) != "rodando":
+        st.rerun()
+
+    estado = tarefa["progresso"]
+    decorrido = time.monotonic() - estado["inicio"]
+    st.progress(
+        estado["fracao"],
+        text=f"{estado['mensagem'] or estado['etapa']} ({decorrido:.0f}s)"
+    )
+
+    if st.button("Cancelar processamento", key="btn_cancelar_tarefa", use_container_width=True):
+        cancelar_tarefa(tarefa)
+        st.rerun()
+
+
+@st.cache_data
+def gerar_modelo_mira():
+    """
+    Gera uma única vez o arquivo modelo (XLSX vazio com as colunas do MIRA).
+    Retorna (bytes, mime, nome do arquivo, aviso ou None).
+    """
+    modelo_df = pd.DataFrame(columns=[
+        "id_registro",
+        "id_paciente",
+        "co_procedimento",
+        "dt_solicitacao",
+        "dt_execucao",
+        "cbo_executante",
+        "cid_motivo"
+    ])
+
+    buffer = io.BytesIO()
+    try:
+        # tenta gerar XLSX (openpyxl só é importado aqui, na primeira vez)
+        modelo_df.to_excel(buffer, index=False, sheet_name="Modelo_MIRA")
+        return (
+            buffer.getvalue(),
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "modelo_mira.xlsx",
+            None,
+        )
+    except Exception as e:
+        # fallback para CSV se der erro (por exemplo, falta de engine Excel)
+        return (
+            modelo_df.to_csv(index=False).encode("utf-8-sig"),
+            "text/csv",
+            "modelo_mira.csv",
+            f"Não foi possível gerar o arquivo .xlsx (detalhes: {e}). Será disponibilizado um modelo em CSV.",
+        )
+
+
+@st.cache_data
+def carregar_foto_autor(caminho, largura_max=480):
+    """
+    Foto do autor reduzida (JPEG) para não reenviar o arquivo original a cada rerun.
+    Se o Pillow não estiver disponível, devolve o caminho original.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return caminho
+
+    with Image.open(caminho) as img:
+        img = img.convert("RGB")
+        img.thumbnail((largura_max, largura_max * 2))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+def chave_dos_arquivos(arquivos_enviados: list) -> str:
+    """
+    Chave de cache do conjunto de arquivos enviados, independente da ordem,
+    sem reler nem re-hashear os bytes a cada rerun: o hash de cada arquivo
+    (hash_conteudo) fica na sessão por (file_id, tamanho) e só é calculado
+    quando o arquivo chega.
+    """
+    memo = st.session_state.get("hash_arquivos", {})
+    atuais = {}
+    for f in arquivos_enviados:
+        chave = (f.file_id, f.size)
+        atuais[chave] = memo.get(chave) or hash_conteudo([(f.name, f.getvalue())])
+    # Só os arquivos ainda enviados ficam na sessão
+    st.session_state["hash_arquivos"] = atuais
+    h = hashlib.blake2b(digest_size=16)
+    for hash_arquivo in sorted(atuais.values()):
+        h.update(hash_arquivo.encode("ascii"))
+    return h.hexdigest()
+
+
+@st.cache_resource(max_entries=4, show_spinner="Lendo arquivos...")
+def ler_mira_em_cache(chave_conteudo: str, _arquivos_enviados: list,
+                      politica_duplicados: str = "mais_recente",
+                      chave_pseudonimizacao: bytes = None) -> pd.DataFrame:
+    """
+    Lê (em paralelo, juntando os arquivos), normaliza e remove registros
+    duplicados uma vez por conjunto de arquivos (e opções), e não a cada
+    rerun. Com chave_pseudonimizacao, o id_paciente (CPF/CNS) vira hash logo
+    após a leitura, antes de qualquer outra etapa. Retorna (df_mira,
+    relatório de validação).
+    O cache é indexado por chave_conteudo (chave_dos_arquivos):
+    _arquivos_enviados (UploadedFile) fica fora do hash do Streamlit, e os
+    bytes só são lidos quando o cache falha.
+    cache_resource devolve o mesmo objeto sem desserializar uma cópia:
+    o DataFrame é só lido (processar_mira trabalha sobre cópias).
+    """
+    marcar_falha_cache()
+    with cronometrar("ingestao", origem="app"):
+        df_mira = ler_arquivos_mira([(f.name, f.getvalue()) for f in _arquivos_enviados])
+        if chave_pseudonimizacao:
+            df_mira, _ = pseudonimizar_identificadores(df_mira, chave_pseudonimizacao)
+        df_mira, relatorio = normalizar_mira(df_mira)
+        df_mira, duplicados = deduplicar_registros(df_mira, politica_duplicados)
+        if not duplicados.empty:
+            relatorio = pd.concat([relatorio, duplicados], ignore_index=True)
+    return df_mira, relatorio
+
+
 def reset_filtros():
     st.session_state["status_oci_sel"] = status_oci_opcoes_raw.copy()
     st.session_state["status_oci_force"] = None
@@ -391,6 +258,9 @@ def reset_filtros():
 
 st.set_page_config(page_title="Identificador de OCI", layout="wide")
 
+# Endpoint /metrics (só com OCI_METRICAS_PORTA; sobe uma vez por processo)
+iniciar_servidor()
+
 st.title("🔍 Identificador de OCI a partir do Modelo de Informação de Regulação Assistencial (MIRA)")
 
 st.sidebar.header("Configurações")
@@ -400,29 +270,44 @@ if not st.session_state.get("termos_aceitos", False):
     st.sidebar.warning(
         "Para habilitar o upload, é necessário **aceitar os Termos de Uso** na aba inicial."
     )
-    uploaded_file = None
+    uploaded_files = []
 else:
-    uploaded_file = st.sidebar.file_uploader(
-        "Carregue o arquivo MIRA (.csv ou .xls ou .xlsx)",
-        type=["csv", "xlsx", "xls"]
+    uploaded_files = st.sidebar.file_uploader(
+        "Carregue o(s) arquivo(s) MIRA (.csv ou .xls ou .xlsx)",
+        type=["csv", "xlsx", "xls", "zip", "gz", "zst"],
+        accept_multiple_files=True,
+        help="Vários arquivos (ex.: um por unidade ou por mês) são lidos juntos, "
+             "como um único MIRA. Arquivos grandes podem ser enviados compactados "
+             "(.zip, .csv.gz ou .csv.zst).",
+    )
+    politica_duplicados = st.sidebar.radio(
+        "Registros repetidos (mesmo id_registro)",
+        options=list(POLITICAS_DUPLICADOS),
+        format_func=POLITICAS_DUPLICADOS.get,
+        key="politica_duplicados",
+    )
+    pseudonimizar = st.sidebar.checkbox(
+        "Pseudonimizar id_paciente (CPF/CNS) na leitura",
+        key="pseudonimizar_id",
+        help="Troca o identificador por um hash com chave aleatória desta sessão. "
+             "Os resultados baixados trazem o pseudônimo, e não o CPF/CNS.",
     )
 
 
-# Carrega bases auxiliares fixas da pasta bases_auxiliares
-@st.cache_data
-def carregar_bases_auxiliares():
-    base_path = "bases_auxiliares"
-    df_pate = pd.read_csv(os.path.join(base_path, "df_pate.csv"), dtype=str)
-    pacotes = pd.read_csv(os.path.join(base_path, "pacotes.csv"), dtype=str)
-    cid = pd.read_csv(os.path.join(base_path, "cid.csv"), dtype=str)
-    oci_nome = pd.read_csv(os.path.join(base_path, "oci_nome.csv"), dtype=str)
-    # cbo, idade_sexo podem ser usados depois
-    return df_pate, pacotes, cid, oci_nome
-
-
-# Variáveis padrão (para podermos usar nas abas mesmo sem upload)
-df_filtrado = None
-oci_identificada = None
+# Bases auxiliares da pasta bases_auxiliares (versão da competência)
+def carregar_bases_auxiliares(competencia_str=None):
+    # Bases + regras compiladas vêm do artefato mapeado em memória
+    # (compartilhado entre réplicas do mesmo host). Quando os CSV mudam, um
+    # observador compila a nova versão em segundo plano e a troca sem
+    # reiniciar o app. As versões do histórico (regras de competências
+    # passadas) ficam todas carregadas: aqui é só a consulta da versão que
+    # vale em competencia_str (None = atual).
+    vigente = versao_da_competencia(bases_vigentes("bases_auxiliares"), competencia_str)
+    bases = vigente["bases"]
+    return (bases["df_pate"], bases["pacotes"], bases["cid"], bases["oci_nome"],
+            bases["idade_sexo"], vigente["regras"], vigente["versao"])
+
+
 # Controle de estado entre interações
 if "termos_aceitos" not in st.session_state:
     st.session_state["termos_aceitos"] = False
@@ -433,8 +318,19 @@ if "reset_filtros" not in st.session_state:
 if "status_oci_force" not in st.session_state:
     st.session_state["status_oci_force"] = None
 
-if "oci_identificada" not in st.session_state:
-    st.session_state["oci_identificada"] = None
+# oci_identificada e as tabelas complementares ficam em processamento.sessoes
+# (Arrow compacto, despejado em disco quando a sessão fica ociosa); aqui só
+# o identificador da sessão
+if "id_sessao" not in st.session_state:
+    st.session_state["id_sessao"] = uuid.uuid4().hex
+
+if "resultado_oci" not in st.session_state:
+    st.session_state["resultado_oci"] = False
+
+# Chave (arquivo, competência, versão das regras) do resultado guardado:
+# "Buscar OCI" com a mesma chave não reprocessa
+if "chave_resultado" not in st.session_state:
+    st.session_state["chave_resultado"] = None
 
 if "competencia_str" not in st.session_state:
     st.session_state["competencia_str"] = None
@@ -445,48 +341,60 @@ if "status_oci_sel" not in st.session_state:
 if "uploaded_file_id" not in st.session_state:
     st.session_state["uploaded_file_id"] = None
 
+if "estatisticas_execucao" not in st.session_state:
+    st.session_state["estatisticas_execucao"] = None
+
+if "tarefa_oci" not in st.session_state:
+    st.session_state["tarefa_oci"] = None
+
+if "chave_pseudonimizacao" not in st.session_state:
+    st.session_state["chave_pseudonimizacao"] = gerar_chave()
+
 # =========================================================
 # Processamento só se houver arquivo
 # =========================================================
-if uploaded_file is not None:
-    nome_arquivo = uploaded_file.name.lower()
-
-    # Se trocar de arquivo, zera o resultado anterior
-    if st.session_state["uploaded_file_id"] != uploaded_file.name:
-        st.session_state["uploaded_file_id"] = uploaded_file.name
-        st.session_state["oci_identificada"] = None
-
-    # --- Leitura do arquivo MIRA ---
-    if nome_arquivo.endswith(".csv"):
-        try:
-            df_mira = pd.read_csv(uploaded_file, dtype=str, encoding="utf-8", sep=";")
-        except UnicodeDecodeError:
-            uploaded_file.seek(0)
-            df_mira = pd.read_csv(uploaded_file, dtype=str, encoding="latin1", sep=";")
-        except Exception:
-            st.error(
-                "Arquivo CSV inválido. Este sistema aceita apenas CSV com separador ponto e vírgula (;).\n\n"
-                "Abra o arquivo e salve novamente usando o separador ';'."
-            )
-            st.stop()
-
-    elif nome_arquivo.endswith((".xlsx", ".xls")):
-        try:
-            df_mira = pd.read_excel(uploaded_file, dtype=str)
-        except ImportError:
-            st.error(
-                "Este ambiente não está configurado para ler arquivos Excel.\n"
-                "Por favor, envie o arquivo em formato CSV com separador ';'."
-            )
-            st.stop()
-    else:
-        st.error("Formato de arquivo não reconhecido. Envie CSV (com ';') ou XLSX.")
+if uploaded_files:
+    chave_conteudo = chave_dos_arquivos(uploaded_files)
+
+    # Se trocar de arquivos (ou de opções de leitura), zera o resultado anterior
+    id_arquivo = f"{chave_conteudo}|{politica_duplicados}|{pseudonimizar}"
+    if st.session_state["uploaded_file_id"] != id_arquivo:
+        st.session_state["uploaded_file_id"] = id_arquivo
+        descartar_resultado(st.session_state["id_sessao"])
+        st.session_state["resultado_oci"] = False
+        st.session_state["chave_resultado"] = None
+        st.session_state["estatisticas_execucao"] = None
+        if st.session_state["tarefa_oci"] is not None:
+            cancelar_tarefa(st.session_state["tarefa_oci"])
+            st.session_state["tarefa_oci"] = None
+
+    # --- Leitura dos arquivos MIRA (em cache pelo conteúdo dos arquivos) ---
+    try:
+        df_mira, relatorio_validacao = consultar_cache(
+            "leitura", ler_mira_em_cache, chave_conteudo, uploaded_files, politica_duplicados,
+            st.session_state["chave_pseudonimizacao"] if pseudonimizar else None,
+        )
+    except ImportError as e:
+        st.error(
+            f"Este ambiente não está configurado para ler este formato ({e}).\n"
+            "Por favor, envie o arquivo em formato CSV com separador ';'."
+        )
+        st.stop()
+    except Exception as e:
+        st.error(
+            f"Não foi possível ler o arquivo: {e}\n\n"
+            "Envie um CSV (separador ';') ou XLSX com as colunas do modelo, "
+            "puro ou compactado (.zip, .gz, .zst)."
+        )
         st.stop()
 
-    # 2) Bases auxiliares
-    df_pate, pacotes, cid, oci_nome = carregar_bases_auxiliares()
+    # Resumo da validação: linhas descartadas (inclusive duplicadas) e
+    # valores corrigidos/descartados
+    if not relatorio_validacao.empty:
+        with st.sidebar.expander("Validação do arquivo", expanded=False):
+            st.dataframe(relatorio_validacao, hide_index=True, use_container_width=True)
 
-    # 3) Formulário de parâmetros (competência ANTES de processar)
+    # 2) Formulário de parâmetros (competência ANTES de processar)
     ref = datetime.now(ZoneInfo("America/Sao_Paulo")).date()
     competencias = gerar_competencias_ultimos_12_meses(ref=ref)
 
@@ -507,46 +415,127 @@ if uploaded_file is not None:
 
         submitted = st.form_submit_button("🔎 Buscar OCI")
 
-    # 4) Só processa quando o formulário é enviado
+    # 3) Bases auxiliares: regras da competência selecionada
+    (df_pate, pacotes, cid, oci_nome, idade_sexo,
+     regras_compiladas, versao_regras) = carregar_bases_auxiliares(competencia_sel)
+
+    # 4) Só processa quando o formulário é enviado (em segundo plano)
     if submitted:
         # salva a seleção do usuário
         st.session_state["competencia_str"] = competencia_sel
 
-        with st.spinner("Processando solicitações e identificando OCI..."):
-            oci_identificada_proc = processar_mira(
+        chave_tarefa = (st.session_state["uploaded_file_id"], competencia_sel, versao_regras)
+        tarefa = st.session_state["tarefa_oci"]
+
+        # Mesmo arquivo, competência e versão das regras já em andamento, ou
+        # com o resultado ainda guardado: não refaz
+        ja_processado = (
+            st.session_state["resultado_oci"]
+            and st.session_state["chave_resultado"] == chave_tarefa
+            and tem_resultado(st.session_state["id_sessao"])
+        )
+        refazer = (
+            tarefa is None or tarefa["chave"] != chave_tarefa
+            or situacao_tarefa(tarefa) in ("cancelada", "erro")
+        )
+        if refazer and not ja_processado:
+            if tarefa is not None and situacao_tarefa(tarefa) == "rodando":
+                cancelar_tarefa(tarefa)
+
+            descartar_resultado(st.session_state["id_sessao"])
+            st.session_state["resultado_oci"] = False
+            st.session_state["chave_resultado"] = None
+            st.session_state["tarefa_oci"] = submeter_tarefa(
+                chave_tarefa,
+                executar_busca_oci,
                 df_mira,
                 df_pate=df_pate,
                 cid=cid,
                 oci_nome=oci_nome,
                 pacotes=pacotes,
-                competencia_str=competencia_sel
+                idade_sexo=idade_sexo,
+                competencia_str=competencia_sel,
+                regras_compiladas=regras_compiladas,
+                versao_regras=versao_regras
             )
 
-            oci_identificada_proc = adicionar_cid_e_status_oci(oci_identificada_proc)
+    # 4.1) Acompanha a tarefa em segundo plano e anexa o resultado ao terminar
+    if st.session_state["tarefa_oci"] is not None:
+        anexar_resultado_tarefa()
 
-        st.session_state["oci_identificada"] = oci_identificada_proc
+    if st.session_state["tarefa_oci"] is not None:
+        acompanhar_tarefa()
 
 
     # 5) Se já houver resultado processado em memória, aplica filtros
-    if st.session_state["oci_identificada"] is not None:
-        oci_identificada = st.session_state["oci_identificada"]
-
+    if st.session_state["resultado_oci"]:
         st.success(
             f"Processamento concluído. Utilize os filtros para baixar as listas como desejar!"
         )
 
+        estatisticas = st.session_state.get("estatisticas_execucao") or {}
+        if "linhas_entrada" in estatisticas:
+            st.caption(
+                f"Linhas lidas: {estatisticas['linhas_entrada']:,} · "
+                f"fora do catálogo de OCI: {estatisticas['razao_poda']:.1%} · "
+                f"pacientes com procedimento de OCI: "
+                f"{estatisticas['pacientes_candidatos']:,} de {estatisticas['pacientes_entrada']:,}"
+                .replace(",", ".")
+            )
+        if estatisticas.get("versao_regras"):
+            aviso_versao = ""
+            versao_competencia = carregar_bases_auxiliares(st.session_state["competencia_str"])[-1]
+            if estatisticas["versao_regras"] != versao_competencia:
+                aviso_versao = (" · as bases auxiliares foram atualizadas depois deste "
+                                "processamento: clique em Buscar OCI para usar a nova versão")
+            st.caption(f"Versão das regras usada: {estatisticas['versao_regras']}{aviso_versao}")
+
+        # Memória dos resultados: desta sessão e de todas as sessões do servidor
+        uso = uso_memoria()
+        sessao = uso["sessoes"].get(st.session_state["id_sessao"])
+        if sessao is not None:
+            st.caption(
+                f"Resultado desta sessão: {sessao['bytes'] / 2**20:.1f} MB "
+                f"({sessao['linhas']:,} linhas) · todas as sessões: "
+                f"{uso['memoria'] / 2**20:.1f} MB em memória (limite {uso['orcamento'] / 2**20:.0f} MB) "
+                f"· {uso['disco'] / 2**20:.1f} MB em disco".replace(",", ".")
+            )
+
+
+# =====================================================
+# Painel: filtros, indicadores, gráfico e tabela
+# =====================================================
+def forcar_status_oci(status):
+    # Clique em "Filtrar" de um indicador: aplicado no topo do fragmento
+    st.session_state["status_oci_force"] = status
+
+
+@st.fragment
+def painel_oci():
+    """
+    Fragmento do painel: depende só do resultado já processado. Filtros e
+    botões "Filtrar" reexecutam apenas este trecho (sem reler o arquivo,
+    recarregar bases ou redesenhar as outras abas).
+    O resultado é buscado no armazenamento de sessões a cada execução (e
+    não recebido como argumento, que o fragmento manteria em memória).
+    """
+    oci_identificada = carregar_resultado(st.session_state["id_sessao"])
+    if oci_identificada is None:
+        st.info("O resultado desta sessão expirou. Clique em \"Buscar OCI\" novamente.")
+        return
+
+    with st.expander("Filtros principais", expanded=True):
         # =====================================================
         # Filtros principais
         # =====================================================
-        st.sidebar.subheader("Filtros principais")
-
+        
         # 1) Opções de Qualificação OCI (cid_oci)
         if "cid_oci" in oci_identificada.columns:
             qual_oci_opcoes = sorted(oci_identificada["cid_oci"].dropna().unique().tolist())
         else:
             qual_oci_opcoes = []
 
-        qual_oci_sel = st.sidebar.multiselect(
+        qual_oci_sel = st.multiselect(
             "Qualificação OCI",
             options=qual_oci_opcoes,
             default=qual_oci_opcoes
@@ -556,7 +545,7 @@ if uploaded_file is not None:
         oci_nomes = sorted(oci_identificada["no_oci"].dropna().unique().tolist()) \
             if "no_oci" in oci_identificada.columns else []
 
-        oci_sel = st.sidebar.multiselect(
+        oci_sel = st.multiselect(
             "Nome da OCI",
             options=oci_nomes,
             default=oci_nomes[:20] if len(oci_nomes) > 20 else oci_nomes
@@ -569,46 +558,46 @@ if uploaded_file is not None:
             )
         else:
             status_oci_opcoes = []
-        
+
         status_oci_opcoes_raw = status_oci_opcoes.copy()
-        
-        
+
+
         def _norm_status(x: str) -> str:
             return (str(x) if x is not None else "").strip().lower()
-        
-        
+
+
         # -------------------------------------------------
         # RESET GLOBAL — SEMPRE ANTES DOS WIDGETS
         # -------------------------------------------------
         if st.session_state.get("reset_filtros"):
             st.session_state["status_oci_force"] = None
-        
+
             if "status_oci_sel" in st.session_state:
                 del st.session_state["status_oci_sel"]
-        
+
             st.session_state["reset_filtros"] = False
-        
-        
+
+
         # -------------------------------------------------
         # APLICA CLIQUE DE KPI (force)
         # -------------------------------------------------
         if st.session_state.get("status_oci_force"):
             st.session_state["status_oci_sel"] = st.session_state["status_oci_force"]
             st.session_state["status_oci_force"] = None
-        
-        
+
+
         # -------------------------------------------------
         # INICIALIZA SE NÃO EXISTIR
         # -------------------------------------------------
         if "status_oci_sel" not in st.session_state:
             st.session_state["status_oci_sel"] = status_oci_opcoes_raw.copy()
-        
-        
+
+
         # -------------------------------------------------
         # SANEAMENTO
         # -------------------------------------------------
         current = st.session_state.get("status_oci_sel", status_oci_opcoes_raw)
-        
+
         # garantir que current seja sempre uma lista (multiselect retorna lista)
         if current is None:
             current = []
@@ -618,62 +607,418 @@ if uploaded_file is not None:
             # fallback para qualquer outro tipo inesperado (ex.: NaN, número, etc.)
             current = [current]
 
-        
+
         current_norm = {_norm_status(x) for x in current}
         opcoes_norm = [_norm_status(x) for x in status_oci_opcoes_raw]
-        
+
         default_sane = [
             raw for raw, n in zip(status_oci_opcoes_raw, opcoes_norm)
             if n in current_norm
         ]
-        
+
         if not default_sane:
             default_sane = status_oci_opcoes_raw.copy()
-        
+
         st.session_state["status_oci_sel"] = default_sane
-        
-        
+
+
         # -------------------------------------------------
         # WIDGET
         # -------------------------------------------------
-        st.sidebar.multiselect(
+        st.multiselect(
             "Status da OCI",
             options=status_oci_opcoes_raw,
             default=st.session_state["status_oci_sel"],
             key="status_oci_sel",
         )
-        
-        
+
+
         # -------------------------------------------------
         # BOTÃO LIMPAR FILTROS
         # -------------------------------------------------
-        if st.sidebar.button("Limpar filtros", use_container_width=True):
-            st.session_state["reset_filtros"] = True
-            st.rerun()
+        # Callback roda antes da reexecução do fragmento, que já aplica o reset
+        st.button(
+            "Limpar filtros",
+            use_container_width=True,
+            on_click=lambda: st.session_state.update(reset_filtros=True),
+        )
+
+    # 4) Aplicar filtros ao dataframe (máscara única, sem cópias intermediárias)
+    filtro = pd.Series(True, index=oci_identificada.index)
 
-        # 4) Aplicar filtros ao dataframe
-        df_filtrado = oci_identificada.copy()
+    # Filtrar por nome da OCI
+    if oci_sel:
+        filtro &= oci_identificada["no_oci"].isin(oci_sel)
 
-        # Filtrar por nome da OCI
+    # Filtrar por qualificação OCI
+    if qual_oci_sel:
+        filtro &= oci_identificada["cid_oci"].isin(qual_oci_sel)
+
+    status_oci_sel = st.session_state["status_oci_sel"]
+
+    # Filtrar por status da OCI
+    if status_oci_sel:
+        filtro &= oci_identificada["status_oci"].isin(status_oci_sel)
+
+    df_filtrado = oci_identificada[filtro]
+
+    if not df_filtrado.empty:
+        # KPIs – OCI encontradas por status
+        st.markdown("#### OCI encontradas")
+
+        # Trabalhamos em nível de OCI (id_oci_paciente único)
+        df_oci_unica_status = df_filtrado.drop_duplicates(subset=["id_oci_paciente"])
+
+        qtd_em_fila = (
+            df_oci_unica_status
+            .loc[df_oci_unica_status["status_oci"] == "em fila", "id_oci_paciente"]
+            .nunique()
+        )
+
+        qtd_iniciada = (
+            df_oci_unica_status
+            .loc[df_oci_unica_status["status_oci"] == "iniciada", "id_oci_paciente"]
+            .nunique()
+        )
+
+        qtd_retorno = (
+            df_oci_unica_status
+            .loc[df_oci_unica_status["status_oci"] == "retorno", "id_oci_paciente"]
+            .nunique()
+        )
+
+        qtd_finalizada = (
+            df_oci_unica_status
+            .loc[df_oci_unica_status["status_oci"] == "finalizada", "id_oci_paciente"]
+            .nunique()
+        )
+
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric(
+                label="Em fila",
+                value=f"{qtd_em_fila:,}".replace(",", ".")
+            )
+
+            st.button(
+                "Filtrar",
+                key="btn_filtrar_em_fila",
+                use_container_width=True,
+                on_click=forcar_status_oci,
+                args=(["em fila"],),
+            )
+
+
+        with col2:
+            st.metric(
+                label="Iniciadas",
+                value=f"{qtd_iniciada:,}".replace(",", ".")
+            )
+
+            st.button(
+                "Filtrar",
+                key="btn_filtrar_iniciada",
+                use_container_width=True,
+                on_click=forcar_status_oci,
+                args=(["iniciada"],),
+            )
+
+        with col3:
+            st.metric(
+                label="Realizar retorno",
+                value=f"{qtd_retorno:,}".replace(",", ".")
+            )
+
+            st.button(
+                "Filtrar",
+                key="btn_filtrar_retorno",
+                use_container_width=True,
+                on_click=forcar_status_oci,
+                args=(["retorno"],),
+            )
+
+        with col4:
+            st.metric(
+                label="Finalizadas",
+                value=f"{qtd_finalizada:,}".replace(",", ".")
+            )
+
+            st.button(
+                "Filtrar",
+                key="btn_filtrar_finalizada",
+                use_container_width=True,
+                on_click=forcar_status_oci,
+                args=(["finalizada"],),
+            )
+
+        st.markdown("---")
+
+        # ==========================================
+        # Gráfico 2: Quantidade de OCI identificadas (horizontal)
+        # ==========================================
+        st.markdown("#### Quantidade de OCI identificadas")
+
+        cont_oci = (
+            df_filtrado.drop_duplicates(subset=["id_oci_paciente"])
+            .groupby("no_oci")["id_oci_paciente"]
+            .count()
+            .reset_index()
+            .sort_values(by="id_oci_paciente", ascending=True)
+        )
+
+        import plotly.express as px  # import adiado: só carrega quando há gráfico
+
+        fig2 = px.bar(
+            cont_oci,
+            x="id_oci_paciente",
+            y="no_oci",
+            orientation="h",
+            labels={"id_oci_paciente": "",
+                    "no_oci": ""
+                   }
+        )
+
+        fig2.update_traces(
+            text=cont_oci["id_oci_paciente"],
+            textposition="outside"
+        )
+
+        fig2.update_layout(
+            height=600,
+            margin=dict(l=200)
+        )
+
+        st.plotly_chart(fig2, use_container_width=True)
+
+    else:
+        st.info("Nenhum dado após aplicar os filtros para gerar o painel.")
+
+    st.markdown("---")
+
+    st.markdown("#### Extrair tabela")
+    st.write(f"Total de registros filtrados: {len(df_filtrado)}")
+
+    # Remove colunas internas antes de exibir
+    colunas_remover = ['em_pacote', 'cid_compativel', 'idade_sexo_compativel', 'id_oci_paciente', 'conduta']
+    df_exibir = df_filtrado.drop(columns=[c for c in colunas_remover if c in df_filtrado.columns])
+
+    st.dataframe(df_exibir, use_container_width=True)
+
+    # Download do dataframe filtrado (também sem as colunas internas)
+    with cronometrar("exportacao", origem="app"):
+        csv_filtrado = df_exibir.to_csv(index=False, sep=";")
+    st.download_button(
+        label="⬇️ Baixar tabela filtrada (CSV)",
+        data=csv_filtrado.encode("utf-8-sig"),
+        file_name="oci_identificada_filtrada.csv",
+        mime="text/csv"
+    )
+
+    # ==========================================
+    # OCI quase fechadas (falta 1 requisito obrigatório)
+    # ==========================================
+    st.markdown("---")
+    st.markdown("#### OCI quase fechadas")
+    st.caption("Pacientes a um requisito obrigatório (exame, consulta...) de fechar a OCI.")
+
+    quase_fechadas = carregar_resultado(st.session_state["id_sessao"], "quase_fechadas")
+
+    if quase_fechadas is None or quase_fechadas.empty:
+        st.info("Nenhum paciente a um requisito de fechar uma OCI.")
+    else:
+        df_quase = quase_fechadas
+
+        # Respeita o filtro "Nome da OCI" (expander "Filtros principais" do Painel)
         if oci_sel:
-            df_filtrado = df_filtrado[df_filtrado["no_oci"].isin(oci_sel)]
+            df_quase = df_quase[df_quase["no_oci"].isin(oci_sel)]
+
+        faltantes_opcoes = sorted(df_quase["grupos_faltantes"].dropna().unique().tolist())
+        faltantes_sel = st.multiselect(
+            "Requisito faltante",
+            options=faltantes_opcoes,
+            default=[],
+            placeholder="Todos"
+        )
+        if faltantes_sel:
+            df_quase = df_quase[df_quase["grupos_faltantes"].isin(faltantes_sel)]
 
-        # Filtrar por qualificação OCI
-        if qual_oci_sel:
-            df_filtrado = df_filtrado[df_filtrado["cid_oci"].isin(qual_oci_sel)]
+        st.write(f"Total de pacientes x OCI quase fechadas: {len(df_quase)}")
+        st.dataframe(df_quase, use_container_width=True)
 
-        status_oci_sel = st.session_state["status_oci_sel"]
-        
-        # Filtrar por status da OCI
-        if status_oci_sel:
-            df_filtrado = df_filtrado[df_filtrado["status_oci"].isin(status_oci_sel)]
+        st.download_button(
+            label="⬇️ Baixar OCI quase fechadas (CSV)",
+            data=df_quase.to_csv(index=False, sep=";").encode("utf-8-sig"),
+            file_name="oci_quase_fechadas.csv",
+            mime="text/csv"
+        )
+
+    # ==========================================
+    # Gargalos: requisitos que mais impedem o fechamento
+    # ==========================================
+    st.markdown("---")
+    st.markdown("#### Gargalos por OCI")
+    st.caption(
+        "Entre os pacientes elegíveis que começaram uma OCI sem fechá-la, quantos "
+        "não têm cada requisito obrigatório."
+    )
 
+    gargalos = carregar_resultado(st.session_state["id_sessao"], "gargalos")
 
+    if gargalos is None or gargalos.empty:
+        st.info("Nenhuma OCI em aberto para apontar gargalos.")
+    else:
+        df_gargalos = gargalos[gargalos["pacientes_sem_requisito"] > 0]
+
+        # Respeita o filtro "Nome da OCI" (expander "Filtros principais" do Painel)
+        if oci_sel:
+            df_gargalos = df_gargalos[df_gargalos["no_oci"].isin(oci_sel)]
+
+        if df_gargalos.empty:
+            st.info("Nenhum requisito faltante nas OCI selecionadas.")
+        else:
+            top_gargalos = (
+                df_gargalos.nlargest(15, "pacientes_sem_requisito")
+                # (textos vêm do armazenamento de sessões como categóricos)
+                .assign(rotulo=lambda d: (
+                    d["no_oci"].astype(object).fillna(d["id_pacote"].astype(object)).astype(str)
+                    + " — " + d["requisito"].astype(str)
+                ))
+                .sort_values("pacientes_sem_requisito", ascending=True)
+            )
+
+            import plotly.express as px  # import adiado: só carrega quando há gráfico
+
+            fig_gargalos = px.bar(
+                top_gargalos,
+                x="pacientes_sem_requisito",
+                y="rotulo",
+                orientation="h",
+                hover_data=["pacientes_em_aberto", "fracao_sem_requisito"],
+                labels={"pacientes_sem_requisito": "Pacientes sem o requisito",
+                        "rotulo": ""
+                       }
+            )
+            fig_gargalos.update_traces(
+                text=top_gargalos["pacientes_sem_requisito"],
+                textposition="outside"
+            )
+            fig_gargalos.update_layout(
+                height=max(300, 40 * len(top_gargalos)),
+                margin=dict(l=200)
+            )
+            st.plotly_chart(fig_gargalos, use_container_width=True)
+
+            st.dataframe(df_gargalos, use_container_width=True)
+            st.download_button(
+                label="⬇️ Baixar gargalos (CSV)",
+                data=df_gargalos.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                file_name="oci_gargalos.csv",
+                mime="text/csv"
+            )
+
+    # ==========================================
+    # Tempos de espera por OCI (percentis)
+    # ==========================================
+    st.markdown("---")
+    st.markdown("#### Tempos de espera")
+    st.caption(
+        "Em dias, por OCI de paciente: da primeira solicitação à primeira execução, "
+        "da primeira à última execução e, para as OCI em fila, da primeira "
+        "solicitação ao fim da competência."
+    )
+
+    tempos = carregar_resultado(st.session_state["id_sessao"], "tempos")
+
+    if tempos is None or tempos.empty:
+        st.info("Nenhuma OCI para calcular tempos de espera.")
+    else:
+        # Mesmos filtros do expander "Filtros principais": só as OCI de
+        # paciente filtradas
+        df_tempos = tempos[tempos["id_oci_paciente"].isin(df_filtrado["id_oci_paciente"].unique())]
+
+        if df_tempos.empty:
+            st.info("Nenhuma OCI nos filtros selecionados.")
+        else:
+            col_t1, col_t2, col_t3, col_t4 = st.columns(4)
+            espera = df_tempos["dias_solicitacao_execucao"]
+            fila = df_tempos["dias_em_fila"]
+            col_t1.metric("Solicitação → execução (mediana)", f"{espera.median():.0f} dias" if espera.notna().any() else "—")
+            col_t2.metric("Solicitação → execução (p90)", f"{espera.quantile(0.9):.0f} dias" if espera.notna().any() else "—")
+            col_t3.metric("OCI em fila", f"{int(fila.notna().sum()):,}".replace(",", "."))
+            col_t4.metric("Idade na fila (mediana)", f"{fila.median():.0f} dias" if fila.notna().any() else "—")
+
+            agrupar_por = st.radio("Agrupar por", ["OCI", "Status da OCI"], horizontal=True)
+            por = ["id_pacote", "no_oci"] if agrupar_por == "OCI" else "status_oci"
+            df_percentis = percentis_tempos(df_tempos, por)
+
+            tempo_sel = st.selectbox(
+                "Tempo",
+                options=list(TEMPOS),
+                format_func=TEMPOS.get,
+            )
+            eixo = "no_oci" if agrupar_por == "OCI" else "status_oci"
+            df_grafico = (
+                df_percentis[df_percentis[f"{tempo_sel}_n"] > 0]
+                .sort_values(f"{tempo_sel}_p50", ascending=True)
+                .melt(
+                    id_vars=[eixo],
+                    value_vars=[f"{tempo_sel}_p50", f"{tempo_sel}_p90"],
+                    var_name="percentil",
+                    value_name="dias",
+                )
+                .assign(percentil=lambda d: d["percentil"].str.rsplit("_", n=1).str[-1])
+            )
+
+            if df_grafico.empty:
+                st.info("Nenhuma OCI com esse tempo nos filtros selecionados.")
+            else:
+                import plotly.express as px  # import adiado: só carrega quando há gráfico
+
+                fig_tempos = px.bar(
+                    df_grafico,
+                    x="dias",
+                    y=eixo,
+                    color="percentil",
+                    barmode="group",
+                    orientation="h",
+                    labels={"dias": "Dias", eixo: "", "percentil": ""}
+                )
+                fig_tempos.update_layout(
+                    height=max(300, 30 * df_grafico[eixo].nunique() + 100),
+                    margin=dict(l=200)
+                )
+                st.plotly_chart(fig_tempos, use_container_width=True)
+
+            st.dataframe(df_percentis, use_container_width=True)
+            st.download_button(
+                label="⬇️ Baixar tempos por OCI de paciente (CSV)",
+                data=df_tempos.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                file_name="oci_tempos_espera.csv",
+                mime="text/csv"
+            )
+
+    # ==========================================
+    # Registros disputados por mais de uma OCI
+    # ==========================================
+    conflitos = carregar_resultado(st.session_state["id_sessao"], "conflitos")
+
+    if conflitos is not None and not conflitos.empty:
+        st.markdown("---")
+        with st.expander(f"Registros que serviam a mais de uma OCI ({len(conflitos)})"):
+            st.caption(
+                "Cada registro foi atribuído a uma única OCI (coluna id_pacote_atribuido), "
+                "mantendo fechado o maior número possível de OCI. Registros sem atribuição "
+                "não entram em nenhuma lista."
+            )
+            st.dataframe(conflitos, use_container_width=True)
+            st.download_button(
+                label="⬇️ Baixar registros disputados (CSV)",
+                data=conflitos.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                file_name="oci_registros_disputados.csv",
+                mime="text/csv"
+            )
 
-else:
-    # Sem arquivo, mantém df_filtrado = None e oci_identificada = None
-    df_filtrado = None
-    oci_identificada = None
 
 # =====================================================
 # Abas: Instruções / Painel / Tabela
@@ -731,6 +1076,8 @@ with tab1:
     ### 7) Executável para criptografia de CPF
     - Para auxiliar na proteção do CPF antes do upload, o autor disponibiliza um **executável que criptografa o CPF** previamente.
     - **Importante:** para o correto funcionamento do executável, a coluna que contém o CPF deve estar nomeada exatamente como `id_paciente`.
+    - Em Linux/macOS (ou para arquivos grandes), a mesma proteção está disponível no script `ferramentas/pseudonimizar.py` do repositório, que troca CPF/CNS por um hash com chave secreta guardada localmente: `python ferramentas/pseudonimizar.py mira.csv mira_pseudonimizado.csv --chave chave.txt`.
+    - Também é possível marcar, na barra lateral, a opção **Pseudonimizar id_paciente (CPF/CNS) na leitura**: o identificador é trocado logo após a leitura, com uma chave aleatória da sessão.
     
     ## Responsabilidade do usuário
     - O upload de arquivos e todo o conteúdo submetido são de **responsabilidade exclusiva do usuário** da aplicação.
@@ -779,11 +1126,18 @@ with tab2:
     - `cbo_executante` – CBO do profissional executante (obrigatório para procedimentos do grupo 03 e 04).
     - `cid_motivo` – CID informado como motivo/diagnóstico para o procedimento (pode estar em branco quando não houver esse dado).
 
+    ### ➕ Colunas opcionais
+
+    - `dt_nascimento` – data de nascimento do paciente.
+    - `sexo` – sexo do paciente (`M` ou `F`).
+
+    Quando presentes, são usadas para descartar OCI fora da faixa de idade/sexo definida no SIGTAP.
+
     ### 📌 Observações importantes
 
     - A coluna **dt_execucao** é usada para identificar competência e determinar se o procedimento
       foi realizado; ela deve estar em formato de data conhecido (`YYYY-MM-DD` ou `DD/MM/YYYY`).
-    - O arquivo deve estar no formato **CSV**, **XLS** ou **XLSX**.
+    - O arquivo deve estar no formato **CSV**, **XLS** ou **XLSX**, puro ou compactado (**.zip**, **.csv.gz** ou **.csv.zst**); vários arquivos podem ser enviados de uma vez.
     - Caso use formato **CSV**, o separador utilizado deve ser o ponto e vírgula `;`
     - Colunas adicionais são aceitas e não atrapalham o processamento.
 
@@ -799,30 +1153,9 @@ with tab2:
     # -------------------------------
     # Botão para baixar modelo MIRA
     # -------------------------------
-    modelo_df = pd.DataFrame(columns=[
-        "id_registro",
-        "id_paciente",
-        "co_procedimento",
-        "dt_solicitacao",
-        "dt_execucao",
-        "cbo_executante",
-        "cid_motivo"
-    ])
-
-    buffer = io.BytesIO()
-    try:
-        # tenta gerar XLSX
-        modelo_df.to_excel(buffer, index=False, sheet_name="Modelo_MIRA")
-        buffer.seek(0)
-        data_bytes = buffer.getvalue()
-        mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        file_name = "modelo_mira.xlsx"
-    except Exception as e:
-        # fallback para CSV se der erro (por exemplo, falta de engine Excel)
-        st.warning(f"Não foi possível gerar o arquivo .xlsx (detalhes: {e}). Será disponibilizado um modelo em CSV.")
-        data_bytes = modelo_df.to_csv(index=False).encode("utf-8-sig")
-        mime_type = "text/csv"
-        file_name = "modelo_mira.csv"
+    data_bytes, mime_type, file_name, aviso_modelo = gerar_modelo_mira()
+    if aviso_modelo:
+        st.warning(aviso_modelo)
 
     st.download_button(
         label="📥 Baixar arquivo modelo (MIRA)",
@@ -841,7 +1174,9 @@ with tab2:
         "endereço, nome completo, etc.).\n\n"
         "Para utilizar o identificador de OCI, utilize a ferramenta abaixo para **criptografar o CPF antes** de subir a planilha.\n\n"
         "**Importante:** para a ferramenta funcionar corretamente, a coluna do CPF deve estar nomeada exatamente como "
-        "`id_paciente`."
+        "`id_paciente`.\n\n"
+        "Em Linux/macOS, use o script `ferramentas/pseudonimizar.py` do repositório "
+        "(`python ferramentas/pseudonimizar.py mira.csv saida.csv --chave chave.txt`)."
     )
 
     # Substitua pela URL real do seu Google Drive (ideal: link compartilhável direto do arquivo)
@@ -859,142 +1194,10 @@ with tab2:
 with tab3:
     st.subheader("Painel")
 
-    if df_filtrado is None:
+    if not uploaded_files or not st.session_state["resultado_oci"]:
         st.info("👈 Carregue um arquivo MIRA na barra lateral para gerar o painel.")
     else:
-        if not df_filtrado.empty:
-            # KPIs – OCI encontradas por status
-            st.markdown("#### OCI encontradas")
-
-            # Trabalhamos em nível de OCI (id_oci_paciente único)
-            df_oci_unica_status = df_filtrado.drop_duplicates(subset=["id_oci_paciente"])
-
-            qtd_em_fila = (
-                df_oci_unica_status
-                .loc[df_oci_unica_status["status_oci"] == "em fila", "id_oci_paciente"]
-                .nunique()
-            )
-
-            qtd_iniciada = (
-                df_oci_unica_status
-                .loc[df_oci_unica_status["status_oci"] == "iniciada", "id_oci_paciente"]
-                .nunique()
-            )
-
-            qtd_retorno = (
-                df_oci_unica_status
-                .loc[df_oci_unica_status["status_oci"] == "retorno", "id_oci_paciente"]
-                .nunique()
-            )
-
-            qtd_finalizada = (
-                df_oci_unica_status
-                .loc[df_oci_unica_status["status_oci"] == "finalizada", "id_oci_paciente"]
-                .nunique()
-            )
-
-            col1, col2, col3, col4 = st.columns(4)
-
-            with col1:
-                st.metric(
-                    label="Em fila",
-                    value=f"{qtd_em_fila:,}".replace(",", ".")
-                )
-            
-                if st.button("Filtrar", key="btn_filtrar_em_fila", use_container_width=True):
-                    st.session_state["status_oci_force"] = ["em fila"]
-                    st.rerun()
-            
-
-            with col2:
-                st.metric(
-                    label="Iniciadas",
-                    value=f"{qtd_iniciada:,}".replace(",", ".")
-                )
-
-                if st.button("Filtrar", key="btn_filtrar_iniciada", use_container_width=True):
-                    st.session_state["status_oci_force"] = ["iniciada"]
-                    st.rerun()
-
-            with col3:
-                st.metric(
-                    label="Realizar retorno",
-                    value=f"{qtd_retorno:,}".replace(",", ".")
-                )
-                
-                if st.button("Filtrar", key="btn_filtrar_retorno", use_container_width=True):
-                    st.session_state["status_oci_force"] = ["retorno"]
-                    st.rerun()
-                    
-            with col4:
-                st.metric(
-                    label="Finalizadas",
-                    value=f"{qtd_finalizada:,}".replace(",", ".")
-                )
-                
-                if st.button("Filtrar", key="btn_filtrar_finalizada", use_container_width=True):
-                    st.session_state["status_oci_force"] = ["finalizada"]
-                    st.rerun()
-                    
-            st.markdown("---")
-
-            # ==========================================
-            # Gráfico 2: Quantidade de OCI identificadas (horizontal)
-            # ==========================================
-            st.markdown("#### Quantidade de OCI identificadas")
-
-            cont_oci = (
-                df_filtrado.drop_duplicates(subset=["id_oci_paciente"])
-                .groupby("no_oci")["id_oci_paciente"]
-                .count()
-                .reset_index()
-                .sort_values(by="id_oci_paciente", ascending=True)
-            )
-
-            fig2 = px.bar(
-                cont_oci,
-                x="id_oci_paciente",
-                y="no_oci",
-                orientation="h",
-                labels={"id_oci_paciente": "",
-                        "no_oci": ""
-                       }
-            )
-
-            fig2.update_traces(
-                text=cont_oci["id_oci_paciente"],
-                textposition="outside"
-            )
-
-            fig2.update_layout(
-                height=600,
-                margin=dict(l=200)
-            )
-
-            st.plotly_chart(fig2, use_container_width=True)
-
-        else:
-            st.info("Nenhum dado após aplicar os filtros para gerar o painel.")
-
-        st.markdown("---")
-
-        st.markdown("#### Extrair tabela")
-        st.write(f"Total de registros filtrados: {len(df_filtrado)}")
-
-        # Remove colunas internas antes de exibir
-        colunas_remover = ['em_pacote', 'cid_compativel', 'id_oci_paciente']
-        df_exibir = df_filtrado.drop(columns=[c for c in colunas_remover if c in df_filtrado.columns])
-
-        st.dataframe(df_exibir, use_container_width=True)
-
-        # Download do dataframe filtrado (também sem as colunas internas)
-        csv_filtrado = df_exibir.to_csv(index=False, sep=";")
-        st.download_button(
-            label="⬇️ Baixar tabela filtrada (CSV)",
-            data=csv_filtrado.encode("utf-8-sig"),
-            file_name="oci_identificada_filtrada.csv",
-            mime="text/csv"
-        )
+        painel_oci()
 
 with tab4:
     st.subheader("Sobre o autor")
@@ -1009,7 +1212,7 @@ with tab4:
 
     with col_foto:
         if os.path.exists(FOTO_PATH):
-            st.image(FOTO_PATH, caption="Samuel de Sousa Alencar", use_container_width=True)
+            st.image(carregar_foto_autor(FOTO_PATH), caption="Samuel de Sousa Alencar", use_container_width=True)
         else:
             # fallback: caso você não tenha colocado a foto ainda
             st.info("Adicione sua foto em `assets/autor.jpg` para exibir aqui.")
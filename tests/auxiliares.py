@@ -0,0 +1,39 @@
+# tests/auxiliares.py
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+
+def mira(linhas, **padrao):
+    """
+    DataFrame MIRA (texto, como lido do arquivo) a partir de tuplas
+    (id_registro, co_procedimento, cbo_executante, dt_execucao); as demais
+    colunas vêm de 'padrao'.
+    """
+    colunas = {
+        "id_paciente": "P1",
+        "dt_solicitacao": "2025-06-01",
+        "cid_motivo": "H52",
+    }
+    colunas.update(padrao)
+    df = pd.DataFrame(linhas, columns=["id_registro", "co_procedimento", "cbo_executante", "dt_execucao"])
+    return df.assign(**colunas)[
+        ["id_registro", "id_paciente", "co_procedimento", "cbo_executante",
+         "dt_solicitacao", "dt_execucao", "cid_motivo"]
+    ]
+
+
+def regras(linhas):
+    """
+    Regras compiladas (preparar_regras + compilar_mascaras) a partir de
+    tuplas (CO_OCI, CO_PROCEDIMENTO, TP_COMPATIBILIDADE, OBRIGATORIO_ALTERNATIVO).
+    Retorna (regras_pacotes, compilado).
+    """
+    from processamento.mascaras import compilar_mascaras
+    from processamento.processar_mira import preparar_regras
+
+    df = pd.DataFrame(
+        linhas, columns=["CO_OCI", "CO_PROCEDIMENTO", "TP_COMPATIBILIDADE", "OBRIGATORIO_ALTERNATIVO"]
+    )
+    regras_pacotes = preparar_regras(df)
+    return regras_pacotes, compilar_mascaras(regras_pacotes)
@@ -0,0 +1,21 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+# Raiz do projeto (processamento, streamlit_app) e ferramentas (medições)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "ferramentas"))
+
+from processamento.artefato import ler_bases_csv  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def bases():
+    """Bases auxiliares do projeto (bases_auxiliares/*.csv)."""
+    return ler_bases_csv(os.path.join(RAIZ, "bases_auxiliares"))
+
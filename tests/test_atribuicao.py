@@ -0,0 +1,96 @@
+# tests/test_atribuicao.py
+# -*- coding: utf-8 -*-
+"""Atribuição de cada registro a no máximo uma OCI (processamento/atribuicao.py)."""
+
+import pandas as pd
+
+from auxiliares import mira, regras
+from processamento import atribuicao, processar_mira
+from processamento.atribuicao import _tentar_ordem, atribuir_registros
+
+
+def test_alternativas_de_grupo_ou_fecham_duas_oci(bases):
+    # 0901010014 e 0901010057 aceitam as duas consultas no grupo 'consulta';
+    # cada uma só fecha se ficar com uma delas
+    df = mira([
+        ("1", "0301010072", "225250", "2025-06-10"),
+        ("2", "0301010307", "225250", "2025-06-10"),
+        ("3", "0204030030", "", "2025-06-10"),
+        ("4", "0201010666", "", "2025-06-10"),
+        ("5", "0203020081", "", "2025-06-10"),
+    ])
+    tabelas = {}
+    resultado = processar_mira(df, bases, tabelas=tabelas, competencia_str="06/2025")
+
+    por_registro = dict(zip(resultado["id_registro"], resultado["id_pacote"]))
+    assert por_registro == {
+        "1": "0901010014", "3": "0901010014",
+        "2": "0901010057", "4": "0901010057", "5": "0901010057",
+    }
+    assert not resultado["id_registro"].duplicated().any()
+    assert sorted(tabelas["conflitos"]["id_pacote_atribuido"]) == ["0901010014", "0901010057"]
+
+
+# A (um de P1/P2), B (P1) e E (um de P2/P4): com P1, P2 e P4, as três fecham
+# só se A ficar com P2. Na ordem A, B, E, A pega P1 e B não fecha.
+REGRAS_DISPUTA = [
+    ("A", "P1", "5", "x"), ("A", "P2", "5", "x"),
+    ("B", "P1", "5", None),
+    ("E", "P2", "5", "y"), ("E", "P4", "5", "y"),
+]
+
+
+def _disputa():
+    _, compilado = regras(REGRAS_DISPUTA)
+    oci_identificada = pd.DataFrame({
+        "id_paciente": "P",
+        "id_registro": ["1", "1", "2", "2", "4"],
+        "co_procedimento": ["P1", "P1", "P2", "P2", "P4"],
+        "id_pacote": ["A", "B", "A", "E", "E"],
+        "episodio": 1,
+    })
+    return oci_identificada, compilado
+
+
+def _atribuicoes(resultado):
+    return sorted(zip(resultado["id_registro"], resultado["id_pacote"]))
+
+
+def test_uma_ordem_so_nao_fecha_todas():
+    # Cada OCI tem um requisito só (bit 1); P4 é exclusiva de E
+    a, b, e = ("A", 1), ("B", 1), ("E", 1)
+    fechadas, _ = _tentar_ordem(
+        [a, b, e],
+        {a: 1, b: 1, e: 1},
+        {e: 1},
+        [("1", {a: 1, b: 1}), ("2", {a: 1, e: 1})],
+    )
+    assert fechadas == [a, e]
+
+
+def test_busca_exata_fecha_todas():
+    oci_identificada, compilado = _disputa()
+    resultado, conflitos = atribuir_registros(oci_identificada, compilado)
+
+    assert _atribuicoes(resultado) == [("1", "B"), ("2", "A"), ("4", "E")]
+    assert dict(zip(conflitos["id_registro"], conflitos["id_pacote_atribuido"])) == {"1": "B", "2": "A"}
+
+
+def test_guloso_com_reparo_fecha_todas(monkeypatch):
+    monkeypatch.setattr(atribuicao, "MAX_OCI_BUSCA_EXATA", 0)
+    oci_identificada, compilado = _disputa()
+    resultado, _ = atribuir_registros(oci_identificada, compilado)
+
+    assert _atribuicoes(resultado) == [("1", "B"), ("2", "A"), ("4", "E")]
+
+
+def test_sem_disputa_passa_direto():
+    _, compilado = regras(REGRAS_DISPUTA)
+    oci_identificada = pd.DataFrame({
+        "id_paciente": ["P", "Q"], "id_registro": ["1", "2"], "co_procedimento": ["P1", "P4"],
+        "id_pacote": ["B", "E"], "episodio": 1,
+    })
+    resultado, conflitos = atribuir_registros(oci_identificada, compilado)
+
+    assert resultado is oci_identificada
+    assert conflitos.empty
@@ -0,0 +1,40 @@
+# tests/test_cbo.py
+# -*- coding: utf-8 -*-
+"""Compatibilidade do CBO executante (processamento/cbo.py)."""
+
+import pandas as pd
+
+from auxiliares import mira
+from processamento import processar_mira
+
+OCI = "0901010014"  # 0204030030 + consulta 0301010072/0301010307 (CBO 225250/225255)
+
+
+def _compatibilidade(resultado):
+    return dict(zip(resultado["id_registro"], resultado["cbo_compativel"]))
+
+
+def test_exame_com_cbo_fora_da_lista_fica_compativel(bases):
+    df = mira([
+        ("1", "0301010072", "225250", "2025-06-10"),
+        ("2", "0204030030", "225320", "2025-06-10"),  # executado pela radiologia
+    ])
+    resultado = processar_mira(df, bases, competencia_str="06/2025")
+
+    assert set(resultado["id_pacote"]) == {OCI}
+    assert _compatibilidade(resultado) == {"1": True, "2": True}
+
+
+def test_consulta_com_cbo_fora_da_lista_da_oci(bases):
+    # cbo.csv só aceita 225255 na OCI; pacotes.csv aceita a consulta com 225250
+    cbo = pd.concat([
+        bases["cbo"][bases["cbo"]["CO_OCI"] != OCI],
+        pd.DataFrame({"CO_OCI": [OCI], "CO_CBO": ["225255"]}),
+    ], ignore_index=True)
+    df = mira([
+        ("1", "0301010072", "225250", "2025-06-10"),
+        ("2", "0204030030", "225320", "2025-06-10"),
+    ])
+    resultado = processar_mira(df, {**bases, "cbo": cbo}, competencia_str="06/2025")
+
+    assert _compatibilidade(resultado) == {"1": False, "2": True}
@@ -0,0 +1,56 @@
+# tests/test_deduplicacao.py
+# -*- coding: utf-8 -*-
+"""Políticas de registros duplicados (processamento/deduplicacao.py)."""
+
+import pandas as pd
+import pytest
+
+from processamento.deduplicacao import deduplicar_registros
+
+
+@pytest.fixture
+def repetidos():
+    return pd.DataFrame({
+        "id_registro": ["1", "2", "1", "3", "1", "2"],
+        "origem": ["a", "b", "c", "d", "e", "f"],
+        "dt_execucao": pd.to_datetime(
+            [None, "2025-01-10", "2025-03-01", None, "2025-02-01", "2025-01-10"]
+        ),
+    })
+
+
+def test_mais_recente_fica_com_a_maior_execucao(repetidos):
+    df, relatorio = deduplicar_registros(repetidos, "mais_recente")
+
+    # 1: execução mais recente (c); 2: empate -> primeira do arquivo (b)
+    assert df["origem"].tolist() == ["b", "c", "d"]
+    assert relatorio["linhas"].tolist() == [3]
+
+
+def test_primeira_fica_com_a_primeira_do_arquivo(repetidos):
+    df, relatorio = deduplicar_registros(repetidos, "primeira")
+
+    assert df["origem"].tolist() == ["a", "b", "d"]
+    assert relatorio["linhas"].tolist() == [3]
+
+
+def test_nao_executada_perde_para_executada():
+    df, _ = deduplicar_registros(pd.DataFrame({
+        "id_registro": ["1", "1"],
+        "origem": ["executada", "pendente"],
+        "dt_execucao": pd.to_datetime(["2024-01-01", None]),
+    }))
+    assert df["origem"].tolist() == ["executada"]
+
+
+def test_sem_duplicados_devolve_o_mesmo_df(repetidos):
+    unicos = repetidos.drop_duplicates("id_registro")
+    df, relatorio = deduplicar_registros(unicos)
+
+    assert df is unicos
+    assert relatorio.empty
+
+
+def test_politica_desconhecida(repetidos):
+    with pytest.raises(ValueError):
+        deduplicar_registros(repetidos, "ultima")
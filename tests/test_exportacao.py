@@ -0,0 +1,73 @@
+# tests/test_exportacao.py
+# -*- coding: utf-8 -*-
+"""Dataset Parquet particionado por competência (processamento/exportacao.py)."""
+
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from processamento.exportacao import abrir_dataset, gravar_dataset
+
+
+def _resultado(n, id_pacote="0901010014"):
+    registros = [str(i) for i in range(n)]
+    return pd.DataFrame({
+        "id_paciente": [f"P{i}" for i in range(n)],
+        "id_registro": registros,
+        "co_procedimento": "0204030030",
+        "id_pacote": id_pacote,
+        "no_oci": "OCI",
+        "dt_solicitacao": pd.Timestamp("2025-06-01"),
+        "dt_execucao": pd.Timestamp("2025-06-10"),
+        "cid_compativel": True,
+        "episodio": 1,
+        "cid_oci": "OCI identificada",
+        "status_oci": "finalizada",
+        "id_oci_paciente": [f"P{i}|{id_pacote}" for i in range(n)],
+    })
+
+
+def _linhas(destino, tabela="oci_identificada"):
+    """{competência: linhas} da tabela."""
+    competencia = abrir_dataset(str(destino), tabela).to_table(columns=["competencia"])
+    return competencia.to_pandas()["competencia"].value_counts().to_dict()
+
+
+def test_regravar_competencia_substitui_so_a_dela(tmp_path):
+    gravar_dataset(str(tmp_path), "06/2025", _resultado(5), versao_regras="v1")
+    gravar_dataset(str(tmp_path), "07/2025", _resultado(3), versao_regras="v1")
+    gravar_dataset(str(tmp_path), "06/2025", _resultado(2, "0901010057"), versao_regras="v2")
+
+    assert _linhas(tmp_path) == {"2025-06": 2, "2025-07": 3}
+
+    junho = abrir_dataset(str(tmp_path)).to_table(
+        filter=ds.field("competencia") == "2025-06"
+    ).to_pandas()
+    assert set(junho["id_pacote"]) == {"0901010057"}
+    assert set(junho["versao_regras"]) == {"v2"}
+
+    assert _linhas(tmp_path, "episodios") == {"2025-06": 2, "2025-07": 3}
+
+
+def test_versoes_antigas_sao_podadas(tmp_path):
+    for n in (5, 4, 3, 2):
+        gravar_dataset(str(tmp_path), "06/2025", _resultado(n))
+
+    dir_tabela = tmp_path / "oci_identificada"
+    assert os.path.islink(dir_tabela / "competencia=2025-06")
+    # a atual e a substituída por último (leituras já abertas)
+    assert len(os.listdir(dir_tabela / ".versoes")) == 2
+
+
+def test_recupera_competencia_deixada_em_substituida(tmp_path):
+    gravar_dataset(str(tmp_path), "06/2025", _resultado(5))
+    dir_tabela = tmp_path / "episodios"
+    antigo = dir_tabela / ".substituida-x"
+    antigo.mkdir()
+    os.rename(dir_tabela / "competencia=2025-06", antigo / "competencia=2025-06")
+
+    gravar_dataset(str(tmp_path), "07/2025", _resultado(3))
+
+    assert not antigo.exists()
+    assert _linhas(tmp_path, "episodios") == {"2025-06": 5, "2025-07": 3}
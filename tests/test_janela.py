@@ -0,0 +1,62 @@
+# tests/test_janela.py
+# -*- coding: utf-8 -*-
+"""Fechamento dentro de JANELA_DIAS (processamento/janela.py)."""
+
+import pytest
+
+from auxiliares import mira
+from processamento import processar_mira
+
+OCI = "0901010057"  # 0201010666 + 0203020081 + uma consulta do grupo 'consulta'
+
+
+@pytest.fixture
+def bases_com_janela(bases):
+    pacotes = bases["pacotes"].assign(JANELA_DIAS=None)
+    pacotes.loc[pacotes["CO_OCI"] == OCI, "JANELA_DIAS"] = "30"
+    return {**bases, "pacotes": pacotes}
+
+
+def test_fecha_na_janela_pela_alternativa_posterior_do_grupo_ou(bases_com_janela):
+    # A primeira alternativa do grupo (0301010072) fica fora da janela; a
+    # segunda (0301010307) fecha o episódio dentro dela
+    df = mira([
+        ("1", "0201010666", "", "2025-01-01"),
+        ("2", "0203020081", "", "2025-01-05"),
+        ("3", "0301010072", "225250", "2025-06-01"),
+        ("4", "0301010307", "225250", "2025-01-20"),
+    ])
+    resultado = processar_mira(df, bases_com_janela)
+    resultado = resultado[resultado["id_pacote"] == OCI]
+
+    assert sorted(resultado["id_registro"]) == ["1", "2", "4"]
+    assert set(resultado["episodio"]) == {1}
+
+
+def test_dois_episodios_da_mesma_oci(bases_com_janela):
+    df = mira([
+        ("1", "0201010666", "", "2025-01-01"),
+        ("2", "0203020081", "", "2025-01-05"),
+        ("3", "0301010072", "225250", "2025-01-10"),
+        ("4", "0201010666", "", "2025-05-01"),
+        ("5", "0203020081", "", "2025-05-02"),
+        ("6", "0301010307", "225250", "2025-05-03"),
+        ("7", "0201010666", "", "2025-09-01"),  # sozinha: não fecha
+    ])
+    resultado = processar_mira(df, bases_com_janela)
+    resultado = resultado[resultado["id_pacote"] == OCI]
+
+    episodios = dict(zip(resultado["id_registro"], resultado["episodio"]))
+    assert episodios == {"1": 1, "2": 1, "3": 1, "4": 2, "5": 2, "6": 2}
+    assert set(resultado["id_oci_paciente"]) == {f"P1|{OCI}", f"P1|{OCI}|2"}
+
+
+def test_sem_janela_fecha_com_datas_distantes(bases):
+    df = mira([
+        ("1", "0201010666", "", "2025-01-01"),
+        ("2", "0203020081", "", "2025-01-05"),
+        ("3", "0301010072", "225250", "2025-06-01"),
+    ])
+    resultado = processar_mira(df, bases)
+
+    assert sorted(resultado.loc[resultado["id_pacote"] == OCI, "id_registro"]) == ["1", "2", "3"]
@@ -0,0 +1,73 @@
+# tests/test_mascaras.py
+# -*- coding: utf-8 -*-
+"""Fechamento e quase fechamento por máscaras de bits (processamento/mascaras.py)."""
+
+import pandas as pd
+
+from auxiliares import regras
+from processamento.mascaras import (
+    avaliar_mascaras,
+    listar_pacotes_fechados,
+    tabela_gargalos,
+    tabela_quase_fechadas,
+)
+
+# X: E1 e E2 (grupo_e) + um de O1/O2 (grupo 'imagem'); O3 é opcional
+REGRAS_X = [
+    ("X", "E1", "5", None), ("X", "E2", "5", None),
+    ("X", "O1", "5", "imagem"), ("X", "O2", "5", "imagem"),
+    ("X", "O3", "1", None),
+]
+
+
+def _avaliar(procedimentos_por_paciente):
+    _, compilado = regras(REGRAS_X)
+    df = pd.DataFrame(
+        [(p, proc) for p, procs in procedimentos_por_paciente.items() for proc in procs],
+        columns=["id_paciente", "co_procedimento"],
+    )
+    return avaliar_mascaras(df, compilado), compilado
+
+
+def test_fecha_com_qualquer_alternativa_do_grupo_ou():
+    avaliacao, compilado = _avaliar({
+        "p1": ["E1", "E2", "O1"],
+        "p2": ["E2", "O2", "E1", "O3"],
+        "p3": ["E1", "O1", "O2"],   # falta E2
+        "p4": ["O3"],                # só opcional: nenhum requisito
+    })
+    fechados = listar_pacotes_fechados(avaliacao, compilado)
+
+    assert fechados == {"p1": ["X"], "p2": ["X"], "p3": [], "p4": []}
+
+
+def test_quase_fechadas_lista_o_requisito_que_falta():
+    avaliacao, compilado = _avaliar({
+        "p1": ["E1", "E2", "O1"],    # fechada
+        "p2": ["E1", "O2"],          # falta E2
+        "p3": ["E1", "E2"],          # falta o grupo 'imagem'
+        "p4": ["E1"],                # faltam dois
+    })
+    quase = tabela_quase_fechadas(avaliacao, compilado)
+
+    assert quase[["id_paciente", "grupos_satisfeitos", "grupos_total"]].values.tolist() == [
+        ["p2", 2, 3], ["p3", 2, 3],
+    ]
+    assert quase["grupos_faltantes"].tolist() == ["E2", "imagem (uma das 2 opções)"]
+
+
+def test_gargalos_contam_os_pacientes_em_aberto():
+    avaliacao, compilado = _avaliar({
+        "p1": ["E1", "E2", "O1"],
+        "p2": ["E1", "O2"],
+        "p3": ["E1"],
+    })
+    cobertura = {}
+    listar_pacotes_fechados(avaliacao, compilado, cobertura=cobertura)
+    gargalos = tabela_gargalos(cobertura, compilado)
+
+    assert gargalos[["requisito", "pacientes_sem_requisito", "pacientes_em_aberto",
+                     "pacientes_fechados"]].values.tolist() == [
+        ["E2", 2, 2, 1],
+        ["imagem (uma das 2 opções)", 1, 2, 1],
+    ]
@@ -0,0 +1,20 @@
+# tests/test_memoria.py
+# -*- coding: utf-8 -*-
+"""Teto de memória do processamento (ver ferramentas/medir_memoria.py)."""
+
+import os
+
+import pytest
+
+from medir_memoria import LIMITE_MULTIPLO_ENTRADA, PACIENTES_PADRAO, RAIZ, medir
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="RSS lido de /proc (Linux)")
+def test_pico_de_memoria_dentro_do_limite(monkeypatch):
+    monkeypatch.chdir(RAIZ)  # medir() muda o diretório; volta no fim do teste
+    r = medir(PACIENTES_PADRAO)
+
+    assert r["saida"] > 0
+    assert r["multiplo"] <= LIMITE_MULTIPLO_ENTRADA, (
+        f"pico de {r['multiplo']:.2f}x a entrada, acima do limite de {LIMITE_MULTIPLO_ENTRADA:.1f}x"
+    )
@@ -0,0 +1,75 @@
+# tests/test_normalizacao.py
+# -*- coding: utf-8 -*-
+"""Normalização e validação do MIRA (processamento/normalizacao.py)."""
+
+import numpy as np
+import pandas as pd
+
+from processamento.normalizacao import normalizar_mira
+
+
+def _normalizar(**colunas):
+    n = len(next(iter(colunas.values())))
+    base = {
+        "id_registro": [str(i + 1) for i in range(n)],
+        "id_paciente": ["P1"] * n,
+        "co_procedimento": ["0204030030"] * n,
+    }
+    base.update(colunas)
+    return normalizar_mira(pd.DataFrame(base, dtype=object))
+
+
+def _motivos(relatorio):
+    return dict(zip(zip(relatorio["coluna"], relatorio["motivo"]), relatorio["linhas"]))
+
+
+def test_sigtap_recupera_zero_e_remove_pontuacao():
+    df, relatorio = _normalizar(co_procedimento=["204030030", "02.04.03.003-0", " 0301010072 "])
+
+    assert df["co_procedimento"].tolist() == ["0204030030", "0204030030", "0301010072"]
+    assert _motivos(relatorio) == {("co_procedimento", "zero à esquerda restaurado"): 1}
+    assert df.attrs["normalizado"]
+
+
+def test_sigtap_invalido_ou_ausente_descarta_a_linha():
+    df, relatorio = _normalizar(co_procedimento=["0204030030", "12345", None, "1204030030"])
+
+    assert df["id_registro"].tolist() == ["1"]
+    assert _motivos(relatorio) == {
+        ("co_procedimento", "ausente"): 1,
+        ("co_procedimento", "código SIGTAP inválido"): 2,
+    }
+
+
+def test_cbo_recupera_zero_e_invalido_vira_vazio():
+    df, relatorio = _normalizar(cbo_executante=["22525", "225250", "abc", None, "2252-50"])
+
+    assert df["cbo_executante"].tolist() == ["022525", "225250", "", "", "225250"]
+    assert _motivos(relatorio) == {
+        ("cbo_executante", "zero à esquerda restaurado"): 1,
+        ("cbo_executante", "CBO inválido"): 1,
+    }
+
+
+def test_cid_maiusculo_sem_ponto():
+    df, _ = _normalizar(cid_motivo=["c50.9", "H52", "xyz", ""])
+
+    assert df["cid_motivo"].tolist()[:2] == ["C509", "H52"]
+    assert df["cid_motivo"].iloc[2:].isna().all()
+
+
+def test_ids_ausentes_descartam_a_linha_e_nao_viram_nan():
+    df, relatorio = _normalizar(
+        id_paciente=["P1", None, np.nan, " "],
+        co_procedimento=["0204030030"] * 4,
+    )
+    assert df["id_paciente"].tolist() == ["P1"]
+    assert _motivos(relatorio) == {("id_paciente", "ausente"): 3}
+
+
+def test_datas_invalidas_viram_nat():
+    df, relatorio = _normalizar(dt_execucao=["2025-06-10", "31/02/2025x", None])
+
+    assert df["dt_execucao"].iloc[0] == pd.Timestamp("2025-06-10")
+    assert df["dt_execucao"].iloc[1:].isna().all()
+    assert _motivos(relatorio) == {("dt_execucao", "data inválida"): 1}
@@ -0,0 +1,15 @@
+# tests/test_rerun.py
+# -*- coding: utf-8 -*-
+"""Orçamento de rerun do app (ver ferramentas/medir_rerun.py)."""
+
+from medir_rerun import ORCAMENTO_RERUN_OCIOSO_MS, RAIZ, medir
+
+
+def test_rerun_ocioso_dentro_do_orcamento(monkeypatch):
+    monkeypatch.chdir(RAIZ)  # medir() muda o diretório; volta no fim do teste
+    resultados = medir(rodadas=10)
+
+    p50 = resultados["rerun ocioso"]["p50"]
+    assert p50 <= ORCAMENTO_RERUN_OCIOSO_MS, (
+        f"rerun ocioso ({p50:.1f} ms) acima do orçamento de {ORCAMENTO_RERUN_OCIOSO_MS} ms"
+    )